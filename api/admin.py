@@ -5,4 +5,10 @@ admin.site.register(CartItem)
 admin.site.register(Category)
 admin.site.register(Product)
 admin.site.register(Order)
-admin.site.register(OrderItem)
\ No newline at end of file
+admin.site.register(OrderItem)
+admin.site.register(DailySales)
+admin.site.register(DailyProductSales)
+admin.site.register(DailyCategorySales)
+admin.site.register(StockMovement)
+admin.site.register(Task)
+admin.site.register(ArchivedOrder)
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .metrics import install_sql_timer
+        from .sqlite import configure_connection
+        connection_created.connect(configure_connection, dispatch_uid='api.sqlite.configure_connection')
+        connection_created.connect(install_sql_timer, dispatch_uid='api.metrics.install_sql_timer')
@@ -0,0 +1,171 @@
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .inventory import stocked_order_items, stocked_products
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+from .pagination import get_page_size, page_queryset, split_page
+from .routers import archive_alias
+from .rows import (ITEM_PRODUCT_FIELDS, ORDER_COLUMNS, ORDER_ITEM_COLUMNS, PRODUCT_COLUMNS, PRODUCT_FIELDS,
+                   order_rows)
+from .sales import pending_order_ids
+
+# luu tru don hang cu: don shipped/canceled cu hon ORDER_ARCHIVE_AFTER_DAYS duoc chuyen
+# (cung id, cung cac cot) sang ArchivedOrder/ArchivedOrderItem tren ARCHIVE_DATABASE.
+# Moi lo: giu write lock cua database chinh (BEGIN IMMEDIATE), chep sang archive va commit,
+# roi xoa khoi database chinh. Dung giua chung thi don nam o ca 2 noi: lan chay sau chep lai
+# (bo qua dong da co) va xoa tiep, orders_list lay ban trong database chinh -> chay lai duoc.
+# Lich su don (orders_list): keyset pagination tren ca 2 database voi cung cursor, tron lai.
+# Don trong archive luon cu hon horizon() nen trang du don moi hon moc do khong doc archive.
+# Bang archive tao rieng: manage.py migrate --database archive. Chua tao thi orders_list chi
+# doc database chinh, archive_orders bao loi.
+
+ARCHIVE_STATUSES = ('shipped', 'canceled')
+ORDERING = ['-time_create', '-id']
+ITEM_COLUMNS = ['id', 'order_id', 'product_id', 'quantity', 'price']
+
+
+def horizon():
+    """Moi don trong archive deu tao truoc moc nay."""
+    return timezone.now() - timedelta(days=getattr(settings, 'ORDER_ARCHIVE_AFTER_DAYS', 90))
+
+
+_ready = set()
+
+
+def archive_ready():
+    """Bang ArchivedOrder da duoc migrate tren database archive chua (chi nho ket qua True)."""
+    alias = archive_alias()
+    if alias not in _ready and ArchivedOrder._meta.db_table in connections[alias].introspection.table_names():
+        _ready.add(alias)
+    return alias in _ready
+
+
+async def _aarchive_ready():
+    return archive_alias() in _ready or await sync_to_async(archive_ready)()
+
+
+def archivable(before):
+    # don con task cap nhat bang tong hop chua chay thi de lai (task can doc don trong database chinh)
+    return (Order.objects.filter(status__in=ARCHIVE_STATUSES, time_create__lt=before)
+            .exclude(id__in=pending_order_ids()))
+
+
+def archive_batch(order_ids, before):
+    """Chuyen cac don trong order_ids (neu van du dieu kien) sang archive, tra ve so don da chuyen."""
+    with transaction.atomic():
+        orders = list(archivable(before).filter(id__in=order_ids).values(*ORDER_COLUMNS))
+        ids = [order['id'] for order in orders]
+        items = list(OrderItem.objects.filter(order_id__in=ids).values(*ITEM_COLUMNS))
+        with transaction.atomic(using=archive_alias()):
+            ArchivedOrder.objects.bulk_create([ArchivedOrder(**order) for order in orders], ignore_conflicts=True)
+            ArchivedOrderItem.objects.bulk_create([ArchivedOrderItem(**item) for item in items],
+                                                  ignore_conflicts=True)
+        Order.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def archive_orders(batch_size=None, limit=None, progress=None):
+    """Chuyen toi da limit don du dieu kien sang archive, moi lo 1 transaction.
+
+    progress(so don da chuyen, id cuoi) duoc goi sau moi lo.
+    """
+    batch_size = batch_size or getattr(settings, 'ORDER_ARCHIVE_BATCH_SIZE', 500)
+    before = horizon()
+    queryset = archivable(before)
+    moved, last_id = 0, 0
+    while limit is None or moved < limit:
+        size = batch_size if limit is None else min(batch_size, limit - moved)
+        ids = list(queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:size])
+        if not ids:
+            break
+        moved += archive_batch(ids, before)
+        last_id = ids[-1]
+        if progress is not None:
+            progress(moved, last_id)
+    return moved
+
+
+def _reaches_archive(orders, page_size):
+    # trang chua du hoac da toi cac don cu hon horizon() -> co the co don trong archive
+    # (dong thua orders[page_size] chi de biet con trang sau, khong can so voi archive)
+    return len(orders) <= page_size or orders[page_size - 1]['time_create'] < horizon()
+
+
+def _merge(orders, archived):
+    ids = {order['id'] for order in orders}
+    archived = [order for order in archived if order['id'] not in ids]
+    merged = sorted(orders + archived, key=lambda order: (order['time_create'], order['id']), reverse=True)
+    return merged, {order['id'] for order in archived}
+
+
+def _archived_item_rows(items, products):
+    # dong cung dang voi .values(*ORDER_ITEM_COLUMNS) cua stocked_order_items()
+    products = {product['product_id']: product for product in products}
+    rows = []
+    for item in items:
+        product = products.get(item['product_id'], {})
+        row = {'order_id': item['order_id'], 'quantity': item['quantity'], 'price': item['price']}
+        for item_field, product_field in zip(ITEM_PRODUCT_FIELDS, PRODUCT_FIELDS):
+            row[item_field[1]] = product.get(product_field[1])
+        rows.append(row)
+    return rows
+
+
+def _history_querysets(user):
+    return (Order.objects.filter(customer=user).values(*ORDER_COLUMNS),
+            ArchivedOrder.objects.filter(customer=user).values(*ORDER_COLUMNS))
+
+
+def _items_querysets(orders, archived_ids):
+    current = [order['id'] for order in orders if order['id'] not in archived_ids]
+    return (stocked_order_items().filter(order_id__in=current).order_by('id').values(*ORDER_ITEM_COLUMNS),
+            ArchivedOrderItem.objects.filter(order_id__in=archived_ids).order_by('id').values(*ITEM_COLUMNS))
+
+
+def _products_queryset(items):
+    ids = {item['product_id'] for item in items}
+    return stocked_products().filter(product_id__in=ids).values(*PRODUCT_COLUMNS)
+
+
+def order_history(request, user):
+    """1 trang lich su don cua user (database chinh + archive), moi nhat truoc: (results, next cursor)."""
+    page_size = get_page_size(request)
+    cursor = request.GET.get('cursor')
+    current, archived = _history_querysets(user)
+    orders = list(page_queryset(current, ORDERING, cursor, page_size))
+    archived_ids = set()
+    if _reaches_archive(orders, page_size) and archive_ready():
+        orders, archived_ids = _merge(orders, list(page_queryset(archived, ORDERING, cursor, page_size)))
+    orders, next_cursor = split_page(orders, ORDERING, page_size)
+    archived_ids &= {order['id'] for order in orders}
+    items, archived_items = _items_querysets(orders, archived_ids)
+    items = list(items)
+    if archived_ids:
+        archived_items = list(archived_items)
+        items += _archived_item_rows(archived_items, _products_queryset(archived_items))
+    return order_rows(orders, items), next_cursor
+
+
+async def aorder_history(request, user):
+    """Ban async cua order_history (async ORM)."""
+    page_size = get_page_size(request)
+    cursor = request.GET.get('cursor')
+    current, archived = _history_querysets(user)
+    orders = [order async for order in page_queryset(current, ORDERING, cursor, page_size)]
+    archived_ids = set()
+    if _reaches_archive(orders, page_size) and await _aarchive_ready():
+        archived = [order async for order in page_queryset(archived, ORDERING, cursor, page_size)]
+        orders, archived_ids = _merge(orders, archived)
+    orders, next_cursor = split_page(orders, ORDERING, page_size)
+    archived_ids &= {order['id'] for order in orders}
+    items, archived_items = _items_querysets(orders, archived_ids)
+    items = [item async for item in items]
+    if archived_ids:
+        archived_items = [item async for item in archived_items]
+        products = [product async for product in _products_queryset(archived_items)]
+        items += _archived_item_rows(archived_items, products)
+    return order_rows(orders, items), next_cursor
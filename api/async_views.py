@@ -0,0 +1,134 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from . import facets
+from .archive import aorder_history
+from .cache import cache_catalog_response
+from .inventory import stocked_cart_items, stocked_products
+from .models import CartItem, Category
+from .pagination import apaginate
+from .renderers import render_json
+from .rows import *
+from .views import PRODUCT_ORDERINGS, parse_product_ids, products_by_ids, products_by_ids_queryset
+
+# ban async (ASGI) cua cac api doc nhieu: /api/async/...
+# Cung URL con, tham so va JSON voi ban sync trong views.py, dung async ORM cua Django
+# (aget, async for) nen khi chay duoi ASGI request cho DB khong giu 1 worker thread.
+
+
+def _json(data, status=200):
+    return HttpResponse(render_json(data), status=status, content_type='application/json')
+
+
+def _error(exc):
+    response = _json(exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}, exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response['WWW-Authenticate'] = 'Bearer realm="api"'
+    return response
+
+
+def _jwt_authenticator():
+    # dung class JWT dang cau hinh trong REST_FRAMEWORK (co the la ban co cache user)
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        if issubclass(authentication_class, JWTAuthentication):
+            return authentication_class()
+    return JWTAuthentication()
+
+
+async def authenticate(request):
+    """Xac thuc bang header Authorization: Bearer <access token>, nem NotAuthenticated neu khong co."""
+    result = await sync_to_async(_jwt_authenticator().authenticate)(request)
+    if result is None:
+        raise exceptions.NotAuthenticated()
+    return result[0]
+
+
+@require_GET
+@cache_catalog_response
+async def product_list(request):
+    try:
+        fields = sparse_product_fields(request.GET.get('fields'))
+        if 'ids' in request.GET:
+            ids = parse_product_ids(request.GET['ids'])
+            products = [product async for product in products_by_ids_queryset(ids, fields)]
+            return _json(products_by_ids(ids, products, fields))
+        products, next_cursor = await apaginate(
+            request, stocked_products().values(*product_columns(fields, ['product_id'])), ['product_id'])
+    except exceptions.APIException as exc:
+        return _error(exc)
+    return _json({"next": next_cursor, "results": product_rows(products, fields)})
+
+
+@require_GET
+@cache_catalog_response
+async def product_detail(request, pk):
+    try:
+        fields = sparse_product_fields(request.GET.get('fields'))
+    except exceptions.APIException as exc:
+        return _error(exc)
+    product = await stocked_products().filter(pk=pk).values(*product_columns(fields, ['product_id'])).afirst()
+    if product is None:
+        return HttpResponse(status=404)
+    return _json(product_rows([product], fields)[0])
+
+
+@require_GET
+@cache_catalog_response
+async def filter_products(request):
+    sort = request.GET.get('sort')
+    try:
+        filters = facets.parse_filters(request.GET)
+    except exceptions.APIException as exc:
+        return _error(exc)
+    if not sort and not facets.has_filters(filters):
+        return _json({"detail": "At least one filter parameter (sort or category) is required."}, 400)
+
+    try:
+        fields = sparse_product_fields(request.GET.get('fields'))
+        ordering = PRODUCT_ORDERINGS.get(sort, ['product_id'])
+        products = facets.apply_filters(stocked_products(), filters).values(*product_columns(fields, ordering))
+        products, next_cursor = await apaginate(request, products, ordering)
+    except exceptions.APIException as exc:
+        return _error(exc)
+    data = {"next": next_cursor, "results": product_rows(products, fields)}
+    if request.GET.get('facets', '').lower() in facets.TRUE_VALUES:
+        data["facets"] = await facets.acount_facets(filters)
+    return _json(data)
+
+
+@require_GET
+@cache_catalog_response
+async def category_list(request):
+    categories = [category async for category in Category.objects.values(*CATEGORY_COLUMNS)]
+    return _json(category_rows(categories))
+
+
+@require_GET
+async def cart_list(request):
+    try:
+        user = await authenticate(request)
+    except exceptions.APIException as exc:
+        return _error(exc)
+    if request.GET.get('expand') == 'product':
+        items = stocked_cart_items().filter(user=user).order_by('cart_item_id').values(*CART_ITEM_COLUMNS)
+        return _json(cart_rows([item async for item in items]))
+    cart_items = [
+        {'product_id': product_id, 'quantity': quantity, 'id': cart_item_id}
+        async for cart_item_id, product_id, quantity
+        in CartItem.objects.filter(user=user).values_list('cart_item_id', 'product_id', 'quantity')
+    ]
+    return _json(cart_items)
+
+
+@require_GET
+async def orders_list(request):
+    try:
+        user = await authenticate(request)
+        results, next_cursor = await aorder_history(request, user)
+    except exceptions.APIException as exc:
+        return _error(exc)
+    return _json({"next": next_cursor, "results": results})
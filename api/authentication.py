@@ -0,0 +1,48 @@
+import copy
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .cache import BoundedCache
+
+# JWTAuthentication co cache user theo user_id trong token: request da dang nhap
+# khong phai SELECT auth_user moi lan. Entry bi xoa khi User duoc save/delete
+# (api/signals.py: doi mat khau, khoa tai khoan...), TTL gioi han thoi gian cu
+# khi User bi sua bang queryset.update() hoac o process khac.
+
+_users = BoundedCache(
+    getattr(settings, 'AUTH_USER_CACHE_MAX_ENTRIES', 10000),
+    ttl=getattr(settings, 'AUTH_USER_CACHE_TTL', 60),
+)
+
+
+def invalidate_user(user_id):
+    _users.delete(str(user_id))
+
+
+def clear_user_cache():
+    _users.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def get_user(self, validated_token):
+        try:
+            user_id = str(validated_token[jwt_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = _users.get(user_id)
+        if user is None:
+            # lan dau: DB + cac kiem tra cua simplejwt (khong ton tai, inactive, token bi thu hoi)
+            user = super().get_user(validated_token)
+            _users.set(user_id, user)
+        elif jwt_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        # ban sao rieng cho moi request
+        return copy.copy(user)
@@ -0,0 +1,193 @@
+import json
+import tempfile
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from django.db import transaction
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+# tien ich dung chung cho cac lenh benchmark (manage.py bench_*)
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """Chay benchmark trong 1 transaction roi rollback, database khong bi doi."""
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+@contextmanager
+def test_environment():
+    """Cho phep dung test client (host 'testserver') ngoai test runner.
+
+    Snapshot catalog ghi vao thu muc tam: du lieu mau bi rollback, file khong duoc giu lai.
+    """
+    try:
+        setup_test_environment()
+    except RuntimeError:
+        # da chay trong test runner
+        with _snapshot_dir():
+            yield
+        return
+    try:
+        with _snapshot_dir():
+            yield
+    finally:
+        teardown_test_environment()
+
+
+@contextmanager
+def _snapshot_dir():
+    from . import snapshots
+
+    with tempfile.TemporaryDirectory() as directory, override_settings(CATALOG_SNAPSHOT_DIR=directory):
+        snapshots.reset()
+        try:
+            yield
+        finally:
+            snapshots.reset()
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_stats(samples):
+    """samples tinh bang giay, ket qua tinh bang ms."""
+    count = len(samples)
+    return {
+        'count': count,
+        'mean_ms': round(sum(samples) / count * 1000, 3) if count else 0.0,
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3) if count else 0.0,
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def api_client(user=None):
+    """APIClient gui access token JWT that (dung duoc cho ca view sync lan async)."""
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    client = APIClient()
+    if user is not None:
+        client.credentials(HTTP_AUTHORIZATION='Bearer %s' % AccessToken.for_user(user))
+    return client
+
+
+def make_fixture():
+    """Du lieu mau nho cho cac lenh benchmark/audit, goi ben trong rolled_back()."""
+    from django.contrib.auth.models import User
+    from .models import CartItem, Category, Order, OrderItem, Product
+
+    user = User.objects.create_user(username='bench-user', email='bench-user@example.com')
+    staff = User.objects.create_user(username='bench-staff', email='bench-staff@example.com', is_staff=True)
+    categories = Category.objects.bulk_create([Category(category_name='bench %d' % i) for i in range(3)])
+    products = Product.objects.bulk_create([
+        Product(product_name='bench product %d' % i, product_description='bench description',
+                price=10 + i, discountPercentage=i % 50, stock=10 ** 6, category=categories[i % 3])
+        for i in range(30)
+    ])
+    cart = CartItem.objects.bulk_create([CartItem(user=user, product=product, quantity=1) for product in products[:5]])
+    order = Order.objects.create(customer=user, address='bench', phone='0000000000', status='processing')
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=product, quantity=1, price=product.price) for product in products[:5]
+    ])
+    return SimpleNamespace(user=user, staff=staff, categories=categories, products=products, cart=cart, order=order)
+
+
+def route_requests(fixture):
+    """1 request mau cho moi route trong api/urls.py: (url name, method, path, data, user)."""
+    from .pagination import encode_cursor
+
+    product = fixture.products[0]
+    category = fixture.categories[0]
+    user, staff = fixture.user, fixture.staff
+    return [
+        ('product_list', 'get', '/api/products/', None, None),
+        ('product_list', 'get', '/api/products/?cursor=%s' % encode_cursor(['product_id'], [product.product_id]), None, None),
+        ('product_list', 'get', '/api/products/?ids=%s'
+         % ','.join(str(p.product_id) for p in reversed(fixture.products[:100])), None, None),
+        ('product_batch', 'post', '/api/products/batch/', {'ids': [p.product_id for p in fixture.products[:100]]}, None),
+        ('product_detail', 'get', '/api/products/%d/' % product.product_id, None, None),
+        ('product_list', 'get', '/api/products/?fields=id,title,price,thumbnail', None, None),
+        ('filter_products', 'get', '/api/products/filter/?sort=price_desc&fields=id,title,price,stock', None, None),
+        ('filter_products', 'get', '/api/products/filter/?sort=price_asc&category=%d' % category.category_id, None, None),
+        ('filter_products', 'get', '/api/products/filter/?sort=price_desc&cursor=%s'
+         % encode_cursor(['-price', '-product_id'], [product.price, product.product_id]), None, None),
+        ('filter_products', 'get', '/api/products/filter/?category=%d,%d&min_price=1&facets=1'
+         % (category.category_id, fixture.categories[1].category_id), None, None),
+        ('filter_products', 'get', '/api/products/filter/?sort=price_asc&category=%d&min_price=1&max_price=100'
+         '&min_discount=5&facets=1' % category.category_id, None, None),
+        ('search_products', 'get', '/api/products/search/?q=bench', None, None),
+        ('category_list', 'get', '/api/categories/', None, None),
+        ('category_detail', 'get', '/api/categories/%d/' % category.category_id, None, None),
+        ('cart_list', 'get', '/api/cart/', None, user),
+        ('cart_list', 'get', '/api/cart/?expand=product', None, user),
+        ('cart_list', 'post', '/api/cart/', {'product_id': product.product_id, 'quantity': 1}, user),
+        ('get_item_cart_by_product_id', 'get', '/api/cart/item/?product_id=%d' % product.product_id, None, user),
+        ('update_cart_item_quantity', 'patch', '/api/cart/item/update/?product_id=%d' % product.product_id,
+         {'quantity': 2}, user),
+        ('cart_batch', 'post', '/api/cart/batch/', [
+            {'product_id': p.product_id, 'quantity': 2, 'op': 'set'} for p in fixture.products[:10]
+        ] + [{'product_id': fixture.products[10].product_id, 'op': 'remove'}], user),
+        ('cart_item_detail', 'delete', '/api/cart/%d/' % fixture.cart[-1].cart_item_id, None, user),
+        ('create_order', 'post', '/api/order/create/', {
+            'cartItems': [{'product_id': p.product_id, 'quantity': 1} for p in fixture.products[:3]],
+            'address': 'bench', 'phone': '0000000000',
+        }, user),
+        ('orders_list', 'get', '/api/order/', None, user),
+        ('cancel_order', 'patch', '/api/order/cancel/%d/' % fixture.order.id, None, user),
+        ('register_user', 'post', '/api/register/', {
+            'username': 'bench-new', 'password': 'bench-pass-123', 'password2': 'bench-pass-123',
+            'email': 'bench-new@example.com', 'first_name': 'bench', 'last_name': 'bench',
+        }, None),
+        ('login', 'post', '/api/login/', {'username': user.username, 'password': 'wrong'}, None),
+        ('sales_report', 'get', '/api/reports/sales/', None, staff),
+        ('sales_report', 'get', '/api/reports/sales/?group=product', None, staff),
+        ('metrics', 'get', '/api/_metrics', None, staff),
+        ('catalog_import', 'post', '/api/catalog/import/', ''.join(
+            json.dumps({'id': p.product_id, 'title': p.product_name, 'price': str(p.price)}) + '\n'
+            for p in fixture.products[:20]).encode(), staff),
+        ('catalog_export', 'get', '/api/catalog/export/?type=csv', None, staff),
+        ('catalog_snapshot', 'get', '/api/catalog/snapshot/', None, None),
+        ('async_product_list', 'get', '/api/async/products/', None, None),
+        ('async_product_list', 'get', '/api/async/products/?ids=%s'
+         % ','.join(str(p.product_id) for p in fixture.products[:100]), None, None),
+        ('async_product_detail', 'get', '/api/async/products/%d/' % product.product_id, None, None),
+        ('async_filter_products', 'get', '/api/async/products/filter/?sort=price_asc&category=%d'
+         % category.category_id, None, None),
+        ('async_filter_products', 'get', '/api/async/products/filter/?category=%d&max_price=100&facets=1'
+         % category.category_id, None, None),
+        ('async_category_list', 'get', '/api/async/categories/', None, None),
+        ('async_cart_list', 'get', '/api/async/cart/', None, user),
+        ('async_cart_list', 'get', '/api/async/cart/?expand=product', None, user),
+        ('async_orders_list', 'get', '/api/async/order/', None, user),
+        ('product_list', 'post', '/api/products/', {
+            'title': 'bench new', 'description': 'bench', 'categoryId': category.category_id, 'price': 1,
+            'discountPercentage': 0, 'stock': 1, 'thumbnail': 'bench.png',
+        }, staff),
+    ]
@@ -0,0 +1,246 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from .metrics import render_time
+
+# cache response cua cac api catalog theo "catalog version".
+# version tang moi khi Product/Category thay doi (api/signals.py) nen
+# khong can xoa tung key, cac entry cu tu bi day ra khoi LRU.
+# Ton kho (dat/huy don, dieu chinh) khong tang catalog version: moi san pham co stock version
+# rieng. Response co ton kho (product_rows voi field stock) ghi lai version cua cac san pham
+# trong response, loc theo ton kho (?in_stock=1) ghi lai stock version chung; entry chi con
+# dung khi cac version nay chua doi. Dat 1 don chi lam het han cac trang co san pham do.
+
+VERSION_KEY = 'catalog:version'
+STOCK_KEY = 'catalog:stock'  # tang moi khi ton kho bat ky san pham nao doi
+PRODUCT_STOCK_KEY = 'catalog:stock:%s'
+
+_stock_reads = ContextVar('catalog_stock_reads', default=None)
+
+
+class BoundedCache:
+    """Cache trong process: toi da max_entries (bo entry dung lau nhat), ttl giay tuy chon."""
+
+    def __init__(self, max_entries, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_responses = BoundedCache(getattr(settings, 'CATALOG_CACHE_MAX_ENTRIES', 1024))
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        # bat dau tu thoi gian hien tai de ETag cu khong trung sau khi restart
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def get_catalog_version():
+    return _version(VERSION_KEY)
+
+
+def bump_catalog_version():
+    _bump(VERSION_KEY)
+
+
+def catalog_changed():
+    """Tang version sau khi transaction commit, tranh cache lai du lieu chua commit."""
+    transaction.on_commit(bump_catalog_version)
+
+
+def get_stock_version():
+    return _version(STOCK_KEY)
+
+
+def bump_stock_versions(product_ids):
+    for product_id in product_ids:
+        _bump(PRODUCT_STOCK_KEY % product_id)
+    _bump(STOCK_KEY)
+
+
+def stock_changed(product_ids):
+    """Ton kho cua product_ids doi: tang stock version cua chung sau khi transaction commit."""
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: bump_stock_versions(product_ids))
+
+
+def stock_read(product_ids):
+    """Response dang tao co ton kho cua product_ids."""
+    reads = _stock_reads.get()
+    if reads is not None:
+        reads.update(PRODUCT_STOCK_KEY % product_id for product_id in product_ids)
+
+
+def stock_query():
+    """Response dang tao phu thuoc ton kho cua moi san pham (vd. loc ?in_stock=1)."""
+    reads = _stock_reads.get()
+    if reads is not None:
+        reads.add(STOCK_KEY)
+
+
+def clear_catalog_cache():
+    _responses.clear()
+    cache.delete(VERSION_KEY)
+    cache.delete(STOCK_KEY)
+
+
+def _etag(key, depends):
+    # GET va HEAD cung ETag
+    return '"%s"' % hashlib.md5(repr((key[1:], depends)).encode()).hexdigest()
+
+
+def _not_modified(request, etag):
+    if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if etag not in if_none_match and '*' not in if_none_match:
+        return None
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    return response
+
+
+def _cached(request):
+    """Tra ve (key, response): response la 304 hoac ban da cache, None neu phai chay view."""
+    key = (request.method, get_catalog_version(), request.get_full_path(), request.META.get('HTTP_ACCEPT', ''))
+    entry = _responses.get(key)
+    if entry is None:
+        return key, None
+    content, headers, depends = entry
+    if depends and cache.get_many(list(depends)) != depends:
+        return key, None
+    etag = _etag(key, depends)
+    return key, _not_modified(request, etag) or _finish(HttpResponse(content, headers=headers), etag)
+
+
+def _depends(reads, stock_version):
+    # ton kho doi trong luc view chay: du lieu co the cu hon version doc sau do -> khong cache
+    if reads and get_stock_version() != stock_version:
+        return None
+    return {key: _version(key) for key in sorted(reads)}
+
+
+def _cacheable(response):
+    # chi cache JSON: trang HTML cua BrowsableAPIRenderer co ten user dang nhap, form POST cho staff...
+    if response.status_code != 200:
+        return False
+    renderer = getattr(response, 'accepted_renderer', None)
+    if renderer is not None:
+        return isinstance(renderer, JSONRenderer)
+    return response.get('Content-Type', '').startswith('application/json')  # view async (render_json)
+
+
+def _store(request, key, response, reads, stock_version):
+    if not _cacheable(response):
+        return response
+    if hasattr(response, 'render'):
+        with render_time():
+            response.render()
+    depends = _depends(reads, stock_version)
+    if depends is None:
+        return response
+    headers = {name: value for name, value in response.items() if name.lower() != 'set-cookie'}
+    _responses.set(key, (response.content, headers, depends))
+    etag = _etag(key, depends)
+    return _not_modified(request, etag) or _finish(response, etag)
+
+
+def _finish(response, etag):
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'  # client luu lai nhung phai hoi lai bang If-None-Match
+    return response
+
+
+def cache_catalog_response(view):
+    """Decorator cho view GET chi phu thuoc vao URL (khong phu thuoc user), sync hoac async.
+
+    Chi response JSON duoc cache va co ETag (HTML cua browsable API phu thuoc user).
+    """
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapped(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await view(request, *args, **kwargs)
+            key, response = _cached(request)
+            if response is not None:
+                return response
+            stock_version, reads = get_stock_version(), set()
+            token = _stock_reads.set(reads)
+            try:
+                response = await view(request, *args, **kwargs)
+            finally:
+                _stock_reads.reset(token)
+            return _store(request, key, response, reads, stock_version)
+
+        return async_wrapped
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        key, response = _cached(request)
+        if response is not None:
+            return response
+        stock_version, reads = get_stock_version(), set()
+        token = _stock_reads.set(reads)
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            _stock_reads.reset(token)
+        return _store(request, key, response, reads, stock_version)
+
+    return wrapped
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.db import transaction
+
+from .models import CartItem, Product
+
+# cap nhat ca gio hang trong 1 request: list {product_id, quantity, op}
+#   op = "set" (mac dinh): dat so luong, quantity = 0 la xoa
+#   op = "add": cong them so luong
+#   op = "remove": xoa san pham khoi gio
+# cac op chay lan luot theo thu tu gui len, ghi xuong bang 1 cau upsert + 1 cau delete.
+
+OPS = ('set', 'add', 'remove')
+
+
+class CartError(Exception):
+    pass
+
+
+def _int(value, minimum):
+    if isinstance(value, bool):
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value >= minimum else None
+
+
+def parse_cart_ops(entries):
+    if not isinstance(entries, list):
+        raise CartError("A list of cart operations is required.")
+    limit = getattr(settings, 'CART_BATCH_MAX_ITEMS', 200)
+    if len(entries) > limit:
+        raise CartError(f"At most {limit} cart operations per request.")
+    ops = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            raise CartError("Invalid cart operation.")
+        product_id = _int(entry.get('product_id'), 1)
+        if product_id is None:
+            raise CartError(f"Product {entry.get('product_id')} not found.")
+        op = entry.get('op', 'set')
+        if op not in OPS:
+            raise CartError(f"Invalid op '{op}' for product {product_id}.")
+        quantity = 0
+        if op != 'remove':
+            quantity = _int(entry.get('quantity'), 0 if op == 'set' else 1)
+            if quantity is None:
+                raise CartError(f"Invalid quantity for product {product_id}.")
+        ops.append((product_id, op, quantity))
+    return ops
+
+
+def apply_cart_ops(user, entries):
+    ops = parse_cart_ops(entries)
+    product_ids = {product_id for product_id, op, quantity in ops}
+
+    with transaction.atomic():
+        found = set(Product.objects.filter(product_id__in=product_ids).values_list('product_id', flat=True))
+        for product_id, op, quantity in ops:
+            if product_id not in found:
+                raise CartError(f"Product {product_id} not found.")
+
+        current = dict(CartItem.objects.filter(user=user, product_id__in=product_ids)
+                       .values_list('product_id', 'quantity'))
+        final = dict(current)
+        for product_id, op, quantity in ops:
+            if op == 'add':
+                final[product_id] = final.get(product_id, 0) + quantity
+            else:
+                final[product_id] = quantity
+
+        upserts = [
+            CartItem(user=user, product_id=product_id, quantity=quantity)
+            for product_id, quantity in final.items()
+            if quantity > 0 and current.get(product_id) != quantity
+        ]
+        if upserts:
+            # INSERT ... ON CONFLICT (user_id, product_id) DO UPDATE SET quantity = excluded.quantity
+            CartItem.objects.bulk_create(upserts, update_conflicts=True,
+                                         unique_fields=['user', 'product'], update_fields=['quantity'])
+        removed = [product_id for product_id, quantity in final.items() if quantity == 0 and product_id in current]
+        if removed:
+            CartItem.objects.filter(user=user, product_id__in=removed).delete()
+
+    return CartItem.objects.filter(user=user).order_by('cart_item_id')
@@ -0,0 +1,260 @@
+import csv
+import io
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+
+from .cache import bump_catalog_version
+from .inventory import compact_products, stocked_products
+from .models import Category, Product
+from .renderers import render_json
+
+# nhap/xuat catalog dang NDJSON (1 object JSON moi dong) hoac CSV, cung ten field voi API
+# (products: id,title,description,categoryId,price,discountPercentage,stock,thumbnail;
+# categories: id,name). Nhap: doc file theo dong, kiem tra tung dong, upsert theo lo
+# (co id thi cap nhat, khong co thi tao moi), moi lo 1 transaction, dong loi bi bo qua va
+# duoc bao lai. Xuat: iterator theo chunk, bo nho khong phu thuoc so dong.
+# Stock trong file la ton kho moi (nhu PATCH product): movement cu duoc compact truoc khi ghi de.
+# So tien (price, discountPercentage) khi xuat: NDJSON la so JSON giong response cua API (300.0),
+# CSV la chuoi Decimal dung 2 chu so thap phan (300.00) vi CSV chi co text. Cung 1 gia tri,
+# nhap lai ca 2 dang deu ra dung Decimal cu (gia tri co toi da 2 chu so thap phan nen float khong lam lech).
+
+FORMATS = ('ndjson', 'csv')
+KINDS = ('products', 'categories')
+MAX_REPORTED_ERRORS = 1000
+
+
+class CatalogFileError(Exception):
+    pass
+
+
+def _optional(field):
+    field.required = False
+    field.allow_null = True
+    return field
+
+
+# field -> (cot trong model, field DRF dung de kiem tra)
+PRODUCT_IMPORT_FIELDS = {
+    'id': ('product_id', _optional(serializers.IntegerField(min_value=1))),
+    'title': ('product_name', serializers.CharField(max_length=200)),
+    'description': ('product_description', _optional(serializers.CharField(allow_blank=True))),
+    'categoryId': ('category_id', _optional(serializers.IntegerField(min_value=1))),
+    'price': ('price', serializers.DecimalField(max_digits=10, decimal_places=2)),
+    'discountPercentage': ('discountPercentage', _optional(serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, max_value=100))),
+    'stock': ('stock', _optional(serializers.IntegerField(min_value=0))),
+    'thumbnail': ('image_url', _optional(serializers.CharField(max_length=255, allow_blank=True))),
+}
+CATEGORY_IMPORT_FIELDS = {
+    'id': ('category_id', _optional(serializers.IntegerField(min_value=1))),
+    'name': ('category_name', serializers.CharField(max_length=100)),
+}
+
+EXPORT_COLUMNS = {
+    'products': [('id', 'product_id'), ('title', 'product_name'), ('description', 'product_description'),
+                 ('categoryId', 'category_id'), ('price', 'price'), ('discountPercentage', 'discountPercentage'),
+                 ('stock', 'available_stock'), ('thumbnail', 'image_url')],
+    'categories': [('id', 'category_id'), ('name', 'category_name')],
+}
+
+
+def guess_format(name, default='ndjson'):
+    name = (name or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return default
+
+
+def _text_lines(stream):
+    # stream: file upload, request (body chua doc), sys.stdin.buffer... chi can readline()
+    first = True
+    for line in iter(stream.readline, b''):
+        line = line.decode('utf-8')
+        if first:
+            line, first = line.lstrip('\ufeff'), False
+        yield line
+
+
+def read_records(stream, fmt):
+    """(so dong, dict hoac None, loi hoac None) cho moi dong cua stream bytes."""
+    text = _text_lines(stream)
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            if None in record:
+                yield reader.line_num, None, "Too many columns."
+                continue
+            # o trong CSV = khong co gia tri
+            yield reader.line_num, {key: value for key, value in record.items() if value != ''}, None
+        return
+    for line_no, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield line_no, None, f"Invalid JSON: {exc}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, "Each line must be a JSON object."
+            continue
+        yield line_no, record, None
+
+
+def validate_record(record, fields):
+    """Tra ve (dict cot model -> gia tri, dict loi theo field)."""
+    values, errors = {}, {}
+    for name in record:
+        if name not in fields:
+            errors[name] = ["Unknown field."]
+    for name, (column, field) in fields.items():
+        if name not in record:
+            if field.required:
+                errors[name] = ["This field is required."]
+            continue
+        try:
+            values[column] = field.run_validation(record[name])
+        except serializers.ValidationError as exc:
+            errors[name] = exc.detail
+    return values, errors
+
+
+class CatalogImport:
+
+    def __init__(self, kind, batch_size=None):
+        if kind not in KINDS:
+            raise CatalogFileError(f"kind must be one of {', '.join(KINDS)}.")
+        self.kind = kind
+        self.batch_size = batch_size or getattr(settings, 'CATALOG_IMPORT_BATCH_SIZE', 1000)
+        self.model = Product if kind == 'products' else Category
+        self.fields = PRODUCT_IMPORT_FIELDS if kind == 'products' else CATEGORY_IMPORT_FIELDS
+        self.pk = self.model._meta.pk.attname
+        self.created = self.updated = self.error_count = 0
+        self.errors = []
+
+    def run(self, stream, fmt):
+        if fmt not in FORMATS:
+            raise CatalogFileError(f"File type must be one of {', '.join(FORMATS)}.")
+        batch = []
+        try:
+            for line_no, record, error in read_records(stream, fmt):
+                if error is None:
+                    values, errors = validate_record(record, self.fields)
+                    error = errors or None
+                if error is not None:
+                    self.error(line_no, error)
+                    continue
+                batch.append((line_no, values))
+                if len(batch) >= self.batch_size:
+                    self.write(batch)
+                    batch = []
+        except UnicodeDecodeError:
+            raise CatalogFileError("File must be UTF-8 encoded.")
+        except csv.Error as exc:
+            raise CatalogFileError(f"Invalid CSV: {exc}")
+        if batch:
+            self.write(batch)
+        if self.created or self.updated:
+            bump_catalog_version()
+        return self.report()
+
+    def error(self, line_no, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line_no, 'errors': errors})
+
+    def write(self, batch):
+        # cung 1 id xuat hien nhieu lan trong lo thi lay dong cuoi
+        rows = {}
+        for line_no, values in batch:
+            rows[values.get(self.pk) or ('new', line_no)] = (line_no, values)
+        with transaction.atomic():
+            if self.kind == 'products':
+                rows = self.check_categories(rows)
+            ids = [values[self.pk] for line_no, values in rows.values() if values.get(self.pk)]
+            existing = set(self.model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+            if self.kind == 'products' and existing:
+                compact_products(existing)
+
+            # moi dong 1 tap cot rieng (field khong co trong file thi giu nguyen) -> nhom theo tap cot
+            groups = {}
+            for line_no, values in rows.values():
+                groups.setdefault(tuple(sorted(values)), []).append(values)
+            for columns, group in groups.items():
+                update_fields = [column for column in columns if column != self.pk]
+                objects = [self.model(**values) for values in group]
+                if self.pk in columns:
+                    self.model.objects.bulk_create(objects, update_conflicts=True, unique_fields=[self.pk],
+                                                   update_fields=update_fields)
+                else:
+                    self.model.objects.bulk_create(objects)
+        self.updated += len(existing)
+        self.created += len(rows) - len(existing)
+
+    def check_categories(self, rows):
+        wanted = {values['category_id'] for line_no, values in rows.values() if values.get('category_id')}
+        found = set(Category.objects.filter(pk__in=wanted).values_list('pk', flat=True))
+        valid = {}
+        for key, (line_no, values) in rows.items():
+            if values.get('category_id') and values['category_id'] not in found:
+                self.error(line_no, {'categoryId': [f"Invalid pk \"{values['category_id']}\" - object does not exist."]})
+            else:
+                valid[key] = (line_no, values)
+        return valid
+
+    def report(self):
+        return {
+            'kind': self.kind,
+            'created': self.created,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            # loi danh muc chi phat hien khi ghi lo -> sap lai theo dong
+            'errors': sorted(self.errors, key=lambda error: error['line']),
+        }
+
+
+def export_chunks(kind, fmt, chunk_size=2000):
+    """Sinh tung khoi bytes cua file xuat, doc database theo chunk."""
+    if kind not in KINDS:
+        raise CatalogFileError(f"kind must be one of {', '.join(KINDS)}.")
+    if fmt not in FORMATS:
+        raise CatalogFileError(f"File type must be one of {', '.join(FORMATS)}.")
+    names = [name for name, column in EXPORT_COLUMNS[kind]]
+    columns = [column for name, column in EXPORT_COLUMNS[kind]]
+    queryset = stocked_products() if kind == 'products' else Category.objects.all()
+    rows = queryset.order_by('pk').values_list(*columns).iterator(chunk_size=chunk_size)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if fmt == 'csv':
+        writer.writerow(names)
+    parts = []
+    for count, row in enumerate(rows, 1):
+        if fmt == 'csv':
+            writer.writerow(['' if value is None else value for value in row])
+        else:
+            parts.append(render_json(dict(zip(names, (_plain(value) for value in row)))) + b'\n')
+        if count % chunk_size == 0:
+            yield _flush(buffer, parts)
+    tail = _flush(buffer, parts)
+    if tail:
+        yield tail
+
+
+def _plain(value):
+    # Decimal -> so nhu response cua API (DecimalField coerce_to_string=False)
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def _flush(buffer, parts):
+    data = buffer.getvalue().encode() + b''.join(parts)
+    buffer.seek(0)
+    buffer.truncate()
+    parts.clear()
+    return data
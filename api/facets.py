@@ -0,0 +1,150 @@
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+from rest_framework.exceptions import ParseError
+
+from .cache import stock_query
+from .inventory import stocked_products
+
+# loc san pham nhieu dieu kien + dem facet cho sidebar:
+#   ?category=1,2 (hoac category=1&category=2), ?min_price=&max_price=, ?in_stock=1, ?min_discount=
+# Facet theo kieu "drill sideways": so luong cua moi danh muc tinh voi moi bo loc tru bo loc
+# danh muc, so luong moi khoang gia tinh voi moi bo loc tru bo loc gia -> chon 1 danh muc
+# van thay so luong cua cac danh muc khac. Ca 2 facet + tong so ket qua lay trong 1 query
+# GROUP BY (danh muc, khoang gia) voi COUNT(...) FILTER (WHERE ...), cong lai trong Python.
+
+MAX_CATEGORIES = 50
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def price_buckets():
+    # can tren cua cac khoang gia, khoang cuoi la >= can cuoi
+    return getattr(settings, 'PRICE_FACET_BUCKETS', [25, 50, 100, 250, 500, 1000])
+
+
+def _decimal(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ParseError(f"{name} must be a number.")
+    if not number.is_finite():
+        raise ParseError(f"{name} must be a number.")
+    return number
+
+
+def parse_filters(params):
+    """Doc cac bo loc tu query params (QueryDict), nem ParseError neu sai."""
+    categories = []
+    for value in params.getlist('category'):
+        for part in value.split(','):
+            if not part.strip():
+                continue
+            try:
+                categories.append(int(part))
+            except ValueError:
+                raise ParseError("category must be a list of ids.")
+    if len(categories) > MAX_CATEGORIES:
+        raise ParseError(f"At most {MAX_CATEGORIES} categories.")
+    filters = {
+        'categories': sorted(set(categories)),
+        'min_price': _decimal(params, 'min_price'),
+        'max_price': _decimal(params, 'max_price'),
+        'in_stock': params.get('in_stock', '').lower() in TRUE_VALUES,
+        'min_discount': _decimal(params, 'min_discount'),
+    }
+    if (filters['min_price'] is not None and filters['max_price'] is not None
+            and filters['max_price'] < filters['min_price']):
+        raise ParseError("max_price must not be less than min_price.")
+    return filters
+
+
+def has_filters(filters):
+    """Ket qua parse_filters co bo loc nao thuc su loc khong (?in_stock=0, ?category= thi khong)."""
+    return bool(filters['categories'] or filters['in_stock'] or filters['min_price'] is not None
+                or filters['max_price'] is not None or filters['min_discount'] is not None)
+
+
+def category_q(filters):
+    return Q(category_id__in=filters['categories']) if filters['categories'] else Q()
+
+
+def price_q(filters):
+    q = Q()
+    if filters['min_price'] is not None:
+        q &= Q(price__gte=filters['min_price'])
+    if filters['max_price'] is not None:
+        q &= Q(price__lte=filters['max_price'])
+    return q
+
+
+def common_q(filters):
+    # bo loc khong co facet: ap dung cho ca ket qua va moi facet
+    q = Q()
+    if filters['in_stock']:
+        stock_query()
+        q &= Q(available_stock__gt=0)
+    if filters['min_discount'] is not None:
+        q &= Q(discountPercentage__gte=filters['min_discount'])
+    return q
+
+
+def apply_filters(queryset, filters):
+    """queryset tu stocked_products() (can annotation available_stock)."""
+    return queryset.filter(common_q(filters), category_q(filters), price_q(filters))
+
+
+def _count(q):
+    return Count('pk', filter=q) if q else Count('pk')
+
+
+def facet_queryset(filters):
+    """1 query: so san pham theo (danh muc, khoang gia), dem rieng cho tung facet."""
+    bounds = price_buckets()
+    bucket = Case(*[When(price__lt=bound, then=Value(index)) for index, bound in enumerate(bounds)],
+                  default=Value(len(bounds)), output_field=IntegerField())
+    by_category, by_price = category_q(filters), price_q(filters)
+    queryset = stocked_products().filter(common_q(filters))
+    if by_category and by_price:
+        # dong khong qua ca 2 bo loc khong duoc dem o facet nao
+        queryset = queryset.filter(by_category | by_price)
+    return (queryset.annotate(bucket=bucket)
+            .values('category_id', 'category__category_name', 'bucket').order_by()
+            .annotate(total=_count(by_category & by_price), category_count=_count(by_price),
+                      price_count=_count(by_category)))
+
+
+def facet_counts(rows):
+    """Gop ket qua facet_queryset thanh {'total', 'categories', 'price'}."""
+    bounds = price_buckets()
+    total = 0
+    categories = {}
+    prices = [0] * (len(bounds) + 1)
+    for row in rows:
+        total += row['total']
+        prices[row['bucket']] += row['price_count']
+        if row['category_id'] is not None and row['category_count']:
+            key = (row['category_id'], row['category__category_name'])
+            categories[key] = categories.get(key, 0) + row['category_count']
+    return {
+        'total': total,
+        'categories': [
+            {'id': category_id, 'name': name, 'count': count}
+            for (category_id, name), count in sorted(categories.items(), key=lambda item: (-item[1], item[0][0]))
+        ],
+        'price': [
+            {'min': ([0] + bounds)[index], 'max': bounds[index] if index < len(bounds) else None, 'count': count}
+            for index, count in enumerate(prices)
+        ],
+    }
+
+
+def count_facets(filters):
+    return facet_counts(facet_queryset(filters))
+
+
+async def acount_facets(filters):
+    return facet_counts([row async for row in facet_queryset(filters)])
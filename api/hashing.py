@@ -0,0 +1,108 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from rest_framework.exceptions import APIException
+
+# hash/kiem tra mat khau (PBKDF2, hang trang nghin vong lap) chay tren 1 pool thread
+# rieng co gioi han: toi da WORKERS phep hash cung luc, QUEUE phep cho. Pool day thi
+# tra 429 ngay thay vi de request login don lai chiem het CPU cua worker.
+# hashlib nha GIL khi chay PBKDF2 nen cac request khac van chay song song. Request login
+# van cho ket qua hash (toi da TIMEOUT giay): pool gioi han so phep hash cung luc, khong giai phong
+# thread cua request. Login di qua authenticate() voi PooledModelBackend (AUTHENTICATION_BACKENDS).
+# settings.PASSWORD_HASHING = {'WORKERS': 2, 'QUEUE': 16, 'TIMEOUT': 10}, WORKERS = 0: hash ngay tren request
+
+
+class HashingBusy(APIException):
+    status_code = 429
+    default_detail = 'Too many password checks in progress, try again shortly.'
+    default_code = 'hashing_busy'
+
+
+class HashingPool:
+
+    def __init__(self, workers, queue, timeout=None):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+        self._slots = threading.BoundedSemaphore(workers + queue)
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            raise HashingBusy()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                options = getattr(settings, 'PASSWORD_HASHING', {})
+                workers = options.get('WORKERS', 2)
+                if workers <= 0:
+                    return None
+                _pool = HashingPool(workers, options.get('QUEUE', 16), options.get('TIMEOUT', 10))
+    return _pool
+
+
+def set_pool(pool):
+    global _pool
+    _pool = pool
+
+
+def run_hasher(fn, *args):
+    pool = get_pool()
+    return fn(*args) if pool is None else pool.run(fn, *args)
+
+
+def must_update(encoded):
+    """Hasher mac dinh hoac tham so (so vong lap...) da doi so voi luc hash."""
+    preferred = get_hasher('default')
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+class PooledModelBackend(ModelBackend):
+    """ModelBackend nhung hash tren pool, rehash khi hasher doi. Dung qua authenticate() nen van co
+    is_active (user_can_authenticate), cac backend khac va signal user_login_failed."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # van hash 1 lan de thoi gian tra loi khong lo username co ton tai hay khong
+            run_hasher(make_password, password)
+            return None
+
+        encoded = user.password
+        if not run_hasher(check_password, password, encoded) or not self.user_can_authenticate(user):
+            return None
+        if must_update(encoded):
+            run_hasher(user.set_password, password)
+            user.save(update_fields=['password'])
+        return user
@@ -0,0 +1,186 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import stock_changed
+from .models import CartItem, OrderItem, Product, StockMovement, Task
+from .tasks import enqueue_at, task, task_name
+
+# ton kho dang so cai chi ghi them: dat don / huy don chi INSERT vao StockMovement,
+# khong sua dong Product nen cac checkout cung san pham ban chay khong ghi de len nhau
+# (khong doc-sua-ghi, transaction ghi ngan hon, index cua api_product khong doi).
+#   ton kho = Product.stock + SUM(quantity cua cac movement co id > Product.stock_through)
+# compact() dinh ky cong cac movement moi vao Product.stock va day stock_through len,
+# movement cu duoc giu lai lam lich su (check_stock dung de doi chieu voi don hang).
+# Dinh ky: run_worker goi schedule_compaction() luc khoi dong, compact_task chay moi
+# STOCK_COMPACT_INTERVAL giay tren hang doi task (api/tasks.py) va tu hen lan chay sau.
+# Sua ton kho bang set_stock(), khong ghi thang Product.stock.
+
+
+class InsufficientStock(Exception):
+
+    def __init__(self, product_id, missing=False):
+        super().__init__(product_id)
+        self.product_id = product_id
+        self.missing = missing  # san pham khong con (vd. bi xoa trong luc dat don)
+
+
+def available_stock_expression(prefix=''):
+    """Bieu thuc ton kho cho queryset Product (prefix='') hoac model co FK product (prefix='product__')."""
+    pending = (StockMovement.objects
+               .filter(product=OuterRef(prefix + 'pk'), id__gt=Coalesce(OuterRef(prefix + 'stock_through'), 0))
+               .order_by().values('product').annotate(total=Sum('quantity')).values('total'))
+    return F(prefix + 'stock') + Coalesce(Subquery(pending, output_field=IntegerField()), 0)
+
+
+def with_available_stock(queryset):
+    """Product queryset co them cot available_stock."""
+    return queryset.annotate(available_stock=available_stock_expression())
+
+
+def stocked_products():
+    return with_available_stock(Product.objects.all())
+
+
+def stocked_order_items():
+    """OrderItem queryset co them ton kho hien tai cua san pham (product_available_stock)."""
+    return OrderItem.objects.annotate(product_available_stock=available_stock_expression('product__'))
+
+
+def stocked_cart_items():
+    """CartItem queryset co them ton kho hien tai cua san pham (product_available_stock)."""
+    return CartItem.objects.annotate(product_available_stock=available_stock_expression('product__'))
+
+
+def available_stock(product_ids):
+    """{product_id: ton kho} bang 1 query."""
+    return dict(stocked_products().filter(product_id__in=list(product_ids)).values_list('product_id', 'available_stock'))
+
+
+def take_stock(quantities, order=None):
+    """Ghi movement tru kho cho {product_id: quantity}, nem InsufficientStock neu thieu hang
+    (missing=True neu san pham khong con).
+
+    Phai goi trong transaction. Tren SQLite transaction la BEGIN IMMEDIATE (settings
+    DATABASES OPTIONS) nen doc ton kho roi INSERT khong bi chen ngang; database khac thi
+    select_for_update khoa cac dong Product (SQLite bo qua).
+    """
+    stock = dict(stocked_products().select_for_update().filter(product_id__in=list(quantities))
+                 .values_list('product_id', 'available_stock'))
+    for product_id, quantity in sorted(quantities.items()):
+        if product_id not in stock:
+            raise InsufficientStock(product_id, missing=True)
+        if stock[product_id] is None or stock[product_id] < quantity:
+            raise InsufficientStock(product_id)
+    _record(quantities, -1, 'order', order)
+
+
+def return_stock(quantities, order=None):
+    _record(quantities, 1, 'cancel', order)
+
+
+def set_stock(product_id, stock):
+    """Dat ton kho = stock bang 1 movement dieu chinh (ghi thang neu ton kho chua xac dinh)."""
+    with transaction.atomic():
+        current = available_stock([product_id]).get(product_id)
+        if current is None or stock is None:
+            compact_product(product_id)
+            Product.objects.filter(product_id=product_id).update(stock=stock)
+            stock_changed([product_id])
+        elif stock != current:
+            _record({product_id: stock - current}, 1, 'adjust', None)
+
+
+def _record(quantities, sign, reason, order):
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=product_id, quantity=sign * quantity, reason=reason, order=order)
+        for product_id, quantity in quantities.items()
+    ])
+    # stock nam trong response catalog
+    stock_changed(quantities)
+
+
+def _fold(movements):
+    """Cong movements vao Product.stock, tra ve so san pham da cap nhat."""
+    rows = list(movements.order_by().values('product').annotate(total=Sum('quantity'), last=Max('id')))
+    updated = 0
+    for start in range(0, len(rows), 500):
+        batch = rows[start:start + 500]
+        ids = [row['product'] for row in batch]
+        updated += Product.objects.filter(product_id__in=ids).update(
+            stock=F('stock') + Case(*[When(product_id=row['product'], then=Value(row['total'])) for row in batch],
+                                    output_field=IntegerField()),
+            stock_through=Case(*[When(product_id=row['product'], then=Value(row['last'])) for row in batch],
+                               output_field=IntegerField()),
+        )
+    return updated
+
+
+def compact():
+    """Cong tat ca movement chua compact vao Product.stock. Ton kho khong doi."""
+    with transaction.atomic():
+        pending = StockMovement.objects.filter(id__gt=Coalesce(F('product__stock_through'), 0))
+        return _fold(pending)
+
+
+@task(atomic=True)
+def compact_task():
+    """Task dinh ky: compact() roi hen lan sau (cung transaction, task bi lay lai thi khong hen trung)."""
+    compact()
+    interval = getattr(settings, 'STOCK_COMPACT_INTERVAL', 60)
+    if interval:
+        enqueue_at(timezone.now() + timedelta(seconds=interval), compact_task)
+
+
+def schedule_compaction():
+    """Enqueue compact_task neu chua co (transaction ghi nen nhieu worker khoi dong cung luc chi tao 1)."""
+    if not getattr(settings, 'STOCK_COMPACT_INTERVAL', 60):
+        return None
+    with transaction.atomic():
+        pending = Task.objects.filter(name=task_name(compact_task), status__in=('queued', 'running'))
+        if pending.exists():
+            return None
+        return enqueue_at(None, compact_task)
+
+
+def compact_product(product_id):
+    return compact_products([product_id])
+
+
+def compact_products(product_ids):
+    """compact() cho 1 nhom san pham (truoc khi ghi de Product.stock)."""
+    with transaction.atomic():
+        return _fold(StockMovement.objects.filter(product_id__in=list(product_ids),
+                                                  id__gt=Coalesce(F('product__stock_through'), 0)))
+
+
+def check_consistency():
+    """Danh sach loi: ton kho am, stock_through khong hop le, movement lech voi don hang."""
+    problems = []
+    for product_id, stock in stocked_products().filter(available_stock__lt=0).values_list('product_id', 'available_stock'):
+        problems.append(f"Product {product_id}: available stock is {stock}.")
+
+    last = StockMovement.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    for product_id in Product.objects.filter(stock_through__gt=last).values_list('product_id', flat=True):
+        problems.append(f"Product {product_id}: stock_through is past the last movement.")
+
+    # don co movement (don tao truoc khi co so kho thi khong co): tong movement cua
+    # moi san pham = -so luong dat, hoac 0 neu don da huy
+    ledger = {}
+    for row in (StockMovement.objects.filter(order__isnull=False).order_by()
+                .values('order', 'product').annotate(total=Sum('quantity'))):
+        ledger[row['order'], row['product']] = row['total']
+    order_ids = StockMovement.objects.filter(order__isnull=False).values('order')
+    expected = {}
+    for row in (OrderItem.objects.filter(order__in=order_ids, product__isnull=False).order_by()
+                .values('order', 'order__status', 'product').annotate(total=Sum('quantity'))):
+        expected[row['order'], row['product']] = 0 if row['order__status'] == 'canceled' else -row['total']
+    for key in sorted(set(ledger) | set(expected)):
+        if ledger.get(key, 0) != expected.get(key, 0):
+            problems.append(f"Order {key[0]} product {key[1]}: movements total {ledger.get(key, 0)}, "
+                            f"expected {expected.get(key, 0)}.")
+    return problems
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import archive
+
+
+class Command(BaseCommand):
+    help = ("Chuyen don shipped/canceled cu hon ORDER_ARCHIVE_AFTER_DAYS sang database archive theo lo. "
+            "Dung giua chung thi chay lai, cac lo da xong khong bi chep lai.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="So don moi lo, mac dinh ORDER_ARCHIVE_BATCH_SIZE.")
+        parser.add_argument('--limit', type=int, help="So don toi da cho lan chay nay.")
+
+    def handle(self, *args, **options):
+        if not archive.archive_ready():
+            raise CommandError("Archive tables do not exist, run: manage.py migrate --database archive")
+
+        def progress(moved, last_id):
+            self.stdout.write(f"Archived {moved} orders (up to id {last_id}).")
+
+        moved = archive.archive_orders(options['batch_size'], options['limit'], progress)
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} orders."))
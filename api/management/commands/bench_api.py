@@ -0,0 +1,95 @@
+import json
+import logging
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.bench import api_client, latency_stats, make_fixture, rolled_back, route_requests, test_environment
+from api.cache import clear_catalog_cache
+from api.urls import urlpatterns
+
+# goi moi route trong api/urls.py qua test client, --repeat lan moi route, in JSON:
+# throughput, p50/p95/p99 va so query. Moi request chay trong 1 savepoint roi rollback
+# nen cac route ghi (tao don, xoa gio hang...) lan nao cung gap cung 1 trang thai.
+# Toan bo du lieu (fixture + --seed-products) bi rollback khi xong.
+# So sanh 2 commit: python manage.py bench_api > before.json, checkout, chay lai.
+
+
+class Command(BaseCommand):
+    help = "Benchmark tat ca route cua api: throughput, p50/p95/p99 latency, so query (JSON)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help="So request do moi route.")
+        parser.add_argument('--warmup', type=int, default=2, help="So request chay truoc khi do.")
+        parser.add_argument('--routes', help="Chi chay cac url name nay, cach nhau boi dau phay.")
+        parser.add_argument('--cached', action='store_true',
+                            help="Giu cache catalog giua cac request (mac dinh xoa de do duong DB).")
+        parser.add_argument('--seed-products', type=int, default=0,
+                            help="Sinh them N san pham (seed_catalog) truoc khi do.")
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1.")
+        only = set(options['routes'].split(',')) if options['routes'] else None
+        results = {}
+        # khong log tung response 4xx (login sai mat khau...)
+        logger = logging.getLogger('django.request')
+        level = logger.level
+        logger.setLevel(logging.ERROR)
+
+        try:
+            with test_environment(), rolled_back():
+                if options['seed_products']:
+                    call_command('seed_catalog', products=options['seed_products'], users=100, cart_items=500,
+                                 orders=500, stdout=self.stderr)
+                fixture = make_fixture()
+                routes = route_requests(fixture)
+                for name, method, path, data, user in routes:
+                    if only is not None and name not in only:
+                        continue
+                    key = f'{method.upper()} {name}'
+                    suffix = 2
+                    while key in results:
+                        key = f'{method.upper()} {name} #{suffix}'
+                        suffix += 1
+                    results[key] = self.measure(api_client(user), method, path, data, options)
+        finally:
+            logger.setLevel(level)
+
+        covered = {name for name, *_ in routes}
+        report = {
+            'routes': results,
+            'uncovered': sorted(pattern.name for pattern in urlpatterns if pattern.name not in covered),
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def measure(self, client, method, path, data, options):
+        samples, queries = [], []
+        for i in range(options['warmup'] + options['repeat']):
+            if not options['cached']:
+                clear_catalog_cache()
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    if isinstance(data, bytes):
+                        # file NDJSON cho catalog_import
+                        response = getattr(client, method)(path, data, content_type='application/x-ndjson')
+                    else:
+                        response = getattr(client, method)(path, data, format='json')
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    elapsed = time.perf_counter() - start
+                transaction.set_rollback(True)
+            if i >= options['warmup']:
+                samples.append(elapsed)
+                queries.append(len(captured.captured_queries))
+        return {
+            'path': path,
+            'status': response.status_code,
+            'requests_per_sec': round(len(samples) / sum(samples), 1),
+            'latency': latency_stats(samples),
+            'queries': {'min': min(queries), 'max': max(queries)},
+        }
@@ -0,0 +1,89 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bench import latency_stats
+
+# load test WSGI vs ASGI voi nhieu client cham (gui header tung dong, doc body tung chut).
+# Can chay san 2 server tren cung database, vd:
+#   gunicorn backend.wsgi -w 4 -b 127.0.0.1:8001
+#   uvicorn backend.asgi:application --workers 4 --port 8002
+#   python manage.py bench_asgi --wsgi-url http://127.0.0.1:8001/api/products/ \
+#       --asgi-url http://127.0.0.1:8002/api/async/products/
+
+
+class Command(BaseCommand):
+    help = "So sanh throughput va tail latency cua server WSGI va ASGI voi nhieu client cham."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', required=True)
+        parser.add_argument('--asgi-url', required=True)
+        parser.add_argument('--clients', type=int, default=200, help="So client dong thoi.")
+        parser.add_argument('--requests', type=int, default=5, help="So request moi client.")
+        parser.add_argument('--trickle-ms', type=int, default=20, help="Do tre giua cac dong header gui len.")
+        parser.add_argument('--read-delay-ms', type=int, default=5, help="Do tre giua cac lan doc 4KB response.")
+        parser.add_argument('--token', help="Access token JWT cho cac endpoint can dang nhap.")
+        parser.add_argument('--timeout', type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        results = {}
+        for name in ('wsgi', 'asgi'):
+            url = options[f'{name}_url']
+            if urlsplit(url).scheme != 'http':
+                raise CommandError(f"Only http:// URLs are supported: {url}")
+            results[name] = asyncio.run(self.run(url, options))
+        self.stdout.write(json.dumps(results, indent=2))
+
+    async def run(self, url, options):
+        samples, errors = [], {}
+
+        async def client():
+            for _ in range(options['requests']):
+                start = time.perf_counter()
+                try:
+                    status = await asyncio.wait_for(self.request(url, options), options['timeout'])
+                except (OSError, asyncio.TimeoutError, ValueError, IndexError) as exc:
+                    status = type(exc).__name__
+                if status == 200:
+                    samples.append(time.perf_counter() - start)
+                else:
+                    errors[str(status)] = errors.get(str(status), 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options['clients'])))
+        elapsed = time.perf_counter() - start
+        return {
+            'url': url,
+            'ok': len(samples),
+            'errors': errors,
+            'seconds': round(elapsed, 3),
+            'requests_per_sec': round(len(samples) / elapsed, 1),
+            'latency': latency_stats(samples),
+        }
+
+    async def request(self, url, options):
+        parts = urlsplit(url)
+        path = parts.path + ('?' + parts.query if parts.query else '')
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        try:
+            lines = [f'GET {path} HTTP/1.1', f'Host: {parts.netloc}', 'Accept: application/json',
+                     'Connection: close']
+            if options['token']:
+                lines.append(f"Authorization: Bearer {options['token']}")
+            for line in lines:
+                writer.write((line + '\r\n').encode())
+                await writer.drain()
+                await asyncio.sleep(options['trickle_ms'] / 1000)
+            writer.write(b'\r\n')
+            await writer.drain()
+
+            status_line = await reader.readline()
+            status = int(status_line.split()[1])
+            while await reader.read(4096):
+                await asyncio.sleep(options['read_delay_ms'] / 1000)
+            return status
+        finally:
+            writer.close()
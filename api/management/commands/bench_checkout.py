@@ -0,0 +1,45 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from api.bench import latency_stats, rolled_back, test_environment, timed
+from api.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = "Do latency cua create_order voi 1, 10, 100 san pham moi don (du lieu duoc rollback)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,10,100', help="So san pham moi don, cach nhau boi dau phay.")
+        parser.add_argument('--repeat', type=int, default=50, help="So don hang cho moi kich thuoc.")
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        results = {}
+        with test_environment(), rolled_back():
+            user = User.objects.create_user(username='bench-checkout')
+            category = Category.objects.create(category_name='bench')
+            products = Product.objects.bulk_create([
+                Product(product_name='bench %d' % i, price=10, stock=10 ** 9, category=category)
+                for i in range(max(sizes))
+            ])
+            client = APIClient()
+            client.force_authenticate(user)
+
+            for size in sizes:
+                payload = {
+                    'cartItems': [{'product_id': p.product_id, 'quantity': 1} for p in products[:size]],
+                    'address': 'bench',
+                    'phone': '0000000000',
+                }
+
+                def checkout():
+                    response = client.post('/api/order/create/', payload, format='json')
+                    assert response.status_code == 201, response.content
+
+                checkout()  # warm up
+                results['%d_items' % size] = latency_stats(timed(checkout, options['repeat']))
+
+        self.stdout.write(json.dumps(results, indent=2))
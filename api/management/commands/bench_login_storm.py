@@ -0,0 +1,91 @@
+import json
+import logging
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from api import hashing
+from api.bench import latency_stats, test_environment
+from api.cache import clear_catalog_cache
+
+# do latency cua /api/products/ (bo qua cache catalog) trong luc nhieu thread login lien tuc:
+#   idle   - khong co login
+#   inline - login hash mat khau ngay tren request (nhu authenticate() truoc day)
+#   pool   - login hash tren HashingPool (WORKERS/QUEUE), pool day thi 429
+# User bench duoc tao that trong database (thread khac khong thay transaction chua commit) va xoa khi xong.
+
+
+class Command(BaseCommand):
+    help = "Do latency api catalog khi co login storm, so sanh hash tren request voi pool hashing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=16, help="So thread login dong thoi.")
+        parser.add_argument('--seconds', type=float, default=5.0, help="Thoi gian moi pha.")
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--queue', type=int, default=4)
+
+    def handle(self, *args, **options):
+        username, password = 'bench-login-storm', 'bench-login-storm-password'
+        User.objects.filter(username=username).delete()
+        User.objects.create_user(username=username, password=password)
+        results = {}
+        # khong log tung response 429
+        logger = logging.getLogger('django.request')
+        level = logger.level
+        logger.setLevel(logging.ERROR)
+        try:
+            with test_environment():
+                for mode in ('idle', 'inline', 'pool'):
+                    if mode == 'pool':
+                        hashing.set_pool(hashing.HashingPool(options['workers'], options['queue'], 10))
+                        results[mode] = self.run(mode, username, password, options)
+                    else:
+                        hashing.set_pool(None)
+                        with override_settings(PASSWORD_HASHING={'WORKERS': 0}):
+                            results[mode] = self.run(mode, username, password, options)
+        finally:
+            hashing.set_pool(None)
+            logger.setLevel(level)
+            User.objects.filter(username=username).delete()
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, mode, username, password, options):
+        stop = threading.Event()
+        logins = {}
+        lock = threading.Lock()
+
+        def login_storm():
+            client = Client()
+            try:
+                while not stop.is_set():
+                    status = client.post(reverse('login'), {'username': username, 'password': password},
+                                         content_type='application/json').status_code
+                    with lock:
+                        logins[str(status)] = logins.get(str(status), 0) + 1
+                    if status == 429:
+                        # client bi tu choi thu lai sau 1 chut
+                        time.sleep(0.05)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=login_storm) for _ in range(options['logins'] if mode != 'idle' else 0)]
+        for thread in threads:
+            thread.start()
+
+        client, samples = Client(), []
+        deadline = time.perf_counter() + options['seconds']
+        while time.perf_counter() < deadline:
+            clear_catalog_cache()
+            start = time.perf_counter()
+            client.get(reverse('product_list'))
+            samples.append(time.perf_counter() - start)
+
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return {'logins': logins, 'catalog_latency': latency_stats(samples)}
@@ -0,0 +1,101 @@
+import json
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api.bench import rolled_back
+from api.inventory import stocked_order_items, stocked_products
+from api.models import Category, Order, OrderItem, Product
+from api.renderers import FastJSONRenderer, orjson
+from api.rows import (CATEGORY_COLUMNS, ORDER_COLUMNS, ORDER_ITEM_COLUMNS, PRODUCT_COLUMNS,
+                      category_rows, order_rows, product_rows)
+from api.serializer import CategorySerializer, OrderSerializer, ProductSerializer
+
+
+class Command(BaseCommand):
+    help = "So sanh ModelSerializer + JSONRenderer voi read path .values() + FastJSONRenderer (byte, rows/sec)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        results = {'orjson': orjson is not None}
+        with rolled_back():
+            self.seed(options['products'], options['orders'])
+            user = User.objects.get(username='bench-serializers')
+            orders = Order.objects.filter(customer=user).order_by('-time_create', '-id')
+
+            def old_orders():
+                return OrderSerializer(orders.prefetch_related('items__product'), many=True).data
+
+            def new_orders():
+                values = list(orders.values(*ORDER_COLUMNS))
+                items = (stocked_order_items().filter(order_id__in=[order['id'] for order in values])
+                         .order_by('id').values(*ORDER_ITEM_COLUMNS))
+                return order_rows(values, items)
+
+            cases = {
+                'products': (
+                    lambda: ProductSerializer(Product.objects.order_by('product_id'), many=True).data,
+                    lambda: product_rows(stocked_products().order_by('product_id').values(*PRODUCT_COLUMNS)),
+                    options['products'],
+                ),
+                'categories': (
+                    lambda: CategorySerializer(Category.objects.order_by('category_id'), many=True).data,
+                    lambda: category_rows(Category.objects.order_by('category_id').values(*CATEGORY_COLUMNS)),
+                    Category.objects.count(),
+                ),
+                'orders': (old_orders, new_orders, options['orders']),
+            }
+            for name, (old, new, rows) in cases.items():
+                old_body, old_seconds = self.measure(lambda: JSONRenderer().render(old()), options['repeat'])
+                new_body, new_seconds = self.measure(lambda: FastJSONRenderer().render(new()), options['repeat'])
+                if old_body != new_body:
+                    raise CommandError(f"{name}: fast path output differs from the serializer output.")
+                results[name] = {
+                    'rows': rows,
+                    'bytes': len(new_body),
+                    'identical': True,
+                    'serializer_rows_per_sec': round(rows / old_seconds),
+                    'fast_rows_per_sec': round(rows / new_seconds),
+                    'speedup': round(old_seconds / new_seconds, 2),
+                }
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def measure(self, fn, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return body, best
+
+    def seed(self, products, orders):
+        rng = random.Random(1)
+        user = User.objects.create_user(username='bench-serializers')
+        categories = Category.objects.bulk_create([Category(category_name='Danh mục %d' % i) for i in range(20)])
+        products = Product.objects.bulk_create([
+            Product(product_name='Sản phẩm %d' % i,
+                    product_description=None if i % 7 == 0 else 'Mô tả sản phẩm %d ' % i * 5,
+                    price='%.2f' % rng.uniform(1, 5000),
+                    discountPercentage=None if i % 5 == 0 else '%.2f' % rng.uniform(0, 50),
+                    stock=rng.randint(0, 500), image_url='https://cdn.example.com/%d.jpg' % i,
+                    category=rng.choice(categories))
+            for i in range(products)
+        ], batch_size=500)
+        created = Order.objects.bulk_create([
+            Order(customer=user, address='Hà Nội', phone='0900000000', total='%.2f' % rng.uniform(10, 9000),
+                  status='processing')
+            for _ in range(orders)
+        ], batch_size=500)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=rng.choice(products), quantity=rng.randint(1, 3),
+                      price='%.2f' % rng.uniform(1, 5000))
+            for order in created for _ in range(3)
+        ], batch_size=500)
@@ -0,0 +1,128 @@
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.bench import latency_stats
+from api.sqlite import apply_pragmas, get_pragmas
+
+# so sanh cau hinh SQLite mac dinh (rollback journal, BEGIN DEFERRED) voi
+# SQLITE_PRAGMAS + BEGIN IMMEDIATE tren 1 file tam, nhieu thread doc/ghi cung luc.
+
+PROFILES = {
+    'default': {'pragmas': {}, 'begin': 'BEGIN'},
+    'tuned': {'pragmas': None, 'begin': 'BEGIN IMMEDIATE'},
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmark throughput doc/ghi dong thoi cua SQLite truoc va sau SQLITE_PRAGMAS."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--hot', type=int, default=10, help="So san pham 'flash sale' ma writer tranh nhau.")
+
+    def handle(self, *args, **options):
+        results = {}
+        for name, profile in PROFILES.items():
+            pragmas = get_pragmas() if profile['pragmas'] is None else profile['pragmas']
+            directory = tempfile.mkdtemp(prefix='bench-sqlite-')
+            try:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.setup(path, pragmas, options['products'])
+                results[name] = self.run(path, pragmas, profile['begin'], options)
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def connect(self, path, pragmas):
+        # timeout=5 la mac dinh cua Django/sqlite3, busy_timeout trong pragmas se ghi de
+        conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        apply_pragmas(conn.cursor(), pragmas)
+        return conn
+
+    def setup(self, path, pragmas, products):
+        conn = self.connect(path, pragmas)
+        conn.executescript("""
+            CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT, price REAL, stock INTEGER);
+            CREATE TABLE order_item (id INTEGER PRIMARY KEY, product_id INTEGER, quantity INTEGER);
+        """)
+        conn.execute('BEGIN')
+        conn.executemany('INSERT INTO product (name, price, stock) VALUES (?, ?, ?)',
+                         [('product %d' % i, 10.0 + i % 100, 10 ** 9) for i in range(products)])
+        conn.execute('COMMIT')
+        conn.close()
+
+    def run(self, path, pragmas, begin, options):
+        deadline = time.perf_counter() + options['seconds']
+        lock = threading.Lock()
+        stats = {'writes': [], 'reads': [], 'write_errors': 0, 'read_errors': 0}
+
+        def writer():
+            conn = self.connect(path, pragmas)
+            rng = random.Random()
+            samples, errors = [], 0
+            while time.perf_counter() < deadline:
+                product_id = rng.randint(1, options['hot'])
+                start = time.perf_counter()
+                try:
+                    conn.execute(begin)
+                    conn.execute('SELECT stock FROM product WHERE id = ?', (product_id,)).fetchone()
+                    conn.execute('UPDATE product SET stock = stock - 1 WHERE id = ?', (product_id,))
+                    conn.execute('INSERT INTO order_item (product_id, quantity) VALUES (?, 1)', (product_id,))
+                    conn.execute('COMMIT')
+                    samples.append(time.perf_counter() - start)
+                except sqlite3.OperationalError:
+                    errors += 1
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+            conn.close()
+            with lock:
+                stats['writes'] += samples
+                stats['write_errors'] += errors
+
+        def reader():
+            conn = self.connect(path, pragmas)
+            rng = random.Random()
+            samples, errors = [], 0
+            while time.perf_counter() < deadline:
+                after = rng.randint(0, options['products'])
+                start = time.perf_counter()
+                try:
+                    conn.execute('SELECT id, name, price, stock FROM product WHERE id > ? ORDER BY id LIMIT 50',
+                                 (after,)).fetchall()
+                    samples.append(time.perf_counter() - start)
+                except sqlite3.OperationalError:
+                    errors += 1
+            conn.close()
+            with lock:
+                stats['reads'] += samples
+                stats['read_errors'] += errors
+
+        threads = ([threading.Thread(target=writer) for _ in range(options['writers'])] +
+                   [threading.Thread(target=reader) for _ in range(options['readers'])])
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        seconds = options['seconds']
+        return {
+            'pragmas': pragmas,
+            'begin': begin,
+            'writes_per_sec': round(len(stats['writes']) / seconds, 1),
+            'reads_per_sec': round(len(stats['reads']) / seconds, 1),
+            'locked_write_errors': stats['write_errors'],
+            'locked_read_errors': stats['read_errors'],
+            'write_latency': latency_stats(stats['writes']),
+            'read_latency': latency_stats(stats['reads']),
+        }
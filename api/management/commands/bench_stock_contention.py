@@ -0,0 +1,128 @@
+import json
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+
+from api import inventory
+from api.bench import latency_stats
+from api.cache import stock_changed
+from api.models import Category, Product
+
+# flash sale: nhieu thread cung tru kho vai san pham "hot" trong khi reader doc ton kho.
+#   row    - kieu cu: UPDATE api_product SET stock = stock - n WHERE stock >= n
+#   ledger - api/inventory.py: doc ton kho + INSERT StockMovement, 1 thread compact moi --compact-every giay
+# San pham bench duoc tao that trong database (thread khac can thay) va xoa khi xong.
+
+
+class Command(BaseCommand):
+    help = "So sanh tru kho kieu UPDATE Product.stock voi so kho StockMovement khi nhieu request tranh nhau."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--hot', type=int, default=3, help="So san pham ma writer tranh nhau.")
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--compact-every', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        category = Category.objects.create(category_name='bench stock contention')
+        try:
+            products = [
+                Product.objects.create(product_name='bench hot %d' % i, price=10, stock=10 ** 9, category=category)
+                for i in range(options['hot'])
+            ]
+            ids = [product.product_id for product in products]
+            results = {mode: self.run(mode, ids, options) for mode in ('row', 'ledger')}
+            problems = inventory.check_consistency()
+            results['ledger']['consistent'] = not any('Product %d:' % product_id in problem
+                                                      for problem in problems for product_id in ids)
+        finally:
+            Product.objects.filter(category=category).delete()
+            category.delete()
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def take_row(self, product_id):
+        updated = (Product.objects.filter(product_id=product_id, stock__gte=1)
+                   .update(stock=F('stock') - 1))
+        if not updated:
+            raise inventory.InsufficientStock(product_id)
+        stock_changed([product_id])
+
+    def run(self, mode, ids, options):
+        stop = threading.Event()
+        lock = threading.Lock()
+        writes, reads, errors = [], [], {}
+
+        def record(samples, elapsed):
+            with lock:
+                samples.append(elapsed)
+
+        def error(exc):
+            with lock:
+                errors[type(exc).__name__] = errors.get(type(exc).__name__, 0) + 1
+
+        def writer():
+            rng = random.Random()
+            try:
+                while not stop.is_set():
+                    product_id = rng.choice(ids)
+                    start = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            if mode == 'row':
+                                self.take_row(product_id)
+                            else:
+                                inventory.take_stock({product_id: 1})
+                    except (OperationalError, inventory.InsufficientStock) as exc:
+                        error(exc)
+                        continue
+                    record(writes, time.perf_counter() - start)
+            finally:
+                connections.close_all()
+
+        def reader():
+            try:
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    try:
+                        inventory.available_stock(ids)
+                    except OperationalError as exc:
+                        error(exc)
+                        continue
+                    record(reads, time.perf_counter() - start)
+            finally:
+                connections.close_all()
+
+        def compactor():
+            try:
+                while not stop.wait(options['compact_every']):
+                    try:
+                        inventory.compact()
+                    except OperationalError as exc:
+                        error(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=writer) for _ in range(options['writers'])]
+        threads += [threading.Thread(target=reader) for _ in range(options['readers'])]
+        if mode == 'ledger':
+            threads.append(threading.Thread(target=compactor))
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        return {
+            'writes_per_sec': round(len(writes) / elapsed, 1),
+            'reads_per_sec': round(len(reads) / elapsed, 1),
+            'errors': errors,
+            'write_latency': latency_stats(writes),
+            'read_latency': latency_stats(reads),
+        }
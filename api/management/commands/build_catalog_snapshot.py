@@ -0,0 +1,19 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from api import snapshots
+
+
+class Command(BaseCommand):
+    help = "Ghi snapshot catalog (JSON + gzip/brotli) cho /api/catalog/snapshot/, vd sau khi deploy hoac nhap catalog."
+
+    def handle(self, *args, **options):
+        name = snapshots.build_snapshot()
+        path = snapshots.snapshot_dir() / name
+        sizes = ', '.join(
+            f"{label} {os.path.getsize(str(path) + suffix)} bytes"
+            for label, suffix in [('json', '')] + snapshots.ENCODINGS
+            if os.path.exists(str(path) + suffix)
+        )
+        self.stdout.write(self.style.SUCCESS(f"Catalog snapshot {name}: {sizes}."))
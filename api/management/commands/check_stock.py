@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import inventory
+
+
+class Command(BaseCommand):
+    help = "Kiem tra so kho: ton kho khong am, movement cua moi don khop voi OrderItem va status."
+
+    def handle(self, *args, **options):
+        problems = inventory.check_consistency()
+        for problem in problems:
+            self.stdout.write(self.style.ERROR(problem))
+        if problems:
+            raise CommandError(f"{len(problems)} stock ledger problems.")
+        self.stdout.write(self.style.SUCCESS("Stock ledger is consistent."))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api import inventory
+
+
+class Command(BaseCommand):
+    help = "Cong cac stock movement moi vao Product.stock (chay dinh ky, vd cron hoac --every)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, help="Chay lap lai moi N giay thay vi 1 lan.")
+
+    def handle(self, *args, **options):
+        while True:
+            products = inventory.compact()
+            self.stdout.write(f"Compacted stock movements of {products} products.")
+            if not options['every']:
+                return
+            close_old_connections()
+            time.sleep(options['every'])
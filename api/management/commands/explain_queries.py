@@ -0,0 +1,97 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+
+from api.bench import api_client, make_fixture, rolled_back, route_requests, test_environment
+from api.cache import clear_catalog_cache
+from api.routers import archive_alias
+
+# chay EXPLAIN QUERY PLAN tren moi query cua moi view (qua test client, du lieu mau
+# duoc rollback) va bao loi khi co full table scan. Query tren database archive cung duoc kiem tra.
+# Khong tinh la loi: bang nho trong --allow, scan khong WHERE co ORDER BY ... LIMIT di
+# theo thu tu index/rowid (khong can TEMP B-TREE) vi dung lai sau page_size dong.
+
+# route co nhiem vu doc toan bo catalog (xuat file, build snapshot) -> scan la dung
+FULL_DUMP_ROUTES = {'catalog_export', 'catalog_snapshot'}
+EXPLAINABLE = re.compile(r'^\s*(SELECT|UPDATE|DELETE|WITH)\b', re.IGNORECASE)
+# SCAN ... USING COVERING INDEX chi doc index (vd dem facet theo danh muc/gia), khong doc dong cua bang
+FULL_SCAN = re.compile(r'^SCAN (\w+)(?!.*(VIRTUAL TABLE|COVERING INDEX))')
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN QUERY PLAN cho query cua tung view, that bai neu co full table scan."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--allow', default='api_category',
+                            help="Bang duoc phep scan toan bo, cach nhau boi dau phay.")
+        parser.add_argument('--verbose-plans', action='store_true', help="In plan cua tat ca query.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("EXPLAIN QUERY PLAN audit requires SQLite.")
+        # sqlite_master: bang schema (vd archive_ready() kiem tra bang archive da migrate chua)
+        allowed = {table for table in options['allow'].split(',') if table} | {'sqlite_master'}
+        failures = []
+
+        archive = connections[archive_alias()]
+        with test_environment(), rolled_back():
+            fixture = make_fixture()
+            for name, method, path, data, user in route_requests(fixture):
+                client = api_client(user)
+                clear_catalog_cache()
+                with CaptureQueriesContext(connection) as captured, CaptureQueriesContext(archive) as archived:
+                    response = getattr(client, method)(path, data, format='json')
+                self.stdout.write(f"{name} {method.upper()} {path} -> {response.status_code}")
+
+                if name in FULL_DUMP_ROUTES:
+                    continue
+                queries = [(connection, query) for query in captured.captured_queries]
+                if archive is not connection:
+                    queries += [(archive, query) for query in archived.captured_queries]
+                for database, query in queries:
+                    sql = query['sql']
+                    if not EXPLAINABLE.match(sql):
+                        continue
+                    with database.cursor() as cursor:
+                        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                        plan = [row[3] for row in cursor.fetchall()]
+                    problems = self.full_scans(sql, plan, allowed)
+                    if problems or options['verbose_plans']:
+                        self.stdout.write(f"  {sql}")
+                        for line in plan:
+                            self.stdout.write(f"    {line}")
+                    for table in problems:
+                        failures.append(f"{name}: full scan of {table}: {sql}")
+                        self.stdout.write(self.style.ERROR(f"    FULL SCAN {table}"))
+
+        if failures:
+            raise CommandError(f"{len(failures)} queries do a full table scan.")
+        self.stdout.write(self.style.SUCCESS("No full table scans."))
+
+    def full_scans(self, sql, plan, allowed):
+        # trang dau cua danh sach: khong WHERE, ORDER BY theo index/rowid, LIMIT -> chi doc page_size dong
+        # WHERE trong subquery (vd ton kho tinh tu api_stockmovement) khong tinh
+        outer = self.strip_subqueries(sql)
+        bounded = (re.search(r'\bORDER BY\b.*\bLIMIT\b', outer, re.IGNORECASE | re.DOTALL)
+                   and not re.search(r'\bWHERE\b', outer, re.IGNORECASE)
+                   and not any('TEMP B-TREE' in line for line in plan))
+        problems = []
+        for line in plan:
+            match = FULL_SCAN.match(line)
+            if match and match.group(1) not in allowed and not bounded:
+                problems.append(match.group(1))
+        return problems
+
+    def strip_subqueries(self, sql):
+        """Bo noi dung trong ngoac (subquery, ham) de chi con query ngoai cung."""
+        depth, outer = 0, []
+        for char in sql:
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+            elif depth == 0:
+                outer.append(char)
+        return ''.join(outer)
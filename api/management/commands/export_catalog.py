@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api import catalog_io
+
+
+class Command(BaseCommand):
+    help = "Xuat products/categories ra NDJSON hoac CSV, doc database theo chunk (bo nho khong doi)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=catalog_io.KINDS, default='products')
+        parser.add_argument('--type', dest='file_type', choices=catalog_io.FORMATS, default='ndjson')
+        parser.add_argument('--output', '-o', default='-', help="Duong dan file, '-' (mac dinh) la stdout.")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        chunks = catalog_io.export_chunks(options['kind'], options['file_type'], max(1, options['chunk_size']))
+        if options['output'] == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
+            return
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
@@ -0,0 +1,34 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import catalog_io
+
+
+class Command(BaseCommand):
+    help = "Nhap products/categories tu file NDJSON hoac CSV (upsert theo id, tung lo 1 transaction)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Duong dan file, '-' de doc tu stdin.")
+        parser.add_argument('--kind', choices=catalog_io.KINDS, default='products')
+        parser.add_argument('--type', dest='file_type', choices=catalog_io.FORMATS,
+                            help="Mac dinh theo duoi file (.csv/.ndjson/.jsonl), khong thi ndjson.")
+        parser.add_argument('--batch-size', type=int, help="Mac dinh settings.CATALOG_IMPORT_BATCH_SIZE.")
+
+    def handle(self, *args, **options):
+        file_type = options['file_type'] or catalog_io.guess_format(options['path'])
+        importer = catalog_io.CatalogImport(options['kind'], options['batch_size'])
+        try:
+            if options['path'] == '-':
+                report = importer.run(sys.stdin.buffer, file_type)
+            else:
+                with open(options['path'], 'rb') as stream:
+                    report = importer.run(stream, file_type)
+        except (OSError, catalog_io.CatalogFileError) as exc:
+            raise CommandError(str(exc))
+        for error in report['errors']:
+            self.stderr.write(f"line {error['line']}: {json.dumps(error['errors'])}")
+        summary = (f"Imported {report['kind']}: {report['created']} created, {report['updated']} updated, "
+                   f"{report['error_count']} rows with errors.")
+        self.stdout.write(self.style.SUCCESS(summary) if not report['error_count'] else summary)
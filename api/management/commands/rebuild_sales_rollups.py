@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import sales
+from api.models import DailyCategorySales, DailyProductSales, DailySales
+
+
+def _day(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = "Tinh lai (hoac backfill) cac bang tong hop doanh thu tu Order/OrderItem."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', type=_day, help="Ngay bat dau (YYYY-MM-DD), mac dinh tu dau.")
+        parser.add_argument('--to', dest='end', type=_day, help="Ngay ket thuc (YYYY-MM-DD), mac dinh toi nay.")
+
+    def handle(self, *args, **options):
+        sales.rebuild(options['start'], options['end'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Sales rollups rebuilt ({DailySales.objects.count()} days, "
+            f"{DailyProductSales.objects.count()} product rows, {DailyCategorySales.objects.count()} category rows)."
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = "Tao lai bang/trigger FTS5 cua san pham (neu thieu) va rebuild toan bo index."
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Full-text search requires SQLite.")
+        with transaction.atomic(), connection.cursor() as cursor:
+            search.install(cursor)
+            search.rebuild(cursor)
+            cursor.execute(f"SELECT count(*) FROM {search.FTS_TABLE}_docsize")
+            count = cursor.fetchone()[0]
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt ({count} products)."))
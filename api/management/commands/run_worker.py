@@ -0,0 +1,93 @@
+import signal
+import subprocess
+import sys
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connections
+
+from api import inventory, tasks
+
+
+class Command(BaseCommand):
+    help = "Chay task trong hang doi api_task (api/tasks.py) bang --threads thread, --processes process."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, help="So thread moi process, mac dinh TASK_QUEUE['THREADS'].")
+        parser.add_argument('--processes', type=int, default=1,
+                            help="So process worker (moi process chay lai lenh nay voi --processes 1).")
+        parser.add_argument('--poll', type=float, help="So giay cho khi hang doi trong, mac dinh TASK_QUEUE['POLL_INTERVAL'].")
+        parser.add_argument('--burst', action='store_true', help="Chay het task den han roi thoat.")
+
+    def handle(self, *args, **options):
+        threads = max(1, options['threads'] or tasks.option('THREADS'))
+        poll = options['poll'] if options['poll'] is not None else tasks.option('POLL_INTERVAL')
+        if options['processes'] > 1:
+            return self.supervise(options['processes'], threads, poll, options['burst'])
+
+        inventory.schedule_compaction()
+        stop = threading.Event()
+        done = {'count': 0}
+        lock = threading.Lock()
+
+        def work():
+            errors = 0
+            while not stop.is_set():
+                close_old_connections()
+                try:
+                    job = tasks.claim()
+                    if job is not None:
+                        tasks.execute(job)
+                except DatabaseError:
+                    # database bi khoa qua busy_timeout, file loi...: task dang chay (neu co) duoc lay
+                    # lai sau locked_until, thread doi backoff roi lay tiep thay vi chet
+                    errors += 1
+                    delay = min(tasks.option('BACKOFF') * 2 ** (errors - 1), tasks.option('BACKOFF_MAX'))
+                    tasks.logger.exception("Task queue database error, retry in %.1fs", delay)
+                    stop.wait(delay)
+                    continue
+                errors = 0
+                if job is None:
+                    if options['burst']:
+                        return
+                    stop.wait(poll)
+                    continue
+                with lock:
+                    done['count'] += 1
+
+        def work_in_thread():
+            try:
+                work()
+            finally:
+                connections.close_all()
+
+        handlers = {signum: signal.signal(signum, lambda *args: stop.set()) for signum in (signal.SIGINT, signal.SIGTERM)}
+        try:
+            if threads == 1:
+                work()
+            else:
+                workers = [threading.Thread(target=work_in_thread, name='task-worker-%d' % i) for i in range(threads)]
+                for worker in workers:
+                    worker.start()
+                # join co timeout de main thread van nhan duoc signal
+                for worker in workers:
+                    while worker.is_alive():
+                        worker.join(0.5)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        self.stdout.write(f"Worker stopped after {done['count']} tasks.")
+
+    def supervise(self, processes, threads, poll, burst):
+        command = [sys.executable, sys.argv[0], 'run_worker', '--processes', '1',
+                   '--threads', str(threads), '--poll', str(poll)] + (['--burst'] if burst else [])
+        children = [subprocess.Popen(command) for _ in range(processes)]
+
+        def forward(signum, frame):
+            for child in children:
+                child.send_signal(signum)
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, forward)
+        for child in children:
+            child.wait()
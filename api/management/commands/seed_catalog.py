@@ -0,0 +1,149 @@
+import json
+import random
+import secrets
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api import sales
+from api.cache import catalog_changed
+from api.models import CartItem, Category, Order, OrderItem, Product
+
+# sinh du lieu mau de benchmark: vai danh muc lon nhieu danh muc nho, gia log-normal,
+# do pho bien san pham theo Zipf (vai san pham ban chay chiem phan lon gio hang/don hang),
+# so don moi user lech (phan lon user it don). Ghi bang bulk_create theo lo --batch-size
+# trong 1 transaction. Cung --seed thi cung du lieu (tru username).
+
+STATUSES = (('pending', 10), ('processing', 15), ('paid', 25), ('shipped', 40), ('canceled', 10))
+WORDS = ('điện thoại', 'laptop', 'tai nghe', 'bàn phím', 'chuột', 'màn hình', 'sạc', 'ốp lưng',
+         'đồng hồ', 'loa', 'máy ảnh', 'áo thun', 'giày', 'balo', 'sách', 'nồi cơm', 'quạt', 'đèn')
+ADJECTIVES = ('cao cấp', 'giá rẻ', 'chính hãng', 'mini', 'pro', 'không dây', 'chống nước', 'thông minh')
+
+
+class Command(BaseCommand):
+    help = "Sinh categories/products/users/cart items/orders mau bang bulk insert."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--cart-items', type=int, default=5000)
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--max-order-items', type=int, default=6)
+        parser.add_argument('--days', type=int, default=180, help="Don hang rai deu trong N ngay gan nhat.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prefix', default='seed', help="Tien to username.")
+
+    def handle(self, *args, **options):
+        for name in ('categories', 'products', 'users'):
+            if options[name] < 1:
+                raise CommandError(f"--{name} must be at least 1.")
+        if options['cart_items'] > options['users'] * options['products']:
+            raise CommandError("--cart-items exceeds users x products.")
+        rng = random.Random(options['seed'])
+        batch = options['batch_size']
+
+        with transaction.atomic():
+            categories = self.seed_categories(rng, options['categories'], batch)
+            products = self.seed_products(rng, categories, options['products'], batch)
+            users = self.seed_users(options['prefix'], options['users'], batch)
+            popularity = self.zipf(rng, range(len(products)))
+            cart_items = self.seed_cart(rng, users, products, popularity, options['cart_items'], batch)
+            orders, order_items = self.seed_orders(rng, users, products, popularity, options, batch)
+            catalog_changed()
+
+        self.stdout.write(json.dumps({
+            'categories': len(categories),
+            'products': len(products),
+            'users': len(users),
+            'cart_items': cart_items,
+            'orders': orders,
+            'order_items': order_items,
+        }, indent=2))
+
+    def zipf(self, rng, population, exponent=1.1):
+        """Ham chon ngau nhien 1 phan tu, phan tu dung truoc hay duoc chon hon (Zipf)."""
+        cum_weights = list(accumulate(1 / (rank ** exponent) for rank in range(1, len(population) + 1)))
+        return lambda: rng.choices(population, cum_weights=cum_weights)[0]
+
+    def seed_categories(self, rng, count, batch):
+        return Category.objects.bulk_create(
+            [Category(category_name='%s %d' % (rng.choice(WORDS).capitalize(), i)) for i in range(count)],
+            batch_size=batch,
+        )
+
+    def seed_products(self, rng, categories, count, batch):
+        # kich thuoc danh muc cung theo Zipf
+        category = self.zipf(rng, categories, 0.8)
+        products = []
+        for i in range(count):
+            name = '%s %s %d' % (rng.choice(WORDS).capitalize(), rng.choice(ADJECTIVES), i)
+            products.append(Product(
+                product_name=name,
+                product_description=None if rng.random() < 0.1 else '%s, %s.' % (name, rng.choice(ADJECTIVES)),
+                price=Decimal('%.2f' % min(rng.lognormvariate(5, 1.2), 99999999)),
+                discountPercentage=None if rng.random() < 0.6 else Decimal(rng.choice((5, 10, 15, 20, 30, 50))),
+                stock=0 if rng.random() < 0.05 else int(rng.expovariate(1 / 100)) + 1,
+                image_url='https://cdn.example.com/products/%d.jpg' % i,
+                category=category(),
+            ))
+        return Product.objects.bulk_create(products, batch_size=batch)
+
+    def seed_users(self, prefix, count, batch):
+        # khong hash mat khau (user mau khong dang nhap duoc), tranh ton hang phut CPU
+        run = secrets.token_hex(3)
+        password = make_password(None)
+        return User.objects.bulk_create([
+            User(username='%s-%s-%d' % (prefix, run, i), email='%s-%s-%d@example.com' % (prefix, run, i),
+                 password=password)
+            for i in range(count)
+        ], batch_size=batch)
+
+    def seed_cart(self, rng, users, products, popularity, count, batch):
+        pairs = set()
+        for _ in range(count * 20):
+            if len(pairs) >= count:
+                break
+            pairs.add((rng.randrange(len(users)), popularity()))
+        CartItem.objects.bulk_create([
+            CartItem(user=users[u], product=products[p], quantity=rng.choice((1, 1, 1, 2, 2, 3)))
+            for u, p in sorted(pairs)
+        ], batch_size=batch)
+        return len(pairs)
+
+    def seed_orders(self, rng, users, products, popularity, options, batch):
+        # phan lon don hang thuoc ve mot nhom nho user mua nhieu
+        customer = self.zipf(rng, users, 0.7)
+        statuses, status_weights = zip(*STATUSES)
+        now = timezone.now()
+        orders, lines = [], []
+        for _ in range(options['orders']):
+            order = Order(customer=customer(), address='Số %d, Hà Nội' % rng.randint(1, 500),
+                          phone='09%08d' % rng.randrange(10 ** 8), status=rng.choices(statuses, status_weights)[0])
+            picked = {popularity() for _ in range(rng.randint(1, options['max_order_items']))}
+            items = [(products[p], rng.choice((1, 1, 1, 2, 3))) for p in picked]
+            order.total = sum(product.price * quantity for product, quantity in items)
+            orders.append(order)
+            lines.append(items)
+        orders = Order.objects.bulk_create(orders, batch_size=batch)
+
+        # time_create la auto_now_add nen gan lai ngay sau khi insert
+        for order in orders:
+            order.time_create = now - timedelta(seconds=rng.uniform(0, options['days'] * 86400))
+        Order.objects.bulk_update(orders, ['time_create'], batch_size=batch)
+
+        order_items = OrderItem.objects.bulk_create([
+            # price la thanh tien cua dong, giong place_order
+            OrderItem(order=order, product=product, quantity=quantity, price=product.price * quantity)
+            for order, items in zip(orders, lines) for product, quantity in items
+        ], batch_size=batch)
+        # bulk_create khong qua place_order nen tinh lai bang tong hop doanh thu
+        sales.rebuild()
+        return len(orders), len(order_items)
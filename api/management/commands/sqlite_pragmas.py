@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.sqlite import get_pragmas, read_pragmas
+
+
+class Command(BaseCommand):
+    help = "In gia tri PRAGMA dang co hieu luc tren ket noi SQLite."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"Database '{options['database']}' is not SQLite.")
+
+        configured = get_pragmas()
+        names = list(dict.fromkeys([*configured, 'journal_mode', 'synchronous', 'busy_timeout',
+                                    'mmap_size', 'cache_size', 'temp_store', 'foreign_keys']))
+        with connection.cursor() as cursor:
+            effective = read_pragmas(cursor, names)
+
+        width = max(len(name) for name in [*names, 'transaction_mode'])
+        for name in names:
+            wanted = f"  (configured: {configured[name]})" if name in configured else ""
+            self.stdout.write(f"{name.ljust(width)} = {effective[name]}{wanted}")
+        settings_dict = connection.settings_dict
+        self.stdout.write(f"{'conn_max_age'.ljust(width)} = {settings_dict['CONN_MAX_AGE']}")
+        self.stdout.write(f"{'transaction_mode'.ljust(width)} = "
+                          f"{settings_dict['OPTIONS'].get('transaction_mode') or 'DEFERRED'}")
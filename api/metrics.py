@@ -0,0 +1,224 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# do thoi gian tung request theo ten view: tong thoi gian, so query + thoi gian SQL
+# (qua execute wrapper gan vao moi connection), thoi gian render, so byte.
+# Render = dung dict tu .values() (api/rows.py, @timed_render) + render JSON, o dau thi dem o do:
+# TemplateResponse cua DRF (process_template_response), cache_catalog_response render trong
+# view, render_json cua view async. SQL chay trong luc render (queryset lazy) khong tinh vao render.
+# Gom thanh histogram trong process, xem o /api/_metrics (format Prometheus, chi staff).
+# Chi ton vai lan perf_counter() va 1 lock moi request nen de bat ca tren production.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar('api_request_timing', default=None)
+
+
+class RequestTiming:
+    __slots__ = ('start', 'sql_queries', 'sql_seconds', 'render_start', 'render_seconds', 'rendering')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.render_start = None
+        self.render_seconds = 0.0
+        self.rendering = False
+
+
+class ViewStats:
+    __slots__ = ('count', 'seconds', 'buckets', 'sql_queries', 'sql_seconds', 'render_seconds', 'bytes')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.render_seconds = 0.0
+        self.bytes = 0
+
+
+class Registry:
+
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def record(self, view, seconds, timing, size):
+        with self._lock:
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = ViewStats()
+            stats.count += 1
+            stats.seconds += seconds
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    stats.buckets[i] += 1
+                    break
+            stats.sql_queries += timing.sql_queries
+            stats.sql_seconds += timing.sql_seconds
+            stats.render_seconds += timing.render_seconds
+            stats.bytes += size
+
+    def snapshot(self):
+        with self._lock:
+            return {view: _copy(stats) for view, stats in self._views.items()}
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+
+def _copy(stats):
+    copied = ViewStats()
+    for name in ViewStats.__slots__:
+        value = getattr(stats, name)
+        setattr(copied, name, list(value) if name == 'buckets' else value)
+    return copied
+
+
+registry = Registry()
+
+
+def sql_timer(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.sql_queries += 1
+        timing.sql_seconds += time.perf_counter() - start
+
+
+@contextmanager
+def render_time():
+    """Cong thoi gian cua khoi lenh vao render cua request hien tai, long nhau chi tinh khoi ngoai."""
+    timing = _current.get()
+    if timing is None or timing.rendering:
+        yield
+        return
+    timing.rendering = True
+    start, sql_seconds = time.perf_counter(), timing.sql_seconds
+    try:
+        yield
+    finally:
+        timing.rendering = False
+        timing.render_seconds += time.perf_counter() - start - (timing.sql_seconds - sql_seconds)
+
+
+def timed_render(func):
+    @wraps(func)
+    def wrapped(*args, **kwargs):
+        with render_time():
+            return func(*args, **kwargs)
+    return wrapped
+
+
+def install_sql_timer(sender, connection, **kwargs):
+    # execute_wrappers nam tren DatabaseWrapper, ton tai qua cac lan ket noi lai
+    if sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, sql_timer)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None and match.view_name else 'unmatched'
+
+
+class PerformanceMiddleware:
+    """Dat dau MIDDLEWARE de do ca thoi gian cua cac middleware khac."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'SERVER_TIMING_HEADER', True)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timing)
+
+    async def __acall__(self, request):
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timing)
+
+    def process_template_response(self, request, response):
+        # DRF Response render ngay sau buoc nay (response da render trong view, vd cache_catalog_response,
+        # thi callback chay ngay va cong ~0)
+        timing = _current.get()
+        if timing is not None:
+            timing.render_start = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: self._rendered(timing))
+        return response
+
+    def _rendered(self, timing):
+        timing.render_seconds += time.perf_counter() - timing.render_start
+
+    def finish(self, request, response, timing):
+        seconds = time.perf_counter() - timing.start
+        size = 0 if response.streaming else len(response.content)
+        registry.record(_view_name(request), seconds, timing, size)
+        if self.server_timing:
+            response['Server-Timing'] = (
+                'total;dur=%.3f, sql;dur=%.3f;desc="%d queries", render;dur=%.3f'
+                % (seconds * 1000, timing.sql_seconds * 1000, timing.sql_queries, timing.render_seconds * 1000)
+            )
+        return response
+
+
+def render_prometheus(snapshot=None):
+    snapshot = registry.snapshot() if snapshot is None else snapshot
+    lines = [
+        '# HELP api_request_duration_seconds Request latency by view.',
+        '# TYPE api_request_duration_seconds histogram',
+    ]
+    for view, stats in sorted(snapshot.items()):
+        label = _label(view)
+        cumulative = 0
+        for bound, count in zip(BUCKETS, stats.buckets):
+            cumulative += count
+            lines.append('api_request_duration_seconds_bucket{view="%s",le="%s"} %d' % (label, bound, cumulative))
+        lines.append('api_request_duration_seconds_bucket{view="%s",le="+Inf"} %d' % (label, stats.count))
+        lines.append('api_request_duration_seconds_sum{view="%s"} %.6f' % (label, stats.seconds))
+        lines.append('api_request_duration_seconds_count{view="%s"} %d' % (label, stats.count))
+
+    counters = (
+        ('api_sql_queries_total', 'SQL queries executed by view.', 'sql_queries', '%d'),
+        ('api_sql_duration_seconds_total', 'Time spent in SQL by view.', 'sql_seconds', '%.6f'),
+        ('api_render_duration_seconds_total', 'Time spent rendering responses by view.', 'render_seconds', '%.6f'),
+        ('api_response_bytes_total', 'Response body bytes by view.', 'bytes', '%d'),
+    )
+    for name, help_text, attr, fmt in counters:
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s counter' % name)
+        for view, stats in sorted(snapshot.items()):
+            lines.append(('%s{view="%s"} ' + fmt) % (name, _label(view), getattr(stats, attr)))
+    return '\n'.join(lines) + '\n'
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,58 @@
+from django.db import migrations
+
+# SQL chep nguyen vao day (khong import api.search): migration phai giu dung schema
+# tai thoi diem nay du sau nay api/search.py thay doi
+
+INSTALL_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS api_product_fts USING fts5(
+        product_name, product_description,
+        content='api_product', content_rowid='product_id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS api_product_fts_ai AFTER INSERT ON api_product BEGIN
+        INSERT INTO api_product_fts(rowid, product_name, product_description)
+        VALUES (new.product_id, new.product_name, new.product_description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS api_product_fts_ad AFTER DELETE ON api_product BEGIN
+        INSERT INTO api_product_fts(api_product_fts, rowid, product_name, product_description)
+        VALUES ('delete', old.product_id, old.product_name, old.product_description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS api_product_fts_au AFTER UPDATE OF product_name, product_description
+    ON api_product BEGIN
+        INSERT INTO api_product_fts(api_product_fts, rowid, product_name, product_description)
+        VALUES ('delete', old.product_id, old.product_name, old.product_description);
+        INSERT INTO api_product_fts(rowid, product_name, product_description)
+        VALUES (new.product_id, new.product_name, new.product_description);
+    END""",
+    "INSERT INTO api_product_fts(api_product_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    "INSERT INTO api_product_fts(api_product_fts) VALUES ('rebuild')",
+    "INSERT INTO api_product_fts(api_product_fts) VALUES ('optimize')",
+]
+
+UNINSTALL_SQL = [
+    "DROP TRIGGER IF EXISTS api_product_fts_ai",
+    "DROP TRIGGER IF EXISTS api_product_fts_ad",
+    "DROP TRIGGER IF EXISTS api_product_fts_au",
+    "DROP TABLE IF EXISTS api_product_fts",
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        with schema_editor.connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_order_note_order_phone'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(INSTALL_SQL), run(UNINSTALL_SQL)),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:37
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_cart_items(apps, schema_editor):
+    # gop cac dong trung (user, product) truoc khi them unique constraint
+    CartItem = apps.get_model('api', 'CartItem')
+    duplicates = (CartItem.objects.values('user', 'product')
+                  .annotate(keep=Min('cart_item_id'), total=Sum('quantity'), rows=Count('cart_item_id'))
+                  .filter(rows__gt=1))
+    for row in duplicates:
+        CartItem.objects.filter(cart_item_id=row['keep']).update(quantity=row['total'])
+        CartItem.objects.filter(user=row['user'], product=row['product']).exclude(cart_item_id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_product_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', '-time_create', '-id'], name='order_customer_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'price'], name='product_category_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price'], name='product_price_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_cart_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='unique_cart_item_user_product'),
+        ),
+        # RegisterSerializer.validate kiem tra email da ton tai
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS api_auth_user_email_idx ON auth_user (email)',
+            'DROP INDEX IF EXISTS api_auth_user_email_idx',
+        ),
+    ]
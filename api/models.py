@@ -1,6 +1,7 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 # Create your models here.
 class Category(models.Model):
@@ -23,9 +24,18 @@ class Product(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(100)]
     )
     stock = models.IntegerField(blank=True, null=True, validators=[MinValueValidator(0)])
+    # id StockMovement cuoi cung da cong vao stock (api/inventory.py)
+    stock_through = models.BigIntegerField(blank=True, null=True, editable=False)
     image_url = models.CharField(max_length=255, blank=True, null=True)
     category = models.ForeignKey(Category, models.CASCADE, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # filter_products: loc theo category, sap xep/phan trang theo (price, product_id)
+            models.Index(fields=['category', 'price'], name='product_category_price_idx'),
+            models.Index(fields=['price'], name='product_price_idx'),
+        ]
+
     def __str__(self):
         return self.product_name
 
@@ -35,6 +45,12 @@ class CartItem(models.Model):
     product = models.ForeignKey(Product, models.CASCADE, blank=False, null=False)
     quantity = models.IntegerField(validators=[MinValueValidator(1)])
 
+    class Meta:
+        constraints = [
+            # moi san pham chi co 1 dong trong gio hang cua 1 user
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_cart_item_user_product'),
+        ]
+
     def __str__(self):
         return f"{self.product.product_name} x {self.quantity} ({self.user.username})"
 
@@ -57,6 +73,12 @@ class Order(models.Model):
         default='pending'
     )
 
+    class Meta:
+        indexes = [
+            # orders_list: order cua 1 user, moi nhat truoc (-time_create, -id)
+            models.Index(fields=['customer', '-time_create', '-id'], name='order_customer_time_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} by {self.customer or 'Deleted user'}"
 
@@ -68,4 +90,133 @@ class OrderItem(models.Model):
 
     def __str__(self):
         product_name = self.product.product_name if self.product else "Deleted Product"
-        return f"{product_name} x {self.quantity}"
\ No newline at end of file
+        return f"{product_name} x {self.quantity}"
+
+# so kho chi ghi them (api/inventory.py): moi lan dat/huy don ghi 1 dong thay doi so luong,
+# khong sua dong Product. Ton kho = Product.stock + cac dong co id > Product.stock_through.
+class StockMovement(models.Model):
+    REASONS = [
+        ('order', 'Order'),
+        ('cancel', 'Cancel'),
+        ('adjust', 'Adjust'),
+    ]
+    product = models.ForeignKey(Product, models.CASCADE, related_name='stock_movements')
+    quantity = models.IntegerField()
+    reason = models.CharField(max_length=10, choices=REASONS)
+    order = models.ForeignKey('Order', models.SET_NULL, blank=True, null=True, related_name='stock_movements')
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # ton kho: cac dong cua 1 san pham sau stock_through
+            models.Index(fields=['product', 'id'], name='stock_movement_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.quantity:+d} ({self.reason})"
+
+
+# bang tong hop doanh thu theo ngay (api/sales.py): cong don khi tao/huy don,
+# tinh lai tu Order/OrderItem bang lenh rebuild_sales_rollups. Don da huy khong tinh.
+# product/category khong co khoa ngoai that de giu lich su khi san pham bi xoa.
+class DailySales(models.Model):
+    day = models.DateField(unique=True)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.IntegerField(default=0)
+    orders = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.revenue}"
+
+class DailyProductSales(models.Model):
+    day = models.DateField()
+    product = models.ForeignKey(Product, models.DO_NOTHING, null=True, db_constraint=False, related_name='+')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.IntegerField(default=0)
+    orders = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='unique_daily_product_sales'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} product {self.product_id}: {self.revenue}"
+
+class DailyCategorySales(models.Model):
+    day = models.DateField()
+    category = models.ForeignKey(Category, models.DO_NOTHING, null=True, db_constraint=False, related_name='+')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.IntegerField(default=0)
+    orders = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category'], name='unique_daily_category_sales'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} category {self.category_id}: {self.revenue}"
+
+
+# hang doi task chay nen (api/tasks.py, lenh run_worker): cung database voi don hang nen
+# enqueue trong transaction cua request chi ghi them 1 dong, commit/rollback cung luc.
+# Task xong thi xoa dong, het so lan thu thi de lai voi status 'failed'.
+class Task(models.Model):
+    STATUS = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+    name = models.CharField(max_length=200)  # duong dan ham, vd api.sales.record_order_task
+    payload = models.JSONField(default=dict)  # {"args": [...], "kwargs": {...}}
+    status = models.CharField(max_length=10, choices=STATUS, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    # dang chay: het han ma chua xong (worker chet, treo) thi worker khac lay lai
+    locked_until = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='task_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+# don hang da luu tru (api/archive.py, lenh archive_orders): nam o database ARCHIVE_DATABASE
+# (file rieng) de bang api_order cua database chinh nho lai. Giu nguyen id va cac cot cua
+# Order/OrderItem; User/Product o database khac nen khoa ngoai khong co constraint, khong join.
+class ArchivedOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    customer = models.ForeignKey(User, models.DO_NOTHING, null=True, db_constraint=False, related_name='+')
+    address = models.CharField(max_length=255)
+    phone = models.CharField(max_length=20)
+    note = models.TextField(blank=True, null=True)
+    time_create = models.DateTimeField()
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # orders_list: cung thu tu voi order_customer_time_idx
+            models.Index(fields=['customer', '-time_create', '-id'], name='archived_order_customer_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order {self.id}"
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, models.DO_NOTHING, null=True, db_constraint=False, related_name='+')
+    quantity = models.IntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.product_id} x {self.quantity}"
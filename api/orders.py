@@ -0,0 +1,109 @@
+from django.db import transaction
+
+from .inventory import InsufficientStock, return_stock, take_stock
+from .models import CartItem, Order, OrderItem, Product
+from .sales import record_order_task
+from .tasks import enqueue
+
+# pipeline tao don hang: toan bo nam trong 1 transaction, loi o buoc nao
+# cung rollback het, khong de lai don hang lo lung.
+
+
+NOT_CANCELABLE = ('paid', 'shipped', 'canceled')
+
+
+class OrderError(Exception):
+    pass
+
+
+def _positive_int(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def parse_cart_items(cart_items):
+    """Gom cartItems thanh {product_id: quantity}, cung san pham thi cong don."""
+    if not isinstance(cart_items, list):
+        raise OrderError("cartItems must be a list.")
+    quantities = {}
+    for item in cart_items:
+        if not isinstance(item, dict):
+            raise OrderError("Invalid cart item.")
+        product_id = _positive_int(item.get("product_id"))
+        if product_id is None:
+            raise OrderError(f"Product {item.get('product_id')} not found.")
+        quantity = _positive_int(item.get("quantity", 1))
+        if quantity is None:
+            raise OrderError(f"Invalid quantity for product {product_id}.")
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def place_order(user, cart_items, address, phone, note):
+    quantities = parse_cart_items(cart_items)
+    if not quantities:
+        raise OrderError("Your Cart is empty.")
+
+    with transaction.atomic():
+        products = Product.objects.in_bulk(list(quantities))
+        for product_id in quantities:
+            if product_id not in products:
+                raise OrderError(f"Product {product_id} not found.")
+
+        items = []
+        total = 0  # tong tien
+        for product_id, quantity in quantities.items():
+            product = products[product_id]
+            items.append(OrderItem(product=product, quantity=quantity, price=product.price * quantity))
+            total += product.price * quantity
+
+        order = Order.objects.create(
+            customer=user,
+            address=address,
+            phone=phone,
+            note=note,
+            total=total,
+            status="processing"
+        )
+        # tru kho = ghi movement gan voi don hang, khong sua dong Product
+        try:
+            take_stock(quantities, order)
+        except InsufficientStock as exc:
+            # san pham bi xoa sau in_bulk (database khong khoa ca transaction nhu SQLite)
+            if exc.missing:
+                raise OrderError(f"Product {exc.product_id} not found.")
+            raise OrderError(f"Not enough stock for {products[exc.product_id].product_name}.")
+        for item in items:
+            item.order = order
+        OrderItem.objects.bulk_create(items)
+        # bang tong hop doanh thu: worker cap nhat sau (api/sales.py)
+        enqueue(record_order_task, order.id)
+
+        CartItem.objects.filter(user=user).delete()
+
+    return order
+
+
+def cancel(order):
+    """Huy don, tra hang vao kho va tru khoi bang tong hop doanh thu."""
+    with transaction.atomic():
+        # kiem tra status ngay trong UPDATE: 2 request huy cung 1 don thi chi 1 request tra kho
+        canceled = (Order.objects.filter(pk=order.pk).exclude(status__in=NOT_CANCELABLE)
+                    .update(status='canceled'))
+        if not canceled:
+            order.refresh_from_db(fields=['status'])
+            raise OrderError(f"Cannot cancel an order with status '{order.status}'.")
+        order.status = 'canceled'
+
+        quantities = {}
+        for product_id, quantity in order.items.filter(product__isnull=False).values_list('product_id', 'quantity'):
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        if quantities:
+            return_stock(quantities, order)
+        enqueue(record_order_task, order.id, -1)
+    return order
@@ -0,0 +1,107 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ParseError
+
+# keyset (cursor) pagination: trang sau duoc loc bang WHERE tren khoa sap xep,
+# khong dung OFFSET nen trang N ton chi phi nhu trang 1.
+# ordering la list ten field, '-' o dau la giam dan, field cuoi phai la khoa duy nhat.
+
+
+class InvalidCursor(ParseError):
+    default_detail = 'Invalid cursor.'
+    default_code = 'invalid_cursor'
+
+
+def _params(request):
+    # Request cua DRF (query_params) hoac HttpRequest cua view async (GET)
+    return getattr(request, 'query_params', request.GET)
+
+
+def get_page_size(request):
+    default = getattr(settings, 'API_PAGE_SIZE', 50)
+    maximum = getattr(settings, 'API_MAX_PAGE_SIZE', 200)
+    try:
+        size = int(_params(request).get('page_size', default))
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+def encode_cursor(ordering, values):
+    payload = {'o': ','.join(ordering), 'v': [str(value) for value in values]}
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, ordering):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = payload['v']
+        signature = payload['o']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor()
+    # cursor cua cach sap xep khac khong dung lai duoc
+    if signature != ','.join(ordering) or not isinstance(values, list) or len(values) != len(ordering):
+        raise InvalidCursor()
+    return values
+
+
+def _split(field):
+    return (field[1:], True) if field.startswith('-') else (field, False)
+
+
+def keyset_filter(ordering, values):
+    """(a, b) > (x, y) viet thanh a > x OR (a = x AND b > y)."""
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name, descending = _split(field)
+        lookup = '%s__%s' % (name, 'lt' if descending else 'gt')
+        condition |= Q(**equal, **{lookup: value})
+        equal[name] = value
+    # them can tren cot dau de SQLite mo range scan tren index
+    name, descending = _split(ordering[0])
+    bound = Q(**{'%s__%s' % (name, 'lte' if descending else 'gte'): values[0]})
+    return bound & condition
+
+
+def page_queryset(queryset, ordering, cursor, page_size):
+    """Queryset cua 1 trang, lay du 1 dong de biet con trang sau hay khong."""
+    if cursor:
+        values = decode_cursor(cursor, ordering)
+        try:
+            queryset = queryset.filter(keyset_filter(ordering, values))
+        except (ValidationError, ValueError, TypeError):
+            raise InvalidCursor()
+    return queryset.order_by(*ordering)[:page_size + 1]
+
+
+def _key(row, name):
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+def split_page(rows, ordering, page_size):
+    """Tach dong thua ra khoi trang va tao cursor cho trang sau."""
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    last = rows[-1]
+    return rows, encode_cursor(ordering, [_key(last, _split(field)[0]) for field in ordering])
+
+
+def paginate(request, queryset, ordering):
+    page_size = get_page_size(request)
+    queryset = page_queryset(queryset, ordering, _params(request).get('cursor'), page_size)
+    return split_page(list(queryset), ordering, page_size)
+
+
+async def apaginate(request, queryset, ordering):
+    page_size = get_page_size(request)
+    queryset = page_queryset(queryset, ordering, _params(request).get('cursor'), page_size)
+    return split_page([row async for row in queryset], ordering, page_size)
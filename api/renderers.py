@@ -0,0 +1,60 @@
+import math
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+from .metrics import timed_render
+
+try:
+    import orjson
+except ImportError:  # orjson la tuy chon, khong co thi dung json cua DRF
+    orjson = None
+
+_default = encoders.JSONEncoder().default
+
+
+def _encode(obj):
+    # datetime/date/time (OPT_PASSTHROUGH_DATETIME), Decimal... qua encoder cua DRF:
+    # datetime UTC ra '...Z' nhu DRF thay vi '+00:00' cua orjson
+    value = _default(obj)
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ValueError("Out of range float values are not JSON compliant")
+    return value
+
+
+def _has_non_finite(data):
+    # orjson ghi NaN/Infinity thanh null, DRF (strict) bao ValueError
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if type(value) is float:
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer dung orjson, ket qua giong het byte voi JSONRenderer cua DRF
+    (compact, khong escape unicode, escape U+2028/U+2029, datetime nhu DRF)."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {})):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_encode, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            # kieu orjson khong ho tro, hoac so khong huu han: DRF render (va bao loi nhu DRF)
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'null' in ret and _has_non_finite(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+@timed_render
+def render_json(data):
+    return FastJSONRenderer().render(data)
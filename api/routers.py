@@ -0,0 +1,93 @@
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# tach doc/ghi: doc (catalog, lich su don hang...) qua alias READ_DATABASE (mac dinh
+# 'replica', cung file SQLite mo voi mode=ro), ghi qua 'default'.
+# Doc qua 'default' khi:
+#   - dang trong transaction cua 'default' (vd place_order doc ton kho truoc khi ghi)
+#   - request hien tai da ghi (read-your-writes, danh dau boi ReadWriteRouter.db_for_write,
+#     pham vi 1 request nho ReadYourWritesMiddleware)
+# Khong co alias READ_DATABASE trong DATABASES thi moi thu qua 'default'.
+# Don da luu tru (ArchivedOrder, ArchivedOrderItem - api/archive.py) doc/ghi/migrate tren
+# alias ARCHIVE_DATABASE (mac dinh 'archive'), khong co alias do thi nam trong 'default'.
+
+ARCHIVE_MODELS = {'archivedorder', 'archivedorderitem'}
+
+_request_state = ContextVar('api_db_request_state', default=None)
+
+
+def read_alias():
+    alias = getattr(settings, 'READ_DATABASE', 'replica')
+    return alias if alias in settings.DATABASES else DEFAULT_DB_ALIAS
+
+
+def archive_alias():
+    alias = getattr(settings, 'ARCHIVE_DATABASE', 'archive')
+    return alias if alias in settings.DATABASES else DEFAULT_DB_ALIAS
+
+
+def _archived(app_label, model_name):
+    return app_label == 'api' and model_name in ARCHIVE_MODELS
+
+
+def written():
+    state = _request_state.get()
+    return state is not None and state['written']
+
+
+class ReadWriteRouter:
+
+    def db_for_read(self, model, **hints):
+        if _archived(model._meta.app_label, model._meta.model_name):
+            return archive_alias()
+        if written() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        if _archived(model._meta.app_label, model._meta.model_name):
+            return archive_alias()
+        state = _request_state.get()
+        if state is not None:
+            state['written'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # default/replica la cung 1 database; khoa ngoai tu archive sang User/Product khong co constraint
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if _archived(app_label, model_name):
+            return db == archive_alias()
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReadYourWritesMiddleware:
+    """Moi request bat dau doc tu read alias, sau lan ghi dau tien thi doc tu 'default'."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _request_state.set({'written': False})
+        try:
+            return self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+    async def __acall__(self, request):
+        token = _request_state.set({'written': False})
+        try:
+            return await self.get_response(request)
+        finally:
+            _request_state.reset(token)
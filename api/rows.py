@@ -0,0 +1,157 @@
+from decimal import Decimal
+
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+
+from .cache import stock_read
+from .metrics import timed_render
+
+# read path nhanh cho cac api danh sach: dung .values() thay vi tao model instance
+# va chay ModelSerializer tung field. Ket qua (sau khi render JSON) giong het
+# ProductSerializer / CategorySerializer / OrderSerializer.
+# Moi field: (ten trong JSON, cot trong .values(), ham chuyen doi hoac None)
+
+
+def _number(value):
+    # DecimalField(coerce_to_string=False) cua DRF -> Decimal -> encoder in ra float
+    return None if value is None else float(value)
+
+
+_datetime = serializers.DateTimeField().to_representation
+_money = serializers.DecimalField(max_digits=10, decimal_places=2).to_representation
+
+PRODUCT_FIELDS = [
+    ('id', 'product_id', None),
+    ('title', 'product_name', None),
+    ('description', 'product_description', None),
+    ('categoryId', 'category_id', None),
+    ('price', 'price', _number),
+    ('discountPercentage', 'discountPercentage', _number),
+    ('stock', 'available_stock', None),  # annotation ton kho (api/inventory.py)
+    ('thumbnail', 'image_url', None),
+]
+PRODUCT_COLUMNS = [column for name, column, convert in PRODUCT_FIELDS]
+
+
+def sparse_product_fields(value):
+    """?fields=id,title,price -> cac field cua PRODUCT_FIELDS duoc yeu cau (khong co -> tat ca)."""
+    if not value:
+        return PRODUCT_FIELDS
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = names - {name for name, column, convert in PRODUCT_FIELDS}
+    if unknown:
+        raise ParseError(f"Unknown fields: {', '.join(sorted(unknown))}.")
+    return [field for field in PRODUCT_FIELDS if field[0] in names]
+
+
+def product_columns(fields, keys=()):
+    """Cot can SELECT cho fields, them cac khoa (sap xep/cursor) neu chua co; cot khong can khong doc."""
+    columns = [column for name, column, convert in fields]
+    for key in keys:
+        key = key.lstrip('-')
+        if key not in columns:
+            columns.append(key)
+    return columns
+
+CATEGORY_FIELDS = [
+    ('id', 'category_id', None),
+    ('name', 'category_name', None),
+]
+CATEGORY_COLUMNS = [column for name, column, convert in CATEGORY_FIELDS]
+
+ORDER_FIELDS = [
+    ('id', 'id', None),
+    ('customer', 'customer_id', None),
+    ('address', 'address', None),
+    ('phone', 'phone', None),
+    ('note', 'note', None),
+    ('time_create', 'time_create', _datetime),
+    ('total', 'total', _money),
+    ('status', 'status', None),
+]
+ORDER_COLUMNS = [column for name, column, convert in ORDER_FIELDS]
+
+
+
+def _item_column(column):
+    # order item: ton kho cua san pham la annotation product_available_stock
+    return 'product_available_stock' if column == 'available_stock' else 'product__' + column
+
+
+ITEM_PRODUCT_FIELDS = [(name, _item_column(column), convert) for name, column, convert in PRODUCT_FIELDS]
+ORDER_ITEM_COLUMNS = ['order_id', 'quantity', 'price'] + [column for name, column, convert in ITEM_PRODUCT_FIELDS]
+CART_ITEM_COLUMNS = ['cart_item_id', 'product_id', 'quantity'] + [column for name, column, convert in ITEM_PRODUCT_FIELDS]
+
+
+def make_rows(values, fields):
+    rows = []
+    for value in values:
+        row = {}
+        for name, column, convert in fields:
+            data = value[column]
+            row[name] = data if convert is None or data is None else convert(data)
+        rows.append(row)
+    return rows
+
+
+@timed_render
+def product_rows(values, fields=PRODUCT_FIELDS):
+    """values can co product_id khi fields co stock (response cache ghi lai ton kho cua san pham nao)."""
+    if not any(column == 'available_stock' for name, column, convert in fields):
+        return make_rows(values, fields)
+    values = list(values)
+    stock_read(value['product_id'] for value in values)
+    return make_rows(values, fields)
+
+
+@timed_render
+def category_rows(values):
+    return make_rows(values, CATEGORY_FIELDS)
+
+
+@timed_render
+def order_rows(values, item_values):
+    """values: .values(*ORDER_COLUMNS) cua cac order, item_values: .values(*ORDER_ITEM_COLUMNS)."""
+    items = {}
+    for item in item_values:
+        product = None
+        if item['product__product_id'] is not None:  # product da bi xoa (SET_NULL)
+            product = make_rows([item], ITEM_PRODUCT_FIELDS)[0]
+        items.setdefault(item['order_id'], []).append({
+            'product': product,
+            'quantity': item['quantity'],
+            'price': _money(item['price']),
+        })
+    rows = make_rows(values, ORDER_FIELDS)
+    for row in rows:
+        row['items'] = items.get(row['id'], [])
+    return rows
+
+
+@timed_render
+def cart_rows(item_values):
+    """Gio hang day du: values(*CART_ITEM_COLUMNS) -> san pham nhung trong tung dong + tien tinh san.
+
+    Tien tinh giong create_order: dong = price * quantity (price da la gia ban, discountPercentage
+    chi de hien thi, khong tru them). subtotal = tong cac dong, total = so tien don hang se tinh
+    (hien tai bang subtotal).
+    """
+    items = []
+    quantity, subtotal = 0, Decimal(0)
+    for item in item_values:
+        line_total = item['product__price'] * item['quantity']
+        items.append({
+            'id': item['cart_item_id'],
+            'product_id': item['product_id'],
+            'quantity': item['quantity'],
+            'product': make_rows([item], ITEM_PRODUCT_FIELDS)[0],
+            'total': _money(line_total),
+        })
+        quantity += item['quantity']
+        subtotal += line_total
+    return {
+        'items': items,
+        'quantity': quantity,
+        'subtotal': _money(subtotal),
+        'total': _money(subtotal),
+    }
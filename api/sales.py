@@ -0,0 +1,243 @@
+from datetime import date, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+
+from .models import (ArchivedOrder, ArchivedOrderItem, DailyCategorySales, DailyProductSales, DailySales, Order,
+                     OrderItem, Product, Task)
+from .tasks import task, task_name
+
+# bang tong hop doanh thu/so luong/so don theo ngay, theo san pham, theo danh muc.
+# Tao don cong vao, huy don tru ra bang INSERT ... ON CONFLICT DO UPDATE:
+# 1 cau SQL moi bang, khong doc-sua-ghi.
+# Ngay tinh theo TIME_ZONE. Danh muc lay theo danh muc hien tai cua san pham,
+# doi danh muc san pham thi chay rebuild_sales_rollups de tinh lai.
+# Tao/huy don chi enqueue record_order_task (cung transaction voi don hang), worker
+# (run_worker) cap nhat bang tong hop sau -> checkout khong cho 3 cau upsert.
+
+GROUPS = ('day', 'product', 'category')
+MAX_REPORT_DAYS = 3660
+
+_money = serializers.DecimalField(max_digits=14, decimal_places=2).to_representation
+
+
+def _upsert(model, keys, rows):
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = keys + ['revenue', 'units', 'orders']
+    placeholders = ', '.join(['(%s)' % ', '.join(['%s'] * len(columns))] * len(rows))
+    params = []
+    for row in rows:
+        params.extend(row)
+    sql = 'INSERT INTO %s (%s) VALUES %s ON CONFLICT (%s) DO UPDATE SET %s' % (
+        table,
+        ', '.join(quote(column) for column in columns),
+        placeholders,
+        ', '.join(quote(key) for key in keys),
+        ', '.join('%s = %s.%s + excluded.%s' % (quote(name), table, quote(name), quote(name))
+                  for name in ('revenue', 'units', 'orders')),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def record_order(order, lines, sign=1):
+    """Cong (sign=1) hoac tru (sign=-1) 1 don vao cac bang tong hop.
+
+    lines: (product_id, category_id, quantity, price) voi price la thanh tien cua dong.
+    """
+    day = connection.ops.adapt_datefield_value(timezone.localdate(order.time_create))
+    units = 0
+    products, categories = {}, {}
+    for product_id, category_id, quantity, price in lines:
+        units += quantity
+        for totals, key in ((products, product_id), (categories, category_id)):
+            if key is None:
+                continue
+            revenue, count = totals.get(key, (0, 0))
+            totals[key] = (revenue + price, count + quantity)
+
+    _upsert(DailySales, ['day'], [(day, sign * order.total, sign * units, sign)])
+    _upsert(DailyProductSales, ['day', 'product_id'], [
+        (day, key, sign * revenue, sign * count, sign) for key, (revenue, count) in products.items()
+    ])
+    _upsert(DailyCategorySales, ['day', 'category_id'], [
+        (day, key, sign * revenue, sign * count, sign) for key, (revenue, count) in categories.items()
+    ])
+
+
+def unrecord_order(order, lines):
+    record_order(order, lines, sign=-1)
+
+
+@task(atomic=True)
+def record_order_task(order_id, sign=1):
+    """Task chay nen (api/tasks.py) sau khi tao (sign=1) / huy (sign=-1) don.
+
+    Cong va tru giao hoan nen thu tu chay cua 2 task cung 1 don khong quan trong.
+    """
+    order = Order.objects.filter(pk=order_id).first()
+    if order is None:
+        return
+    lines = order.items.values_list('product_id', 'product__category_id', 'quantity', 'price')
+    record_order(order, list(lines), sign)
+
+
+def pending_order_ids():
+    """Subquery id cac don con record_order_task chua chay (args[0] doc tu payload JSON trong SQL)."""
+    return Task.objects.filter(name=task_name(record_order_task)).values('payload__args__0')
+
+
+def rebuild(start=None, end=None):
+    """Tinh lai cac bang tong hop tu Order/OrderItem (va don da luu tru) trong khoang ngay [start, end].
+
+    Xoa luon record_order_task chua chay cua cac don trong khoang (ket qua da tinh trong
+    rebuild); task dang chay thi khong commit duoc (TaskLost) vi dong task da bi xoa.
+    """
+    period = Order.objects.all()
+    items = OrderItem.objects.exclude(order__status='canceled')
+    rollups = [DailySales.objects.all(), DailyProductSales.objects.all(), DailyCategorySales.objects.all()]
+    if start is not None:
+        period = period.filter(time_create__date__gte=start)
+        items = items.filter(order__time_create__date__gte=start)
+        rollups = [rollup.filter(day__gte=start) for rollup in rollups]
+    if end is not None:
+        period = period.filter(time_create__date__lte=end)
+        items = items.filter(order__time_create__date__lte=end)
+        rollups = [rollup.filter(day__lte=end) for rollup in rollups]
+
+    orders = period.exclude(status='canceled').annotate(day=TruncDate('time_create')).values('day')
+    items = items.annotate(day=TruncDate('order__time_create'))
+    totals = dict(zip(('revenue', 'units', 'orders'), (Sum('price'), Sum('quantity'), Count('order', distinct=True))))
+
+    with transaction.atomic():
+        Task.objects.filter(name=task_name(record_order_task), payload__args__0__in=period.values('id')).delete()
+        for rollup in rollups:
+            rollup.delete()
+        units = {row['day']: row['units'] for row in items.values('day').annotate(units=Sum('quantity'))}
+        DailySales.objects.bulk_create([
+            DailySales(day=row['day'], revenue=row['revenue'], units=units.get(row['day']) or 0, orders=row['orders'])
+            for row in orders.annotate(revenue=Sum('total'), orders=Count('id'))
+        ], batch_size=500)
+        DailyProductSales.objects.bulk_create([
+            DailyProductSales(day=row['day'], product_id=row['product'], **_totals(row))
+            for row in items.filter(product__isnull=False).values('day', 'product').annotate(**totals)
+        ], batch_size=500)
+        DailyCategorySales.objects.bulk_create([
+            DailyCategorySales(day=row['day'], category_id=row['product__category'], **_totals(row))
+            for row in items.filter(product__category__isnull=False)
+            .values('day', 'product__category').annotate(**totals)
+        ], batch_size=500)
+        _add_archived(start, end)
+
+
+def _add_archived(start, end):
+    # don da luu tru (api/archive.py) o database khac, khong join duoc voi Product:
+    # tong hop rieng roi cong vao, danh muc lay theo san pham hien tai nhu phan tren
+    from .archive import archive_ready  # archive.py import sales
+
+    if not archive_ready():
+        return
+    orders = ArchivedOrder.objects.exclude(status='canceled')
+    items = ArchivedOrderItem.objects.exclude(order__status='canceled')
+    if start is not None:
+        orders = orders.filter(time_create__date__gte=start)
+        items = items.filter(order__time_create__date__gte=start)
+    if end is not None:
+        orders = orders.filter(time_create__date__lte=end)
+        items = items.filter(order__time_create__date__lte=end)
+    items = items.annotate(day=TruncDate('order__time_create'))
+    adapt = connection.ops.adapt_datefield_value
+
+    units = {row['day']: row['units'] for row in items.values('day').annotate(units=Sum('quantity'))}
+    _upsert_chunked(DailySales, ['day'], [
+        (adapt(row['day']), row['revenue'], units.get(row['day']) or 0, row['orders'])
+        for row in orders.annotate(day=TruncDate('time_create')).values('day')
+        .annotate(revenue=Sum('total'), orders=Count('id'))
+    ])
+    _upsert_chunked(DailyProductSales, ['day', 'product_id'], [
+        (adapt(row['day']), row['product'], row['revenue'], row['units'], row['orders'])
+        for row in items.filter(product__isnull=False).values('day', 'product')
+        .annotate(revenue=Sum('price'), units=Sum('quantity'), orders=Count('order', distinct=True))
+    ])
+    category_of = dict(Product.objects.exclude(category=None).values_list('pk', 'category_id'))
+    categories = {}
+    lines = items.filter(product__isnull=False).values_list('day', 'product', 'order', 'price', 'quantity')
+    for day, product, order, price, quantity in lines.iterator():
+        if product not in category_of:
+            continue
+        totals = categories.setdefault((day, category_of[product]), {'revenue': 0, 'units': 0, 'orders': set()})
+        totals['revenue'] += price
+        totals['units'] += quantity
+        totals['orders'].add(order)
+    _upsert_chunked(DailyCategorySales, ['day', 'category_id'], [
+        (adapt(day), category, totals['revenue'], totals['units'], len(totals['orders']))
+        for (day, category), totals in categories.items()
+    ])
+
+
+def _upsert_chunked(model, keys, rows, size=500):
+    for index in range(0, len(rows), size):
+        _upsert(model, keys, rows[index:index + size])
+
+
+def _totals(row):
+    return {'revenue': row['revenue'], 'units': row['units'], 'orders': row['orders']}
+
+
+def parse_day(value, default):
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ParseError(f"Invalid date '{value}', expected YYYY-MM-DD.")
+
+
+def report(start, end, group='day', limit=50):
+    """Bao cao [start, end] chi doc tu cac bang tong hop."""
+    if group not in GROUPS:
+        raise ParseError(f"group must be one of {', '.join(GROUPS)}.")
+    if end < start:
+        raise ParseError("'to' must not be before 'from'.")
+    if end - start > timedelta(days=MAX_REPORT_DAYS):
+        raise ParseError(f"Date range is limited to {MAX_REPORT_DAYS} days.")
+
+    sums = {'revenue': Sum('revenue'), 'units': Sum('units'), 'orders': Sum('orders')}
+    days = DailySales.objects.filter(day__range=(start, end))
+    totals = days.aggregate(**sums)
+    if group == 'day':
+        results = [
+            {'day': row['day'].isoformat(), 'revenue': _money(row['revenue']), 'units': row['units'],
+             'orders': row['orders']}
+            for row in days.order_by('day').values('day', 'revenue', 'units', 'orders')
+        ]
+    else:
+        model, key, name = {
+            'product': (DailyProductSales, 'product', 'product__product_name'),
+            'category': (DailyCategorySales, 'category', 'category__category_name'),
+        }[group]
+        rows = (model.objects.filter(day__range=(start, end)).values(key, name).annotate(**sums)
+                .filter(orders__gt=0).order_by('-revenue', key)[:limit])
+        results = [
+            {'id': row[key], 'name': row[name], 'revenue': _money(row['revenue']), 'units': row['units'],
+             'orders': row['orders']}
+            for row in rows
+        ]
+    return {
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'group': group,
+        'totals': {
+            'revenue': _money(totals['revenue'] or 0),
+            'units': totals['units'] or 0,
+            'orders': totals['orders'] or 0,
+        },
+        'results': results,
+    }
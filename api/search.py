@@ -0,0 +1,94 @@
+import re
+
+from django.db import connections, router
+
+from .pagination import InvalidCursor, decode_cursor, encode_cursor
+
+# tim kiem full-text san pham bang SQLite FTS5.
+# api_product_fts la bang "external content": chi luu index, noi dung doc tu
+# api_product, duoc dong bo bang trigger (tao trong migration 0003).
+# Luu y: migration AlterField tren Product se tao lai bang api_product va lam
+# mat trigger -> chay lai: manage.py rebuild_search_index
+# Migration 0003 co ban chep rieng cua INSTALL_SQL: doi schema index thi them migration moi.
+
+FTS_TABLE = 'api_product_fts'
+ORDERING = ['rank', 'rowid']
+MAX_TERMS = 16
+
+INSTALL_SQL = [
+    # prefix='2 3': index rieng cho tien to 2, 3 ky tu -> tim "lap*" nhanh
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        product_name, product_description,
+        content='api_product', content_rowid='product_id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON api_product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, product_name, product_description)
+        VALUES (new.product_id, new.product_name, new.product_description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON api_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, product_name, product_description)
+        VALUES ('delete', old.product_id, old.product_name, old.product_description);
+    END""",
+    # chi khi doi ten/mo ta, UPDATE stock khong dong vao index
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF product_name, product_description
+    ON api_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, product_name, product_description)
+        VALUES ('delete', old.product_id, old.product_name, old.product_description);
+        INSERT INTO {FTS_TABLE}(rowid, product_name, product_description)
+        VALUES (new.product_id, new.product_name, new.product_description);
+    END""",
+    # rank mac dinh: BM25, ten san pham nang gap 10 lan mo ta
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+]
+
+UNINSTALL_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+_TOKEN = re.compile(r'\w+')
+
+
+def build_match(query):
+    """Chuoi nguoi dung -> cu phap MATCH an toan: moi tu la 1 tien to, AND voi nhau."""
+    tokens = _TOKEN.findall(query or '')[:MAX_TERMS]
+    return ' '.join('"%s"*' % token for token in tokens)
+
+
+def install(cursor):
+    for sql in INSTALL_SQL:
+        cursor.execute(sql)
+
+
+def rebuild(cursor):
+    cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def search_ids(match, cursor_value, page_size):
+    """Tra ve ([(product_id, rank)], next_cursor), phan trang keyset tren (rank, rowid)."""
+    params = [match]
+    keyset = ''
+    if cursor_value:
+        values = decode_cursor(cursor_value, ORDERING)
+        try:
+            rank, rowid = float(values[0]), int(values[1])
+        except (TypeError, ValueError):
+            raise InvalidCursor()
+        keyset = 'WHERE rank > %s OR (rank = %s AND rowid > %s)'
+        params += [rank, rank, rowid]
+    sql = (f"SELECT rowid, rank FROM (SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s) "
+           f"{keyset} ORDER BY rank, rowid LIMIT %s")
+    params.append(page_size + 1)
+    from .models import Product
+    with connections[router.db_for_read(Product)].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    rowid, rank = rows[-1]
+    return rows, encode_cursor(ORDERING, [rank, rowid])
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from .models import *
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from .hashing import run_hasher
 
 class CategorySerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(source='category_id', read_only=True)
@@ -61,6 +62,6 @@ class RegisterSerializer(serializers.ModelSerializer):
         password = validated_data.pop('password')
 
         user = User(**validated_data)
-        user.set_password(password)  # Hash mật khẩu do django
+        run_hasher(user.set_password, password)  # Hash mật khẩu do django, chay tren pool hashing
         user.save()
         return user
\ No newline at end of file
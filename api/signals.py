@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_user
+from .cache import catalog_changed
+from .models import Category, Product
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def catalog_updated(sender, **kwargs):
+    catalog_changed()
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def user_updated(sender, instance, **kwargs):
+    # xoa ngay va xoa lai sau commit: request dang doc user cu khong the cache lai ban cu
+    invalidate_user(instance.pk)
+    transaction.on_commit(lambda: invalidate_user(instance.pk))
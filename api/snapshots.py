@@ -0,0 +1,242 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
+
+from .cache import get_catalog_version, get_stock_version
+from .inventory import stocked_products
+from .models import Category, Task
+from .renderers import render_json
+from .rows import CATEGORY_COLUMNS, PRODUCT_COLUMNS, category_rows, product_rows
+from .tasks import enqueue_at, task, task_name
+
+try:
+    import brotli
+except ImportError:  # brotli la tuy chon, khong co thi chi co ban gzip
+    brotli = None
+
+# snapshot toan bo catalog ({"categories": [...], "products": [...]}, cung dinh dang voi
+# category_list / product_list) ghi ra file catalog-<sha256>.json + .json.gz (+ .json.br),
+# nen 1 lan luc build. /api/catalog/snapshot/ tra file hop voi Accept-Encoding bang
+# FileResponse (wsgi.file_wrapper -> sendfile) hoac X-Accel-Redirect cho nginx: moi request
+# khong query, khong serialize, khong nen.
+# Build khong chay trong request: catalog hoac ton kho doi (catalog_version()) thi request dau tien enqueue
+# build_snapshot_task (api/tasks.py, chay boi run_worker) som nhat CATALOG_SNAPSHOT_DEBOUNCE
+# giay sau lan build truoc, trong luc cho van tra ban da publish. Build xong ghi current.json
+# (os.replace) roi moi xoa ban cu, luon giu ban dang publish va ban truoc do.
+# Chua co ban nao (chua chay worker hay build_catalog_snapshot) thi tra JSON khong nen.
+# Ten file theo noi dung nen nhieu process build cung 1 catalog ra cung 1 file.
+
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+CHUNK_SIZE = 2000
+POINTER = 'current.json'  # {"name", "version", "previous", "built"} cua ban da publish
+
+_lock = threading.Lock()
+_state = {'key': None, 'published': None, 'requested': None}
+
+
+def snapshot_dir():
+    return Path(getattr(settings, 'CATALOG_SNAPSHOT_DIR', Path(settings.BASE_DIR) / 'catalog_snapshots'))
+
+
+def catalog_version():
+    """Version cua noi dung snapshot: doi khi catalog hoac ton kho doi (ca 2 chi tang nen tong chi tang)."""
+    return get_catalog_version() + get_stock_version()
+
+
+def _catalog_chunks():
+    categories = Category.objects.order_by('category_id').values(*CATEGORY_COLUMNS)
+    yield b'{"categories":' + render_json(category_rows(categories)) + b',"products":['
+    products = stocked_products().order_by('product_id').values(*PRODUCT_COLUMNS).iterator(chunk_size=CHUNK_SIZE)
+    batch, first = [], True
+    for product in products:
+        batch.append(product)
+        if len(batch) == CHUNK_SIZE:
+            yield (b'' if first else b',') + render_json(product_rows(batch))[1:-1]
+            batch, first = [], False
+    if batch:
+        yield (b'' if first else b',') + render_json(product_rows(batch))[1:-1]
+    yield b']}'
+
+
+def _compress(source, target, encoding):
+    with open(source, 'rb') as raw, tempfile.NamedTemporaryFile(dir=target.parent, delete=False) as out:
+        if encoding == 'gzip':
+            # mtime=0: cung noi dung -> cung file nen
+            with gzip.GzipFile(fileobj=out, mode='wb', compresslevel=9, mtime=0) as compressed:
+                for block in iter(lambda: raw.read(1 << 20), b''):
+                    compressed.write(block)
+        else:
+            compressor = brotli.Compressor(quality=11)
+            for block in iter(lambda: raw.read(1 << 20), b''):
+                out.write(compressor.process(block))
+            out.write(compressor.finish())
+    os.replace(out.name, target)
+
+
+def build_snapshot(version=None):
+    """Ghi snapshot cua catalog hien tai va publish, tra ve ten file JSON (khong doi neu catalog khong doi).
+
+    version: catalog version ma snapshot nay bao gom (mac dinh version hien tai).
+    """
+    if version is None:
+        version = catalog_version()
+    directory = snapshot_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as out:
+        for chunk in _catalog_chunks():
+            digest.update(chunk)
+            out.write(chunk)
+    name = 'catalog-%s.json' % digest.hexdigest()[:32]
+    path = directory / name
+    try:
+        for encoding, suffix in ENCODINGS:
+            if encoding == 'br' and brotli is None:
+                continue
+            if not Path(str(path) + suffix).exists():
+                _compress(out.name, Path(str(path) + suffix), encoding)
+        # file JSON cuoi cung: co file nay thi cac ban nen da co
+        if path.exists():
+            os.remove(out.name)
+        else:
+            os.replace(out.name, path)
+    except BaseException:
+        if os.path.exists(out.name):
+            os.remove(out.name)
+        raise
+    os.utime(path)
+    _publish(directory, name, version)
+    return name
+
+
+def _publish(directory, name, version):
+    current = published()
+    if current is not None and current['version'] > version:
+        # build cham hon 1 build moi hon da publish
+        return
+    previous = current['name'] if current is not None and current['name'] != name else None
+    pointer = {'name': name, 'version': version, 'previous': previous, 'built': time.time()}
+    with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as out:
+        json.dump(pointer, out)
+    os.replace(out.name, directory / POINTER)
+    _prune(directory, {name, previous})
+
+
+def _prune(directory, published_names):
+    # giu ban dang publish va ban truoc do (request khac co the van dang gui file cua ban truoc)
+    keep = max(2, getattr(settings, 'CATALOG_SNAPSHOT_KEEP', 3))
+    snapshots = sorted(directory.glob('catalog-*.json'), key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in snapshots[keep:]:
+        if path.name in published_names:
+            continue
+        for suffix in [''] + [suffix for encoding, suffix in ENCODINGS]:
+            try:
+                os.remove(str(path) + suffix)
+            except FileNotFoundError:
+                pass
+
+
+def published():
+    """{'name', 'version', 'previous', 'built'} cua snapshot da build xong gan nhat, None neu chua co."""
+    path = snapshot_dir() / POINTER
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    key = (str(path), stat.st_ino, stat.st_mtime_ns)
+    with _lock:
+        if _state['key'] != key:
+            with open(path) as pointer:
+                _state.update(key=key, published=json.load(pointer))
+        return _state['published']
+
+
+@task(timeout=600)
+def build_snapshot_task(version):
+    """Task (api/tasks.py) build lai snapshot, duoc snapshot_response enqueue khi catalog doi."""
+    current = published()
+    if current is None or current['version'] < version:
+        build_snapshot(version)
+
+
+def request_build(version):
+    """Enqueue build_snapshot_task neu chua co task build nao dang cho, cach lan build truoc it nhat
+    CATALOG_SNAPSHOT_DEBOUNCE giay. Moi process chi kiem tra 1 lan cho moi version."""
+    if _state['requested'] == version:
+        return
+    _state['requested'] = version
+    pending = Task.objects.filter(name=task_name(build_snapshot_task), status__in=('queued', 'running'))
+    if pending.exists():
+        return
+    current = published()
+    run_at = None
+    if current is not None:
+        debounce = getattr(settings, 'CATALOG_SNAPSHOT_DEBOUNCE', 5)
+        run_at = datetime.fromtimestamp(current['built'] + debounce, tz=dt_timezone.utc)
+    enqueue_at(run_at, build_snapshot_task, version)
+
+
+def reset():
+    _state.update(key=None, published=None, requested=None)
+
+
+def choose_encoding(accept_encoding, available):
+    """Encoding tot nhat trong available (theo thu tu uu tien) ma client chap nhan (q > 0)."""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for encoding in available:
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def snapshot_response(request):
+    version = catalog_version()
+    current = published()
+    if current is None or current['version'] != version:
+        request_build(version)
+    if current is None or not (snapshot_dir() / current['name']).exists():
+        # chua co snapshot nao: tra JSON khong nen, doc thang tu database
+        response = StreamingHttpResponse(_catalog_chunks(), content_type='application/json')
+        response['Cache-Control'] = 'no-cache'
+        return response
+    name = current['name']
+    etag = '"%s"' % name[len('catalog-'):-len('.json')]
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        available = [encoding for encoding, suffix in ENCODINGS if encoding != 'br' or brotli is not None]
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), available)
+        filename = name + dict(ENCODINGS).get(encoding, '')
+        prefix = getattr(settings, 'CATALOG_SNAPSHOT_ACCEL_PREFIX', None)
+        if prefix:
+            # nginx doc file tu location internal, Django chi tra header
+            response = HttpResponse(content_type='application/json')
+            response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + filename
+        else:
+            response = FileResponse(open(snapshot_dir() / filename, 'rb'), content_type='application/json')
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = 'no-cache'
+    return response
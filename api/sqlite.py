@@ -0,0 +1,52 @@
+import re
+
+from django.conf import settings
+
+# cau hinh PRAGMA cho moi ket noi SQLite moi (settings.SQLITE_PRAGMAS),
+# duoc goi tu signal connection_created (xem ApiConfig.ready).
+# Khong khai bao SQLITE_PRAGMAS thi khong dat PRAGMA nao (mac dinh cua SQLite/Django).
+
+_NAME = re.compile(r'^[a-z_]+$')
+_VALUE = re.compile(r'^-?\w+$')
+
+
+def get_pragmas():
+    return getattr(settings, 'SQLITE_PRAGMAS', {})
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        # PRAGMA khong nhan tham so bind nen chi cho phep ten/gia tri don gian
+        if not _NAME.match(name) or not _VALUE.match(str(value)):
+            raise ValueError(f"Invalid SQLite pragma {name}={value!r}")
+        cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.fetchall()
+
+
+def read_pragmas(cursor, names):
+    values = {}
+    for name in names:
+        if not _NAME.match(name):
+            raise ValueError(f"Invalid SQLite pragma {name}")
+        cursor.execute(f'PRAGMA {name}')
+        row = cursor.fetchone()
+        values[name] = row[0] if row else None
+    return values
+
+
+def is_read_only(connection):
+    return 'mode=ro' in str(connection.settings_dict['NAME'])
+
+
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = get_pragmas()
+    if is_read_only(connection):
+        # ket noi mode=ro khong doi duoc journal_mode (file da o WAL do ket noi ghi dat)
+        pragmas = {name: value for name, value in pragmas.items() if name != 'journal_mode'}
+    cursor = connection.connection.cursor()
+    try:
+        apply_pragmas(cursor, pragmas)
+    finally:
+        cursor.close()
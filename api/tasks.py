@@ -0,0 +1,150 @@
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+# hang doi task chay nen luu trong bang api_task (cung database):
+#   enqueue(ham, *args, **kwargs) trong view/transaction -> INSERT 1 dong, chay sau khi commit
+#   manage.py run_worker lay task (claim), chay, xong thi xoa dong
+# Lay task: UPDATE status='running', locked_until=now+timeout trong 1 transaction ghi
+# (tren SQLite la BEGIN IMMEDIATE nen 2 worker khong lay trung task). Worker chet/treo qua
+# locked_until thi task duoc lay lai -> task chay it nhat 1 lan, ham task phai chay lai duoc.
+# Loi: thu lai sau backoff * 2^(lan thu - 1) giay (toi da BACKOFF_MAX, co jitter),
+# qua max_attempts thi status='failed' va giu lai last_error.
+# @task(atomic=True): ham chay trong cung transaction voi viec xoa task, chi commit neu
+# task van thuoc worker nay -> thay doi trong database chi xay ra 1 lan.
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MAX_ATTEMPTS': 5,
+    'VISIBILITY_TIMEOUT': 60,
+    'BACKOFF': 2,
+    'BACKOFF_MAX': 300,
+    'POLL_INTERVAL': 1.0,
+    'THREADS': 2,
+}
+
+
+class TaskLost(Exception):
+    """Task da bi worker khac lay lai (qua visibility timeout) trong luc dang chay."""
+
+
+def option(name):
+    return getattr(settings, 'TASK_QUEUE', {}).get(name, DEFAULTS[name])
+
+
+def task(max_attempts=None, timeout=None, atomic=False):
+    """Khai bao tuy chon cho ham task (khong bat buoc, ham nao import duoc cung enqueue duoc)."""
+    def decorator(func):
+        func.task_options = {'max_attempts': max_attempts, 'timeout': timeout, 'atomic': atomic}
+        return func
+    return decorator
+
+
+def _options(func):
+    return getattr(func, 'task_options', {})
+
+
+def task_name(func):
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def enqueue(func, *args, **kwargs):
+    """Them task, args/kwargs phai la JSON. Goi trong transaction thi chi chay neu transaction commit."""
+    return enqueue_at(None, func, *args, **kwargs)
+
+
+def enqueue_at(run_at, func, *args, **kwargs):
+    """Nhu enqueue, task chi duoc lay tu thoi diem run_at (None = ngay)."""
+    return Task.objects.create(
+        name=task_name(func),
+        payload={'args': list(args), 'kwargs': kwargs},
+        max_attempts=_options(func).get('max_attempts') or option('MAX_ATTEMPTS'),
+        run_at=run_at or timezone.now(),
+    )
+
+
+def _due(now):
+    return Q(status='queued', run_at__lte=now) | Q(status='running', locked_until__lt=now)
+
+
+def claim():
+    """Lay 1 task den han (hoac het visibility timeout), None neu hang doi trong."""
+    with transaction.atomic():
+        now = timezone.now()
+        candidates = (Task.objects.select_for_update(skip_locked=True).filter(_due(now))
+                      .order_by('run_at', 'id').values_list('id', 'name')[:10])
+        for job_id, name in candidates:
+            if Task.objects.filter(_due(now), pk=job_id).update(
+                    status='running', attempts=F('attempts') + 1,
+                    locked_until=now + timedelta(seconds=_timeout(name))):
+                return Task.objects.get(pk=job_id)
+    return None
+
+
+def _timeout(name):
+    # timeout rieng cua ham task, khong import duoc thi dung mac dinh (execute se bao loi)
+    try:
+        func = import_string(name)
+    except ImportError:
+        return option('VISIBILITY_TIMEOUT')
+    return _options(func).get('timeout') or option('VISIBILITY_TIMEOUT')
+
+
+def _owned(job):
+    # con thuoc lan chay nay: chua bi worker khac lay lai
+    return Task.objects.filter(pk=job.pk, status='running', attempts=job.attempts)
+
+
+def execute(job):
+    """Chay task da claim, tra ve True neu thanh cong."""
+    try:
+        func = import_string(job.name)
+        args, kwargs = job.payload.get('args', []), job.payload.get('kwargs', {})
+        if _options(func).get('atomic'):
+            with transaction.atomic():
+                func(*args, **kwargs)
+                if not _owned(job).delete()[0]:
+                    raise TaskLost(job.pk)
+        else:
+            func(*args, **kwargs)
+            _owned(job).delete()
+    except Exception as exc:
+        retry(job, exc)
+        return False
+    return True
+
+
+def retry(job, exc):
+    error = ''.join(traceback.format_exception(exc))
+    if job.attempts >= job.max_attempts:
+        logger.error("Task %s #%s failed after %s attempts: %s", job.name, job.pk, job.attempts, exc)
+        _owned(job).update(status='failed', locked_until=None, last_error=error)
+        return
+    delay = min(option('BACKOFF') * 2 ** (job.attempts - 1), option('BACKOFF_MAX'))
+    delay *= random.uniform(0.8, 1.2)
+    logger.warning("Task %s #%s failed (attempt %s), retry in %.1fs: %s",
+                   job.name, job.pk, job.attempts, delay, exc)
+    _owned(job).update(status='queued', locked_until=None, last_error=error,
+                       run_at=timezone.now() + timedelta(seconds=delay))
+
+
+def run_pending(limit=None):
+    """Chay cac task den han trong thread hien tai (test, lenh run_worker --burst), tra ve so task da chay."""
+    count = 0
+    while limit is None or count < limit:
+        job = claim()
+        if job is None:
+            break
+        execute(job)
+        count += 1
+    return count
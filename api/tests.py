@@ -1,9 +1,44 @@
-from django.test import TestCase, Client
+from django.test import TestCase, SimpleTestCase, Client, override_settings
+from types import SimpleNamespace
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase, APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import status
-from .models import Category, Product, CartItem, Order, OrderItem
+from io import BytesIO, StringIO
+import base64
+import csv
+import gzip
+import json
+import os
+import tempfile
+import time
+from django.core.files.uploadedfile import SimpleUploadedFile
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+import uuid
+from unittest import mock
+from django.test.utils import CaptureQueriesContext
+from .models import Category, Product, CartItem, Order, OrderItem, Task, ArchivedOrder, ArchivedOrderItem
+from .models import DailyCategorySales, DailyProductSales, DailySales, StockMovement
+from decimal import Decimal
+from .sqlite import apply_pragmas, is_read_only, read_pragmas
+from .cache import BoundedCache, clear_catalog_cache
+from .catalog_io import CatalogImport, export_chunks
+from .authentication import clear_user_cache
+from . import archive, hashing, inventory, sales, snapshots, tasks
+from .inventory import available_stock, stocked_order_items, take_stock, with_available_stock
+from .metrics import registry
+from .routers import ReadWriteRouter, ReadYourWritesMiddleware
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.signals import user_login_failed
+from rest_framework.renderers import JSONRenderer
+from .renderers import FastJSONRenderer
+from .rows import *
+from .serializer import CategorySerializer, OrderSerializer, ProductSerializer
 
 class ProductModelTest(TestCase):
     """Test Product Model"""
@@ -55,3 +90,1377 @@ class DatabaseIntegrationTest(TestCase):
             quantity=1
         )
         self.assertEqual(cart_item.product.category.category_name, "Electronics")
+
+
+@override_settings(API_PAGE_SIZE=2)
+class ProductPaginationTest(APITestCase):
+    """Test keyset pagination of product lists"""
+
+    def setUp(self):
+        clear_catalog_cache()
+        self.category = Category.objects.create(category_name="Electronics")
+        self.other = Category.objects.create(category_name="Books")
+        for name, price, category in [("A", 30, self.category), ("B", 10, self.category),
+                                      ("C", 20, self.other), ("D", 10, self.category),
+                                      ("E", 40, self.category)]:
+            Product.objects.create(product_name=name, price=price, category=category)
+
+    def collect(self, url, params):
+        titles, cursor = [], None
+        while True:
+            query = dict(params, cursor=cursor) if cursor else params
+            response = self.client.get(url, query)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertLessEqual(len(data['results']), 2)
+            titles += [item['title'] for item in data['results']]
+            cursor = data['next']
+            if not cursor:
+                return titles
+
+    def test_product_list_pages(self):
+        """Test every product is returned once across pages"""
+        self.assertEqual(self.collect('/api/products/', {}), ["A", "B", "C", "D", "E"])
+
+    def test_filter_price_sort_with_ties(self):
+        """Test price sort keeps ties ordered by id"""
+        self.assertEqual(self.collect('/api/products/filter/', {'sort': 'price_asc'}), ["B", "D", "C", "A", "E"])
+        self.assertEqual(self.collect('/api/products/filter/', {'sort': 'price_desc'}), ["E", "A", "C", "D", "B"])
+
+    def test_filter_category_and_sort(self):
+        """Test category filter is kept across pages"""
+        titles = self.collect('/api/products/filter/', {'sort': 'price_asc', 'category': self.category.category_id})
+        self.assertEqual(titles, ["B", "D", "A", "E"])
+
+    def test_invalid_cursor(self):
+        """Test garbage or foreign cursors are rejected"""
+        response = self.client.get('/api/products/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        cursor = self.client.get('/api/products/filter/', {'sort': 'price_asc'}).json()['next']
+        response = self.client.get('/api/products/filter/', {'sort': 'price_desc', 'cursor': cursor})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class OrderListQueryTest(APITestCase):
+    """Test orders_list runs a constant number of queries"""
+    databases = {'default', 'archive'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='pass123')
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(category_name="Electronics")
+        self.products = [
+            Product.objects.create(product_name="P%d" % i, price=10 + i, stock=100, category=category)
+            for i in range(3)
+        ]
+
+    def create_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(customer=self.user, address="HN", phone="0123456789")
+            for product in self.products:
+                OrderItem.objects.create(order=order, product=product, quantity=2, price=product.price * 2)
+
+    def test_query_count_is_constant(self):
+        """Test query count does not grow with the number of orders"""
+        self.create_orders(1)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/order/')
+        self.assertEqual(len(response.data['results']), 1)
+        self.create_orders(10)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/order/')
+        self.assertEqual(len(response.data['results']), 11)
+        self.assertEqual(len(response.data['results'][0]['items']), 3)
+        self.assertEqual(response.data['results'][0]['items'][0]['product']['title'], "P0")
+
+    @override_settings(API_PAGE_SIZE=4)
+    def test_orders_paginated_newest_first(self):
+        """Test orders are paginated by time_create, newest first"""
+        self.create_orders(10)
+        ids, cursor = [], None
+        while True:
+            response = self.client.get('/api/order/', {'cursor': cursor} if cursor else {})
+            ids += [order['id'] for order in response.data['results']]
+            cursor = response.data['next']
+            if not cursor:
+                break
+        expected = list(Order.objects.order_by('-time_create', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+
+class CreateOrderTest(APITestCase):
+    """Test the transactional create_order pipeline"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='pass123')
+        self.client.force_authenticate(self.user)
+        self.laptop = Product.objects.create(product_name="Laptop", price=1000, stock=5)
+        self.mouse = Product.objects.create(product_name="Mouse", price=20, stock=1)
+        CartItem.objects.create(user=self.user, product=self.laptop, quantity=1)
+
+    def order(self, items):
+        return self.client.post('/api/order/create/', {
+            'cartItems': items, 'address': 'HN', 'phone': '0123456789'
+        }, format='json')
+
+    def test_create_order(self):
+        """Test stock, items, total and cart are updated together"""
+        response = self.order([{'product_id': self.laptop.product_id, 'quantity': 2},
+                               {'product_id': self.mouse.product_id, 'quantity': 1}])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['total'], 2020.0)
+        order = Order.objects.get(pk=response.data['order_id'])
+        self.assertEqual(order.items.count(), 2)
+        stock = available_stock([self.laptop.pk, self.mouse.pk])
+        self.assertEqual((stock[self.laptop.pk], stock[self.mouse.pk]), (3, 0))
+        self.assertFalse(CartItem.objects.filter(user=self.user).exists())
+
+    def test_duplicate_lines_are_merged(self):
+        """Test the same product twice is one line with the summed quantity"""
+        response = self.order([{'product_id': self.laptop.product_id, 'quantity': 2},
+                               {'product_id': self.laptop.product_id, 'quantity': 3}])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        item = OrderItem.objects.get(order_id=response.data['order_id'])
+        self.assertEqual(item.quantity, 5)
+        self.assertEqual(available_stock([self.laptop.pk])[self.laptop.pk], 0)
+
+    def test_short_stock_rolls_back(self):
+        """Test a failing line leaves no order and no stock change behind"""
+        response = self.order([{'product_id': self.laptop.product_id, 'quantity': 2},
+                               {'product_id': self.mouse.product_id, 'quantity': 2}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail'], "Not enough stock for Mouse.")
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(available_stock([self.laptop.pk])[self.laptop.pk], 5)
+        self.assertTrue(CartItem.objects.filter(user=self.user).exists())
+
+    def test_unknown_product_rolls_back(self):
+        """Test an unknown product id is rejected without side effects"""
+        response = self.order([{'product_id': self.laptop.product_id, 'quantity': 1},
+                               {'product_id': 9999, 'quantity': 1}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(available_stock([self.laptop.pk])[self.laptop.pk], 5)
+
+    def test_product_deleted_during_checkout(self):
+        """Test a product deleted after it was loaded is reported as not found, not as short stock"""
+        in_bulk = Product.objects.in_bulk
+
+        def load_then_delete(ids):
+            products = in_bulk(ids)
+            Product.objects.filter(pk=self.mouse.pk).delete()
+            return products
+
+        with mock.patch.object(Product.objects, 'in_bulk', load_then_delete):
+            response = self.order([{'product_id': self.laptop.product_id, 'quantity': 1},
+                                   {'product_id': self.mouse.product_id, 'quantity': 1}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail'], "Product %d not found." % self.mouse.product_id)
+        self.assertFalse(Order.objects.exists())
+
+
+class SQLitePragmaTest(TestCase):
+    """Test SQLITE_PRAGMAS are applied to new connections"""
+
+    def test_pragmas_applied(self):
+        """Test configured pragmas are in effect on the connection"""
+        with connection.cursor() as cursor:
+            values = read_pragmas(cursor, ['busy_timeout', 'cache_size', 'temp_store'])
+        self.assertEqual(values, {'busy_timeout': 5000, 'cache_size': -20000, 'temp_store': 2})
+
+    def test_invalid_pragma_rejected(self):
+        """Test pragma values cannot inject SQL"""
+        with connection.cursor() as cursor:
+            with self.assertRaises(ValueError):
+                apply_pragmas(cursor, {'cache_size': '1; DROP TABLE api_product'})
+
+
+class CatalogCacheTest(APITestCase):
+    """Test versioned catalog response cache"""
+
+    def setUp(self):
+        clear_catalog_cache()
+        self.category = Category.objects.create(category_name="Electronics")
+        self.product = Product.objects.create(product_name="Laptop", price=1000, stock=5, category=self.category)
+
+    def test_etag_not_modified_without_queries(self):
+        """Test If-None-Match answers 304 without touching the database"""
+        response = self.client.get('/api/categories/')
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_cached_body_served_without_queries(self):
+        """Test repeated requests are served from the cache"""
+        first = self.client.get('/api/products/%d/' % self.product.product_id)
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/products/%d/' % self.product.product_id)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_save_invalidates(self):
+        """Test saving a product bumps the catalog version"""
+        etag = self.client.get('/api/products/').get('ETag')
+        self.product.product_name = "Gaming Laptop"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['results'][0]['title'], "Gaming Laptop")
+
+    def test_stock_movement_invalidates_only_its_products(self):
+        """Test a stock movement expires cached responses with that product's stock and nothing else"""
+        other = Product.objects.create(product_name="Phone", price=500, stock=3, category=self.category)
+        clear_catalog_cache()
+        paths = {
+            'laptop': '/api/products/%d/' % self.product.product_id,
+            'phone': '/api/products/%d/' % other.product_id,
+            'titles': '/api/products/?fields=id,title',
+            'categories': '/api/categories/',
+            'in_stock': '/api/products/filter/?in_stock=1',
+        }
+        etags = {name: self.client.get(path)['ETag'] for name, path in paths.items()}
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            take_stock({self.product.product_id: 2})
+        with self.assertNumQueries(0):
+            for name in ('phone', 'titles', 'categories'):
+                response = self.client.get(paths[name], HTTP_IF_NONE_MATCH=etags[name])
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(paths['laptop'], HTTP_IF_NONE_MATCH=etags['laptop'])
+        self.assertEqual(response.json()['stock'], 3)
+        response = self.client.get(paths['in_stock'], HTTP_IF_NONE_MATCH=etags['in_stock'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_browsable_html_is_never_shared(self):
+        """Test a user's browsable API page is not cached and served to another user"""
+        staff = User.objects.create_user(username='staffer', password='pass123', is_staff=True)
+        other = User.objects.create_user(username='buyer', password='pass123')
+        self.client.force_authenticate(staff)
+        first = self.client.get('/api/products/', HTTP_ACCEPT='text/html')
+        self.assertContains(first, 'staffer')
+        self.assertNotIn('ETag', first)
+        for user in (other, None):
+            self.client.force_authenticate(user)
+            response = self.client.get('/api/products/', HTTP_ACCEPT='text/html')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotContains(response, 'staffer')
+            self.assertNotIn('ETag', response)
+        self.assertIn('ETag', self.client.get('/api/products/'))
+
+    def test_bounded_cache_evicts_least_recently_used(self):
+        """Test the in-process tier keeps at most max_entries"""
+        lru = BoundedCache(2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+
+
+class ProductSearchTest(APITestCase):
+    """Test FTS5 product search"""
+
+    def setUp(self):
+        clear_catalog_cache()
+        self.laptop = Product.objects.create(product_name="Gaming Laptop", product_description="Fast", price=1000)
+        self.bag = Product.objects.create(product_name="Bag", product_description="Fits any laptop", price=50)
+        self.phone = Product.objects.create(product_name="Điện thoại", product_description=None, price=300)
+
+    def search(self, **params):
+        clear_catalog_cache()
+        return self.client.get('/api/products/search/', params)
+
+    def titles(self, response):
+        return [item['title'] for item in response.json()['results']]
+
+    def test_name_match_ranks_first(self):
+        """Test BM25 ranks a name match above a description match"""
+        self.assertEqual(self.titles(self.search(q="laptop")), ["Gaming Laptop", "Bag"])
+
+    def test_prefix_and_diacritics(self):
+        """Test prefix matching ignores Vietnamese diacritics"""
+        self.assertEqual(self.titles(self.search(q="đien thoai")), ["Điện thoại"])
+        self.assertEqual(self.titles(self.search(q="gam")), ["Gaming Laptop"])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test triggers keep the index in sync"""
+        self.laptop.product_name = "Gaming Notebook"
+        self.laptop.save()
+        self.bag.delete()
+        self.assertEqual(self.titles(self.search(q="notebook")), ["Gaming Notebook"])
+        self.assertEqual(self.titles(self.search(q="laptop")), [])
+
+    def test_pagination(self):
+        """Test search results are paginated with a cursor"""
+        first = self.search(q="laptop", page_size=1).json()
+        second = self.search(q="laptop", page_size=1, cursor=first['next']).json()
+        self.assertEqual([first['results'][0]['title'], second['results'][0]['title']], ["Gaming Laptop", "Bag"])
+        self.assertIsNone(second['next'])
+
+    def test_cursor_with_wrong_types(self):
+        """Test a well-formed cursor whose values are not numbers is rejected with 400"""
+        for values in ([[1], None], [None, '1'], ['0.5', {'a': 1}], ['rank', '1']):
+            cursor = base64.urlsafe_b64encode(json.dumps({'o': 'rank,rowid', 'v': values}).encode()).decode()
+            response = self.search(q="laptop", cursor=cursor)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_query_required(self):
+        """Test an empty or punctuation-only query is rejected"""
+        self.assertEqual(self.search(q='"*').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class QueryPlanTest(APITestCase):
+    """Test indexes back the hot queries"""
+    databases = {'default', 'archive'}
+
+    def test_cart_post_merges_same_product(self):
+        """Test adding a product already in the cart increases its quantity"""
+        user = User.objects.create_user(username='buyer', password='pass123')
+        product = Product.objects.create(product_name="Laptop", price=1000, stock=5)
+        self.client.force_authenticate(user)
+        self.client.post('/api/cart/', {'product_id': product.product_id, 'quantity': 1}, format='json')
+        response = self.client.post('/api/cart/', {'product_id': product.product_id, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['quantity'], 3)
+        self.assertEqual(CartItem.objects.filter(user=user).count(), 1)
+
+    def test_no_full_table_scans(self):
+        """Test explain_queries finds no full table scan"""
+        out = StringIO()
+        call_command('explain_queries', stdout=out)
+        self.assertIn("No full table scans.", out.getvalue())
+
+
+class CartBatchTest(APITestCase):
+    """Test the batch cart endpoint"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='pass123')
+        self.client.force_authenticate(self.user)
+        self.products = [Product.objects.create(product_name="P%d" % i, price=10, stock=10) for i in range(4)]
+        CartItem.objects.create(user=self.user, product=self.products[0], quantity=1)
+        CartItem.objects.create(user=self.user, product=self.products[1], quantity=5)
+
+    def test_batch_applies_all_ops(self):
+        """Test add, set and remove are applied and the final cart returned"""
+        p0, p1, p2, p3 = [p.product_id for p in self.products]
+        response = self.client.post('/api/cart/batch/', [
+            {'product_id': p0, 'quantity': 2, 'op': 'add'},
+            {'product_id': p1, 'op': 'remove'},
+            {'product_id': p2, 'quantity': 3},
+            {'product_id': p3, 'quantity': 1, 'op': 'add'},
+            {'product_id': p3, 'quantity': 1, 'op': 'add'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cart = {item['product_id']: item['quantity'] for item in response.data}
+        self.assertEqual(cart, {p0: 3, p2: 3, p3: 2})
+        self.assertEqual(CartItem.objects.filter(user=self.user).count(), 3)
+
+    def test_batch_query_count(self):
+        """Test a 50 item sync costs a fixed number of queries"""
+        products = Product.objects.bulk_create([Product(product_name="B%d" % i, price=1) for i in range(50)])
+        entries = [{'product_id': p.product_id, 'quantity': 2} for p in products]
+        with self.assertNumQueries(6):
+            response = self.client.post('/api/cart/batch/', {'items': entries}, format='json')
+        self.assertEqual(len(response.data), 52)
+
+    def test_unknown_product_rolls_back(self):
+        """Test one bad entry rejects the whole batch"""
+        response = self.client.post('/api/cart/batch/', [
+            {'product_id': self.products[0].product_id, 'quantity': 9},
+            {'product_id': 9999, 'quantity': 1},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(CartItem.objects.get(user=self.user, product=self.products[0]).quantity, 1)
+
+
+class FastReadPathTest(APITestCase):
+    """Test the .values() read path matches the DRF serializers byte for byte"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='pass123')
+        category = Category.objects.create(category_name="Điện tử")
+        Product.objects.create(product_name="Laptop\u2028\"quoted\"", product_description=None,
+                               price=1000.5, discountPercentage=None, stock=None, category=None)
+        Product.objects.create(product_name="Bàn phím", product_description="Mô tả", price=20,
+                               discountPercentage=12.5, stock=3, image_url="k.png", category=category)
+        order = Order.objects.create(customer=self.user, address="HN", phone="0123456789", total=1020.5)
+        for product in Product.objects.all():
+            OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+        OrderItem.objects.create(order=order, product=None, quantity=2, price=5)
+
+    def test_products_identical(self):
+        """Test product rows render like ProductSerializer"""
+        products = Product.objects.order_by('product_id')
+        expected = JSONRenderer().render(ProductSerializer(products, many=True).data)
+        actual = FastJSONRenderer().render(product_rows(with_available_stock(products).values(*PRODUCT_COLUMNS)))
+        self.assertEqual(actual, expected)
+
+    def test_orders_identical(self):
+        """Test order rows render like OrderSerializer"""
+        orders = Order.objects.all()
+        expected = JSONRenderer().render(OrderSerializer(orders, many=True).data)
+        items = stocked_order_items().order_by('id').values(*ORDER_ITEM_COLUMNS)
+        actual = FastJSONRenderer().render(order_rows(orders.values(*ORDER_COLUMNS), items))
+        self.assertEqual(actual, expected)
+
+    def test_categories_identical(self):
+        """Test category rows render like CategorySerializer"""
+        categories = Category.objects.all()
+        expected = JSONRenderer().render(CategorySerializer(categories, many=True).data)
+        actual = FastJSONRenderer().render(category_rows(categories.values(*CATEGORY_COLUMNS)))
+        self.assertEqual(actual, expected)
+
+    def test_renderer_matches_drf(self):
+        """Test datetime, date, time, Decimal and UUID values render exactly like JSONRenderer"""
+        moment = datetime(2024, 5, 6, 7, 8, 9, 123456, tzinfo=dt_timezone.utc)
+        data = {'utc': moment, 'local': timezone.localtime(moment), 'naive': datetime(2024, 1, 2, 3, 4),
+                'day': date(2024, 5, 6), 'time': dt_time(7, 8, 9, 5), 'price': Decimal('10.50'),
+                'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'), 'items': [None, 1.5, "\u2029"]}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertIn(b'"2024-05-06T07:08:09.123456Z"', FastJSONRenderer().render(data))
+
+    def test_renderer_rejects_non_finite(self):
+        """Test NaN and Infinity raise ValueError like JSONRenderer instead of rendering null"""
+        for value in (float('nan'), float('inf'), Decimal('NaN'), [{'price': -float('inf')}]):
+            with self.assertRaises(ValueError):
+                JSONRenderer().render({'value': value})
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render({'value': value})
+
+
+class AsyncEndpointTest(TestCase):
+    """Test the async (ASGI) read endpoints"""
+
+    def setUp(self):
+        clear_catalog_cache()
+        self.user = User.objects.create_user(username='buyer', password='pass123')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.product = Product.objects.create(product_name="Laptop", price=1000, stock=5)
+        self.cart_item = CartItem.objects.create(user=self.user, product=self.product, quantity=2)
+
+    async def test_product_list_matches_sync(self):
+        """Test async product_list returns the same body as the sync view"""
+        expected = (await sync_to_async(self.client.get)('/api/products/')).content
+        clear_catalog_cache()
+        response = await self.async_client.get('/api/async/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected)
+
+    async def test_cart_requires_jwt(self):
+        """Test async cart_list authenticates with the simplejwt token"""
+        response = await self.async_client.get('/api/async/cart/')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/api/async/cart/', headers={'Authorization': 'Bearer ' + self.token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{'product_id': self.product.product_id, 'quantity': 2,
+                                            'id': self.cart_item.cart_item_id}])
+
+    async def test_invalid_token(self):
+        """Test a bad token is rejected like the sync views do"""
+        response = await self.async_client.get('/api/async/order/', headers={'Authorization': 'Bearer nope'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'token_not_valid')
+
+
+class CachedJWTAuthenticationTest(APITestCase):
+    """Test the cached JWT user resolution"""
+
+    def setUp(self):
+        clear_user_cache()
+        self.user = User.objects.create_user(username='buyer', password='pass123')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer %s' % RefreshToken.for_user(self.user).access_token)
+
+    def test_second_request_skips_user_query(self):
+        """Test the user is loaded once and then served from the cache"""
+        with self.assertNumQueries(2):
+            self.client.get('/api/cart/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/cart/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deactivated_user_is_rejected(self):
+        """Test saving the user invalidates the cached entry"""
+        self.client.get('/api/cart/')
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/cart/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates(self):
+        """Test a password change reloads the user from the database"""
+        self.client.get('/api/cart/')
+        self.user.set_password('new-pass-456')
+        self.user.save()
+        with self.assertNumQueries(2):
+            self.client.get('/api/cart/')
+
+
+class PasswordHashingTest(APITestCase):
+    """Test login and register hashing through the bounded pool"""
+
+    def setUp(self):
+        clear_user_cache()
+        self.user = User.objects.create_user(username='buyer', password='pass123')
+
+    def tearDown(self):
+        hashing.set_pool(None)
+
+    def test_login_rehashes_outdated_password(self):
+        """Test a password stored with an old hasher is upgraded on login"""
+        self.user.password = make_password('pass123', hasher='pbkdf2_sha1')
+        self.user.save()
+        response = self.client.post('/api/login/', {'username': 'buyer', 'password': 'pass123'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(self.user.check_password('pass123'))
+
+    def test_wrong_password_and_unknown_user(self):
+        """Test bad credentials are rejected"""
+        for username, password in (('buyer', 'wrong'), ('nobody', 'pass123')):
+            response = self.client.post('/api/login/', {'username': username, 'password': password}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_login_goes_through_authenticate(self):
+        """Test inactive users are refused and failed logins send user_login_failed"""
+        failed = []
+
+        def record(sender, credentials, **kwargs):
+            failed.append(credentials['username'])
+
+        user_login_failed.connect(record)
+        try:
+            self.client.post('/api/login/', {'username': 'buyer', 'password': 'wrong'}, format='json')
+            self.user.is_active = False
+            self.user.save()
+            response = self.client.post('/api/login/', {'username': 'buyer', 'password': 'pass123'}, format='json')
+        finally:
+            user_login_failed.disconnect(record)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(failed, ['buyer', 'buyer'])
+
+    def test_full_pool_returns_429(self):
+        """Test login is refused quickly when the hashing queue is full"""
+        pool = hashing.HashingPool(1, 0)
+        hashing.set_pool(pool)
+        pool._slots.acquire()
+        try:
+            response = self.client.post('/api/login/', {'username': 'buyer', 'password': 'pass123'}, format='json')
+        finally:
+            pool._slots.release()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        response = self.client.post('/api/login/', {'username': 'buyer', 'password': 'pass123'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class PerformanceMetricsTest(APITestCase):
+    """Test the per-view timing middleware and metrics endpoint"""
+
+    def setUp(self):
+        clear_catalog_cache()
+        registry.clear()
+        self.staff = User.objects.create_user(username='admin', password='pass123', is_staff=True)
+        Category.objects.create(category_name="Electronics")
+
+    def test_server_timing_header(self):
+        """Test responses carry total, sql and render timings"""
+        response = self.client.get('/api/categories/')
+        timing = response['Server-Timing']
+        self.assertIn('total;dur=', timing)
+        self.assertIn('desc="1 queries"', timing)
+        self.assertIn('render;dur=', timing)
+
+    def test_render_time_of_cached_views(self):
+        """Test render time counts rendering done inside cached views"""
+        render = FastJSONRenderer.render
+
+        def slow_render(renderer, *args, **kwargs):
+            time.sleep(0.02)
+            return render(renderer, *args, **kwargs)
+
+        with mock.patch.object(FastJSONRenderer, 'render', slow_render):
+            response = self.client.get('/api/categories/')
+        self.assertGreaterEqual(registry.snapshot()['category_list'].render_seconds, 0.02)
+        render_ms = float(response['Server-Timing'].split('render;dur=')[1].split(';')[0].split(',')[0])
+        self.assertGreaterEqual(render_ms, 20)
+
+    def test_stats_are_aggregated_by_view(self):
+        """Test sync and async views record SQL queries and bytes"""
+        self.client.get('/api/categories/')
+        self.client.get('/api/categories/')
+        clear_catalog_cache()
+        self.client.get('/api/async/categories/')
+        stats = registry.snapshot()
+        self.assertEqual(stats['category_list'].count, 2)
+        self.assertEqual(stats['category_list'].sql_queries, 1)
+        self.assertGreater(stats['category_list'].bytes, 0)
+        self.assertEqual(stats['async_category_list'].sql_queries, 1)
+
+    def test_metrics_endpoint_is_staff_only(self):
+        """Test the Prometheus endpoint requires a staff user"""
+        self.client.get('/api/categories/')
+        self.assertEqual(self.client.get('/api/_metrics').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/api/_metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn('api_request_duration_seconds_count{view="category_list"} 1', body)
+        self.assertIn('api_sql_queries_total{view="category_list"} 1', body)
+
+
+class SeedAndBenchCommandTest(TestCase):
+    """Test the seed_catalog and bench_api management commands"""
+    databases = {'default', 'archive'}
+
+    def test_seed_catalog(self):
+        """Test seeding creates the requested rows with consistent order totals"""
+        call_command('seed_catalog', categories=3, products=40, users=5, cart_items=10, orders=8, stdout=StringIO())
+        self.assertEqual(Category.objects.count(), 3)
+        self.assertEqual(Product.objects.count(), 40)
+        self.assertEqual(CartItem.objects.count(), 10)
+        self.assertEqual(Order.objects.count(), 8)
+        for order in Order.objects.prefetch_related('items'):
+            self.assertEqual(order.total, sum(item.price for item in order.items.all()))
+
+    def test_bench_api_reports_routes(self):
+        """Test bench_api reports latency and query counts as JSON"""
+        out = StringIO()
+        call_command('bench_api', repeat=2, warmup=0, routes='product_list,create_order', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['uncovered'], [])
+        self.assertEqual(report['routes']['GET product_list']['status'], 200)
+        self.assertEqual(report['routes']['POST create_order']['status'], 201)
+        self.assertEqual(report['routes']['GET product_list']['queries'], {'min': 1, 'max': 1})
+        self.assertEqual(report['routes']['GET product_list']['latency']['count'], 2)
+
+
+class SalesRollupTest(APITestCase):
+    """Test the incrementally maintained sales rollups and report endpoint"""
+    databases = {'default', 'archive'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='pass123')
+        self.staff = User.objects.create_user(username='admin', password='pass123', is_staff=True)
+        self.phones = Category.objects.create(category_name="Phones")
+        self.phone = Product.objects.create(product_name="Phone", price=300, stock=10, category=self.phones)
+        self.case = Product.objects.create(product_name="Case", price=15, stock=10, category=self.phones)
+        self.client.force_authenticate(self.user)
+
+    def order(self, items):
+        response = self.client.post('/api/order/create/', {
+            'cartItems': [{'product_id': product.product_id, 'quantity': qty} for product, qty in items],
+            'address': 'HN', 'phone': '0123456789',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # bang tong hop duoc cap nhat boi task chay nen
+        tasks.run_pending()
+        return response.data['order_id']
+
+    def rollups(self):
+        return (
+            list(DailySales.objects.values_list('revenue', 'units', 'orders')),
+            sorted(DailyProductSales.objects.values_list('product_id', 'revenue', 'units', 'orders')),
+            list(DailyCategorySales.objects.values_list('category_id', 'revenue', 'units', 'orders')),
+        )
+
+    def test_create_and_cancel_update_rollups(self):
+        """Test orders add to the rollups and cancellation subtracts them"""
+        self.order([(self.phone, 1), (self.case, 2)])
+        second = self.order([(self.phone, 2)])
+        daily, products, categories = self.rollups()
+        self.assertEqual(daily, [(Decimal('930'), 5, 2)])
+        self.assertEqual(products, [(self.phone.product_id, Decimal('900'), 3, 2),
+                                    (self.case.product_id, Decimal('30'), 2, 1)])
+        self.assertEqual(categories, [(self.phones.category_id, Decimal('930'), 5, 2)])
+
+        response = self.client.patch('/api/order/cancel/%d/' % second)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        tasks.run_pending()
+        self.assertEqual(available_stock([self.phone.pk])[self.phone.pk], 9)
+        self.assertEqual(self.rollups()[0], [(Decimal('330'), 3, 1)])
+
+        # huy lan 2 khong tra kho / tru doanh thu them lan nua
+        response = self.client.patch('/api/order/cancel/%d/' % second)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(available_stock([self.phone.pk])[self.phone.pk], 9)
+
+    def test_rebuild_matches_incremental(self):
+        """Test the rebuild command produces the same rollups"""
+        self.order([(self.phone, 1), (self.case, 2)])
+        canceled = self.order([(self.case, 1)])
+        self.client.patch('/api/order/cancel/%d/' % canceled)
+        self.order([(self.phone, 2)])
+        incremental = self.rollups()
+        DailySales.objects.update(revenue=0)
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_rebuild_drops_pending_tasks_of_period(self):
+        """Test rebuild counts unprocessed orders once and drops only their pending tasks"""
+        order_id = self.order([(self.phone, 1)])
+        tasks.enqueue(sales.record_order_task, order_id, -1)
+        other = tasks.enqueue(record_call, order_id)
+        sales.rebuild()
+        self.assertEqual(list(Task.objects.values_list('id', flat=True)), [other.id])
+        self.assertEqual(self.rollups()[0], [(Decimal('300'), 1, 1)])
+
+    def test_report_endpoint(self):
+        """Test the staff report reads totals and top products from the rollups"""
+        self.order([(self.phone, 1), (self.case, 2)])
+        self.assertEqual(self.client.get('/api/reports/sales/').status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(self.staff)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/reports/sales/?group=product')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['totals'], {'revenue': '330.00', 'units': 3, 'orders': 1})
+        self.assertEqual([row['name'] for row in response.data['results']], ['Phone', 'Case'])
+        response = self.client.get('/api/reports/sales/?from=2020-01-02&to=2020-01-01')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StockLedgerTest(APITestCase):
+    """Test the append-only stock ledger"""
+
+    def setUp(self):
+        clear_catalog_cache()
+        self.user = User.objects.create_user(username='buyer', password='pass123')
+        self.staff = User.objects.create_user(username='admin', password='pass123', is_staff=True)
+        self.product = Product.objects.create(product_name="Phone", price=300, stock=10)
+        self.client.force_authenticate(self.user)
+
+    def order(self, quantity):
+        return self.client.post('/api/order/create/', {
+            'cartItems': [{'product_id': self.product.product_id, 'quantity': quantity}],
+            'address': 'HN', 'phone': '0123456789',
+        }, format='json')
+
+    def test_checkout_appends_movements(self):
+        """Test orders record movements and leave the product row alone"""
+        self.assertEqual(self.order(3).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.order(8).status_code, status.HTTP_400_BAD_REQUEST)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+        self.assertEqual(list(StockMovement.objects.values_list('quantity', 'reason')), [(-3, 'order')])
+        response = self.client.get('/api/products/%d/' % self.product.product_id)
+        self.assertEqual(response.json()['stock'], 7)
+
+    def test_compaction_keeps_available_stock(self):
+        """Test compaction folds movements into the stored balance"""
+        first = self.order(3).data['order_id']
+        self.order(2)
+        self.client.patch('/api/order/cancel/%d/' % first)
+        call_command('compact_stock', stdout=StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 8)
+        self.assertEqual(self.product.stock_through, StockMovement.objects.latest('id').id)
+        self.assertEqual(available_stock([self.product.pk])[self.product.pk], 8)
+        self.order(1)
+        self.assertEqual(available_stock([self.product.pk])[self.product.pk], 7)
+        call_command('check_stock', stdout=StringIO())
+
+    def test_staff_stock_edit_is_an_adjustment(self):
+        """Test setting stock through the API records an adjusting movement"""
+        self.order(3)
+        self.client.force_authenticate(self.staff)
+        response = self.client.patch('/api/products/%d/' % self.product.product_id, {'stock': 20}, format='json')
+        self.assertEqual(response.data['stock'], 20)
+        self.assertEqual(StockMovement.objects.latest('id').quantity, 13)
+        self.assertEqual(available_stock([self.product.pk])[self.product.pk], 20)
+
+    def test_consistency_checker_reports_mismatch(self):
+        """Test check_stock fails when movements disagree with an order"""
+        order_id = self.order(3).data['order_id']
+        StockMovement.objects.filter(order_id=order_id).update(quantity=-1)
+        with self.assertRaises(CommandError):
+            call_command('check_stock', stdout=StringIO())
+
+
+    @override_settings(STOCK_COMPACT_INTERVAL=30)
+    def test_compaction_is_scheduled_on_the_queue(self):
+        """Test run_worker schedules one periodic compaction task that folds movements and reschedules itself"""
+        self.order(3)
+        Task.objects.all().delete()
+        call_command('run_worker', '--burst', '--threads', '1', stdout=StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 7)
+        job = Task.objects.get()
+        self.assertEqual((job.name, job.status), ('api.inventory.compact_task', 'queued'))
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=20))
+        self.assertIsNone(inventory.schedule_compaction())
+        self.assertEqual(Task.objects.count(), 1)
+
+class ReadWriteRouterTest(SimpleTestCase):
+    """Test reads go to the read-only alias until the request writes"""
+
+    def setUp(self):
+        self.router = ReadWriteRouter()
+
+    def test_reads_use_replica(self):
+        """Test reads outside a transaction go to the read-only alias"""
+        self.assertEqual(self.router.db_for_read(Product), 'replica')
+        self.assertEqual(self.router.db_for_write(Product), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'api'))
+
+    def test_read_your_writes_within_request(self):
+        """Test a request that has written keeps reading from the writer"""
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(Product))
+            self.router.db_for_write(CartItem)
+            seen.append(self.router.db_for_read(Product))
+            return None
+
+        ReadYourWritesMiddleware(view)(None)
+        self.assertEqual(seen, ['replica', 'default'])
+        self.assertEqual(self.router.db_for_read(Product), 'replica')
+
+    def test_read_only_connection_keeps_journal_mode(self):
+        """Test mode=ro connections are detected so journal_mode is not changed"""
+        self.assertTrue(is_read_only(SimpleNamespace(settings_dict={'NAME': 'file:/srv/db.sqlite3?mode=ro'})))
+        self.assertFalse(is_read_only(SimpleNamespace(settings_dict={'NAME': '/srv/db.sqlite3'})))
+
+
+class CatalogImportExportTest(APITestCase):
+    """Test the streaming catalog import and export"""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(username='admin', password='pass123', is_staff=True)
+        self.phones = Category.objects.create(category_name="Phones")
+        self.phone = Product.objects.create(product_name="Phone", price=300, stock=10, category=self.phones)
+        self.client.force_authenticate(self.staff)
+        clear_catalog_cache()
+
+    def test_ndjson_import_upserts_in_batches_and_reports_errors(self):
+        """Test NDJSON rows are created or updated in batches and bad rows are reported"""
+        StockMovement.objects.create(product=self.phone, quantity=-3, reason='order')
+        body = '\n'.join([
+            json.dumps({'id': self.phone.product_id, 'title': 'Phone 2', 'price': '250.00', 'stock': 4}),
+            json.dumps({'title': 'Charger', 'price': '9.90', 'categoryId': self.phones.category_id}),
+            json.dumps({'title': 'No price'}),
+            json.dumps({'title': 'Bad category', 'price': '1', 'categoryId': 999}),
+            'not json',
+            json.dumps({'title': 'Cable', 'price': '3', 'discountPercentage': '5'}),
+        ]).encode()
+        response = self.client.post('/api/catalog/import/?batch_size=2', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['updated']), (2, 1))
+        self.assertEqual([error['line'] for error in response.data['errors']], [3, 4, 5])
+        self.assertIn('price', response.data['errors'][0]['errors'])
+
+        self.phone.refresh_from_db()
+        self.assertEqual((self.phone.product_name, self.phone.price), ('Phone 2', Decimal('250.00')))
+        self.assertEqual(self.phone.category_id, self.phones.category_id)
+        self.assertEqual(available_stock([self.phone.pk])[self.phone.pk], 4)
+        self.assertTrue(Product.objects.filter(product_name='Charger', category=self.phones).exists())
+
+    def test_csv_upload_and_command(self):
+        """Test CSV import through a file upload and the import_catalog command"""
+        upload = SimpleUploadedFile('categories.csv', b'id,name\n%d,Mobile\n,Tablets\n' % self.phones.category_id)
+        response = self.client.post('/api/catalog/import/?kind=categories', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['error_count']), (1, 1, 0))
+        self.assertEqual(sorted(Category.objects.values_list('category_name', flat=True)), ['Mobile', 'Tablets'])
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as source:
+            source.write('title,price,stock\nWatch,99.50,3\n')
+        self.addCleanup(os.remove, source.name)
+        out = StringIO()
+        call_command('import_catalog', source.name, stdout=out)
+        self.assertIn('1 created', out.getvalue())
+        self.assertEqual(Product.objects.get(product_name='Watch').stock, 3)
+
+    def test_export_streams_rows(self):
+        """Test the export is streamed in chunks and round-trips through import"""
+        Product.objects.create(product_name='Case, "red"', price=15, stock=2)
+        response = self.client.get('/api/catalog/export/?type=csv')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row['title'] for row in rows], ['Phone', 'Case, "red"'])
+        self.assertEqual(rows[0]['price'], '300.00')
+
+        out = StringIO()
+        call_command('export_catalog', '--chunk-size', '1', stdout=out)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(lines[0]['categoryId'], self.phones.category_id)
+        self.assertEqual(lines[1]['stock'], 2)
+
+        report = CatalogImport('products').run(BytesIO(out.getvalue().encode()), 'ndjson')
+        self.assertEqual((report['created'], report['updated'], report['error_count']), (0, 2, 0))
+
+    def test_csv_and_ndjson_prices_agree(self):
+        """Test CSV writes exact decimal strings, NDJSON writes API numbers, and both import to the same price"""
+        Product.objects.filter(pk=self.phone.pk).update(price=Decimal('19.99'), discountPercentage=Decimal('12.50'))
+        csv_row = next(csv.DictReader(StringIO(b''.join(export_chunks('products', 'csv')).decode())))
+        ndjson_row = json.loads(b''.join(export_chunks('products', 'ndjson')).splitlines()[0])
+        self.assertEqual((csv_row['price'], csv_row['discountPercentage']), ('19.99', '12.50'))
+        self.assertEqual((ndjson_row['price'], ndjson_row['discountPercentage']), (19.99, 12.5))
+        self.assertEqual(ndjson_row['price'], self.client.get('/api/products/%d/' % self.phone.pk).json()['price'])
+        for fmt, body in (('csv', b''.join(export_chunks('products', 'csv'))),
+                          ('ndjson', b''.join(export_chunks('products', 'ndjson')))):
+            Product.objects.filter(pk=self.phone.pk).update(price=1, discountPercentage=None)
+            CatalogImport('products').run(BytesIO(body), fmt)
+            self.phone.refresh_from_db()
+            self.assertEqual((self.phone.price, self.phone.discountPercentage), (Decimal('19.99'), Decimal('12.50')))
+
+
+class FacetedFilterTest(APITestCase):
+    """Test the multi-filter product endpoint and its facet counts"""
+
+    def setUp(self):
+        self.phones = Category.objects.create(category_name="Phones")
+        self.books = Category.objects.create(category_name="Books")
+        Product.objects.create(product_name="A", price=10, stock=0, discountPercentage=0, category=self.books)
+        Product.objects.create(product_name="B", price=30, stock=5, discountPercentage=20, category=self.books)
+        Product.objects.create(product_name="C", price=300, stock=5, discountPercentage=10, category=self.phones)
+        Product.objects.create(product_name="D", price=1500, stock=1, discountPercentage=5, category=self.phones)
+        clear_catalog_cache()
+
+    def get(self, params):
+        response = self.client.get('/api/products/filter/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_filters_combine(self):
+        """Test categories, price range, stock and discount filters are combined"""
+        data = self.get({'category': '%d,%d' % (self.phones.pk, self.books.pk), 'min_price': 20, 'sort': 'price_asc'})
+        self.assertEqual([product['title'] for product in data['results']], ["B", "C", "D"])
+        self.assertNotIn('facets', data)
+        data = self.get({'in_stock': 1, 'min_discount': 10, 'max_price': 1000})
+        self.assertEqual([product['title'] for product in data['results']], ["B", "C"])
+        response = self.client.get('/api/products/filter/', {'min_price': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_no_op_filters_are_not_filters(self):
+        """Test params that parse to no filter do not satisfy the at-least-one-filter rule"""
+        for params in ({'in_stock': 0}, {'in_stock': 'no'}, {'category': ','}, {'min_price': ''}):
+            for path in ('/api/products/filter/', '/api/async/products/filter/'):
+                response = self.client.get(path, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn("At least one filter", response.json()['detail'])
+        self.assertEqual(len(self.get({'min_price': 0})['results']), 4)
+
+    def test_facets_in_one_query(self):
+        """Test facet counts exclude their own filter and come from a single query"""
+        with self.assertNumQueries(2):
+            data = self.get({'category': self.books.pk, 'max_price': 100, 'facets': 1})
+        self.assertEqual([product['title'] for product in data['results']], ["A", "B"])
+        facets = data['facets']
+        self.assertEqual(facets['total'], 2)
+        # danh muc: tinh voi bo loc gia, khong tinh bo loc danh muc
+        self.assertEqual(facets['categories'], [{'id': self.books.pk, 'name': 'Books', 'count': 2}])
+        # khoang gia: tinh voi bo loc danh muc, khong tinh bo loc gia
+        self.assertEqual([bucket['count'] for bucket in facets['price']], [1, 1, 0, 0, 0, 0, 0])
+        self.assertEqual(facets['price'][-1], {'min': 1000, 'max': None, 'count': 0})
+
+        data = self.get({'in_stock': 'true', 'facets': 1})
+        self.assertEqual(data['facets']['categories'], [{'id': self.phones.pk, 'name': 'Phones', 'count': 2},
+                                                        {'id': self.books.pk, 'name': 'Books', 'count': 1}])
+        self.assertEqual(data['facets']['price'][1]['count'], 1)
+        self.assertEqual(data['facets']['price'][-1]['count'], 1)
+
+
+class ExpandedCartTest(APITestCase):
+    """Test the expanded cart with embedded products and totals"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='pass123')
+        self.phone = Product.objects.create(product_name="Phone", price=300, stock=10, discountPercentage=25)
+        self.case = Product.objects.create(product_name="Case", price=Decimal('9.99'), stock=3)
+        CartItem.objects.create(user=self.user, product=self.phone, quantity=2)
+        CartItem.objects.create(user=self.user, product=self.case, quantity=3)
+        self.client.force_authenticate(self.user)
+
+    def test_expanded_cart_in_one_query(self):
+        """Test products and totals are embedded and loaded with one query"""
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/cart/', {'expand': 'product'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        phone, case = data['items']
+        self.assertEqual(phone['product']['title'], "Phone")
+        self.assertEqual(case['product']['stock'], 3)
+        self.assertEqual(phone['product']['discountPercentage'], 25.0)
+        self.assertEqual((phone['total'], case['total']), ('600.00', '29.97'))
+        self.assertNotIn('discount', phone)
+        self.assertEqual((data['quantity'], data['subtotal'], data['total']), (5, '629.97', '629.97'))
+
+        # tong tien bang so tien create_order tinh
+        response = self.client.post('/api/order/create/', {
+            'cartItems': [{'product_id': item['product_id'], 'quantity': item['quantity']} for item in data['items']],
+            'address': 'HN', 'phone': '0123456789',
+        }, format='json')
+        self.assertEqual(Order.objects.get(pk=response.data['order_id']).total, Decimal(data['total']))
+
+    async def test_batch_and_async_expand(self):
+        """Test cart batch and the async cart return the same expanded cart"""
+        response = await sync_to_async(self.client.post)(
+            '/api/cart/batch/?expand=product', [{'product_id': self.case.pk, 'op': 'remove'}], format='json')
+        self.assertEqual([item['product_id'] for item in response.json()['items']], [self.phone.pk])
+        self.assertEqual(response.json()['total'], '600.00')
+
+        token = str(RefreshToken.for_user(self.user).access_token)
+        response = await self.async_client.get('/api/async/cart/?expand=product',
+                                               headers={'Authorization': 'Bearer ' + token})
+        self.assertEqual(response.json(), (await sync_to_async(self.client.get)('/api/cart/?expand=product')).json())
+
+
+class ProductBatchLookupTest(APITestCase):
+    """Test looking up many products by id in one request"""
+
+    def setUp(self):
+        self.products = [Product.objects.create(product_name="P%d" % i, price=i + 1, stock=i) for i in range(3)]
+        self.ids = [product.product_id for product in self.products]
+        clear_catalog_cache()
+
+    def test_ids_keep_order_and_report_missing(self):
+        """Test ?ids= returns products in the requested order from one query"""
+        missing = max(self.ids) + 100
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/', {'ids': '%d,%d,%d,%d' % (self.ids[2], missing, self.ids[0], self.ids[2])})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual([product['title'] for product in data['results']], ["P2", "P0"])
+        self.assertEqual(data['missing'], [missing])
+        self.assertEqual(data['results'][0], self.client.get('/api/products/%d/' % self.ids[2]).json())
+
+    def test_post_body_and_limit(self):
+        """Test the POST variant and the configurable maximum batch size"""
+        response = self.client.post('/api/products/batch/', {'ids': self.ids[::-1]}, format='json')
+        self.assertEqual([product['id'] for product in response.json()['results']], self.ids[::-1])
+        with override_settings(PRODUCT_BATCH_MAX_IDS=2):
+            response = self.client.post('/api/products/batch/', {'ids': self.ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/products/', {'ids': '1,x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SparseFieldsetTest(APITestCase):
+    """Test ?fields= limits both the response and the selected columns"""
+
+    def setUp(self):
+        self.product = Product.objects.create(product_name="Laptop", product_description="x" * 1000,
+                                              price=1000, stock=5, image_url="laptop.png")
+        clear_catalog_cache()
+
+    def test_only_requested_columns_are_loaded(self):
+        """Test unrequested fields are neither serialized nor selected"""
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/products/', {'fields': 'id,title,thumbnail'})
+        self.assertEqual(response.json()['results'], [{'id': self.product.pk, 'title': "Laptop", 'thumbnail': "laptop.png"}])
+        sql = captured.captured_queries[0]['sql']
+        self.assertNotIn('product_description', sql)
+        self.assertNotIn('api_stockmovement', sql)
+
+        response = self.client.get('/api/products/filter/', {'sort': 'price_asc', 'fields': 'price,stock', 'page_size': 1})
+        self.assertEqual(response.json()['results'], [{'price': 1000.0, 'stock': 5}])
+        response = self.client.get('/api/products/%d/' % self.product.pk, {'fields': 'description'})
+        self.assertEqual(response.json(), {'description': "x" * 1000})
+
+    def test_unknown_field_is_rejected(self):
+        """Test an unknown field name returns 400"""
+        response = self.client.get('/api/products/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CatalogSnapshotTest(APITestCase):
+    """Test the precompressed catalog snapshot"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(CATALOG_SNAPSHOT_DIR=directory.name, CATALOG_SNAPSHOT_DEBOUNCE=60)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        snapshots.reset()
+        self.addCleanup(snapshots.reset)
+        clear_catalog_cache()
+        self.category = Category.objects.create(category_name="Phones")
+        self.product = Product.objects.create(product_name="Phone", price=300, stock=10, category=self.category)
+
+    def download(self, **headers):
+        response = self.client.get('/api/catalog/snapshot/', headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, b''.join(response.streaming_content)
+
+    def change_catalog(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.product.pk).update(product_name=name)
+            Product.objects.get(pk=self.product.pk).save()
+
+    def test_encodings_match_catalog(self):
+        """Test every encoding carries the same catalog as the list endpoints"""
+        # chua build: JSON khong nen doc tu database, build duoc dua vao hang doi
+        response, plain = self.download(accept_encoding='gzip')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertNotIn('ETag', response)
+        self.assertEqual(tasks.run_pending(), 1)
+
+        response, body = self.download()
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(body, plain)
+        catalog = json.loads(body)
+        self.assertEqual(catalog['products'], self.client.get('/api/products/').json()['results'])
+        self.assertEqual(catalog['categories'], self.client.get('/api/categories/').json())
+
+        response, compressed = self.download(accept_encoding='br;q=0, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed), body)
+        self.assertEqual(snapshots.choose_encoding('gzip, br', ['br', 'gzip']), 'br')
+        self.assertIsNone(snapshots.choose_encoding('identity', ['br', 'gzip']))
+
+    def test_rebuilt_by_worker_after_debounce(self):
+        """Test a published snapshot costs no queries and catalog changes are rebuilt by the queue, not the request"""
+        snapshots.build_snapshot()
+        with self.assertNumQueries(0):
+            cached, _ = self.download(accept_encoding='gzip')
+        response = self.client.get('/api/catalog/snapshot/', headers={'if_none_match': cached['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.change_catalog("Phone 2")
+        # request van tra ban cu, build chay sau CATALOG_SNAPSHOT_DEBOUNCE giay
+        self.assertEqual(self.download()[0]['ETag'], cached['ETag'])
+        self.assertEqual(self.download()[0]['ETag'], cached['ETag'])
+        job = Task.objects.get(name=tasks.task_name(snapshots.build_snapshot_task))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(tasks.run_pending(), 0)
+
+        Task.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.assertEqual(tasks.run_pending(), 1)
+        response, body = self.download()
+        self.assertNotEqual(response['ETag'], cached['ETag'])
+        self.assertEqual(json.loads(body)['products'][0]['title'], "Phone 2")
+
+    @override_settings(CATALOG_SNAPSHOT_KEEP=1)
+    def test_prune_keeps_previous_generation(self):
+        """Test pruning never removes the published snapshot or the one published before it"""
+        first = snapshots.build_snapshot()
+        self.change_catalog("Phone 2")
+        second = snapshots.build_snapshot()
+        self.change_catalog("Phone 3")
+        third = snapshots.build_snapshot()
+        names = {path.name for path in snapshots.snapshot_dir().glob('catalog-*.json')}
+        self.assertEqual(names, {second, third})
+        self.assertNotIn(first, names)
+        self.assertEqual(snapshots.published()['previous'], second)
+
+
+task_calls = []
+
+
+def record_call(*args, **kwargs):
+    task_calls.append((args, kwargs))
+
+
+@tasks.task(max_attempts=2)
+def always_fail():
+    raise ValueError("boom")
+
+
+@override_settings(STOCK_COMPACT_INTERVAL=0)
+class TaskQueueTest(TestCase):
+    """Test the database-backed background task queue"""
+
+    def setUp(self):
+        task_calls.clear()
+
+    def test_enqueue_and_run(self):
+        """Test a queued task runs once with its arguments and is removed"""
+        tasks.enqueue(record_call, 1, 'a', flag=True)
+        self.assertEqual(task_calls, [])
+        self.assertEqual(tasks.run_pending(), 1)
+        self.assertEqual(task_calls, [((1, 'a'), {'flag': True})])
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(tasks.run_pending(), 0)
+
+    def test_retry_with_backoff_then_fail(self):
+        """Test a failing task is retried later and marked failed after max_attempts"""
+        job = tasks.enqueue(always_fail)
+        with self.assertLogs('api.tasks', 'WARNING') as logs:
+            self.assertEqual(tasks.run_pending(), 1)
+        self.assertEqual(logs.records[0].levelname, 'WARNING')
+        self.assertRegex(logs.records[0].getMessage(),
+                         r"^Task api\.tests\.always_fail #%d failed \(attempt 1\), retry in \d+\.\ds: boom$" % job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn("boom", job.last_error)
+        # chua den han thu lai
+        self.assertEqual(tasks.run_pending(), 0)
+
+        Task.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('api.tasks', 'WARNING') as logs:
+            self.assertEqual(tasks.run_pending(), 1)
+        self.assertEqual(logs.records[0].levelname, 'ERROR')
+        self.assertEqual(logs.records[0].getMessage(),
+                         "Task api.tests.always_fail #%d failed after 2 attempts: boom" % job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertEqual(tasks.run_pending(), 0)
+
+    def test_expired_task_is_reclaimed(self):
+        """Test a task whose worker stopped past the visibility timeout runs again, and the old run cannot finish it"""
+        tasks.enqueue(record_call, 'x')
+        stale = tasks.claim()
+        self.assertIsNone(tasks.claim())
+        Task.objects.filter(pk=stale.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        job = tasks.claim()
+        self.assertEqual(job.attempts, 2)
+        tasks.execute(stale)
+        self.assertTrue(Task.objects.filter(pk=job.pk, status='running').exists())
+        self.assertTrue(tasks.execute(job))
+        self.assertFalse(Task.objects.exists())
+
+    def test_rolled_back_enqueue_is_dropped(self):
+        """Test a task enqueued in a rolled back transaction never runs"""
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                tasks.enqueue(record_call, 'x')
+                raise ValueError
+        self.assertEqual(tasks.run_pending(), 0)
+
+    def test_run_worker_burst(self):
+        """Test run_worker --burst drains the queue and exits"""
+        tasks.enqueue(record_call, 1)
+        tasks.enqueue(record_call, 2)
+        out = StringIO()
+        call_command('run_worker', '--burst', '--threads', '1', stdout=out)
+        self.assertIn("Worker stopped after 2 tasks.", out.getvalue())
+        self.assertEqual(sorted(task_calls), [((1,), {}), ((2,), {})])
+
+    @override_settings(TASK_QUEUE={'BACKOFF': 0.01})
+    def test_run_worker_survives_database_errors(self):
+        """Test run_worker logs a database error from claim or retry, backs off and keeps working"""
+        tasks.enqueue(record_call, 1)
+        tasks.enqueue(always_fail)
+        claim = tasks.claim
+        with mock.patch.object(tasks, 'claim', side_effect=[OperationalError("database is locked"), claim(), claim(), None]), \
+                mock.patch.object(tasks, 'retry', side_effect=OperationalError("database is locked")), \
+                self.assertLogs('api.tasks', 'WARNING') as logs:
+            out = StringIO()
+            call_command('run_worker', '--burst', '--threads', '1', stdout=out)
+        self.assertIn("Worker stopped after 1 tasks.", out.getvalue())
+        self.assertEqual(task_calls, [((1,), {})])
+        self.assertEqual([(record.levelname, record.getMessage()) for record in logs.records],
+                         [('ERROR', "Task queue database error, retry in 0.0s"),
+                          ('ERROR', "Task queue database error, retry in 0.0s")])
+
+
+class OrderArchiveTest(APITestCase):
+    """Test moving old orders to the archive database and reading them back"""
+    databases = {'default', 'archive'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='pass123')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer %s' % RefreshToken.for_user(self.user).access_token)
+        phones = Category.objects.create(category_name="Phones")
+        cases = Category.objects.create(category_name="Cases")
+        self.phone = Product.objects.create(product_name="Phone", price=300, stock=100, category=phones)
+        self.case = Product.objects.create(product_name="Case", price=20, stock=100, category=cases)
+
+    def order(self, status, days_ago, items=None):
+        order = Order.objects.create(customer=self.user, address="HN", phone="0123456789", status=status)
+        total = 0
+        for product, quantity in items or [(self.phone, 1), (self.case, 2)]:
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, price=product.price * quantity)
+            total += product.price * quantity
+        Order.objects.filter(pk=order.pk).update(total=total, time_create=timezone.now() - timedelta(days=days_ago))
+        return order.pk
+
+    def history(self, path='/api/order/'):
+        results, cursor = [], None
+        while True:
+            response = self.client.get(path, {'cursor': cursor} if cursor else {})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            results += response.json()['results']
+            cursor = response.json()['next']
+            if not cursor:
+                return results
+
+    def test_moves_only_old_finished_orders(self):
+        """Test only shipped/canceled orders past the threshold without pending tasks are archived"""
+        shipped = self.order('shipped', 200)
+        canceled = self.order('canceled', 100)
+        pending = self.order('pending', 200)
+        recent = self.order('shipped', 10)
+        waiting = self.order('shipped', 150)
+        tasks.enqueue(sales.record_order_task, waiting)
+        out = StringIO()
+        call_command('archive_orders', '--batch-size', '1', stdout=out)
+        self.assertIn("Archived 2 orders.", out.getvalue())
+        self.assertEqual(set(Order.objects.values_list('id', flat=True)), {pending, recent, waiting})
+        self.assertEqual(set(ArchivedOrder.objects.values_list('id', flat=True)), {shipped, canceled})
+        self.assertEqual(ArchivedOrderItem.objects.filter(order=shipped).count(), 2)
+        self.assertFalse(OrderItem.objects.filter(order__in=[shipped, canceled]).exists())
+
+    @override_settings(API_PAGE_SIZE=2)
+    def test_history_unchanged_by_archiving(self):
+        """Test sync and async orders_list return the same pages before and after archiving"""
+        for days_ago, state in [(300, 'shipped'), (5, 'pending'), (200, 'canceled'), (120, 'pending'),
+                                (100, 'shipped'), (1, 'shipped'), (250, 'pending'), (350, 'paid')]:
+            self.order(state, days_ago)
+        self.phone.delete()
+        before = self.history()
+        self.assertEqual(archive.archive_orders(), 3)
+        self.assertEqual(Order.objects.count(), 5)
+        self.assertEqual(self.history(), before)
+        self.assertEqual(self.history('/api/async/order/'), before)
+        self.assertEqual([item['product'] for item in before[-1]['items']],
+                         [None, self.client.get('/api/products/%d/' % self.case.pk).json()])
+
+    @override_settings(API_PAGE_SIZE=2)
+    def test_recent_page_skips_archive(self):
+        """Test a page of orders newer than the archive threshold does not query the archive"""
+        for days_ago in (1, 2, 300):
+            self.order('pending', days_ago)
+        with self.assertNumQueries(0, using='archive'):
+            response = self.client.get('/api/order/')
+        self.assertEqual(len(response.json()['results']), 2)
+        with self.assertNumQueries(1, using='archive'):
+            self.client.get('/api/order/', {'cursor': response.json()['next']})
+
+    def test_interrupted_batch_is_resumed(self):
+        """Test an order copied to the archive but not yet deleted is listed once and finished later"""
+        order = self.order('shipped', 200)
+        ArchivedOrder.objects.create(**Order.objects.values(
+            'id', 'customer_id', 'address', 'phone', 'note', 'time_create', 'total', 'status').get(pk=order))
+        self.assertEqual([row['id'] for row in self.history()], [order])
+        self.assertEqual(archive.archive_orders(), 1)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(ArchivedOrderItem.objects.filter(order=order).count(), 2)
+        self.assertEqual([row['id'] for row in self.history()], [order])
+
+    def test_rebuild_includes_archived_orders(self):
+        """Test rebuild_sales_rollups gives the same rollups after archiving"""
+        self.order('shipped', 200)
+        self.order('shipped', 200, [(self.case, 1)])
+        self.order('canceled', 200)
+        self.order('shipped', 100, [(self.phone, 3)])
+        self.order('pending', 200)
+
+        def rollups():
+            sales.rebuild()
+            return (list(DailySales.objects.order_by('day').values_list('day', 'revenue', 'units', 'orders')),
+                    list(DailyProductSales.objects.order_by('day', 'product').values_list(
+                        'day', 'product', 'revenue', 'units', 'orders')),
+                    list(DailyCategorySales.objects.order_by('day', 'category').values_list(
+                        'day', 'category', 'revenue', 'units', 'orders')))
+
+        before = rollups()
+        self.assertEqual(archive.archive_orders(), 4)
+        self.assertEqual(rollups(), before)
+
+    @override_settings(ARCHIVE_DATABASE='missing')
+    def test_archive_not_migrated(self):
+        """Test orders_list works and archive_orders explains the missing migrate when the archive has no tables"""
+        order = self.order('shipped', 200)
+        self.assertEqual([row['id'] for row in self.history()], [order])
+        self.assertEqual([row['id'] for row in self.history('/api/async/order/')], [order])
+        with self.assertRaisesMessage(CommandError, "migrate --database archive"):
+            call_command('archive_orders', stdout=StringIO())
+        sales.rebuild()
+        self.assertEqual(DailySales.objects.get().orders, 1)
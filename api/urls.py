@@ -1,9 +1,12 @@
 from django.urls import path
 from .views import *
+from . import async_views
 urlpatterns = [
     path('products/',product_list,name='product_list'),
     path('products/<int:pk>/',product_detail,name='product_detail'),
     path('products/filter/',filter_products,name='filter_products'),
+    path('products/search/',search_products,name='search_products'),
+    path('products/batch/',product_batch,name='product_batch'),
 
     path('categories/',category_list,name='category_list'),
     path('categories/<int:pk>/',category_detail,name='category_detail'),
@@ -12,6 +15,7 @@ urlpatterns = [
     path('cart/<int:pk>/',remove_from_cart,name='cart_item_detail'),
     path('cart/item/',get_item_cart_by_product_id,name='get_item_cart_by_product_id'),
     path('cart/item/update/',update_cart_item_quantity,name='update_cart_item_quantity'),
+    path('cart/batch/',cart_batch,name='cart_batch'),
 
     path('order/create/',create_order,name='create_order'),
     path('order/cancel/<int:order_id>/',cancel_order,name='cancel_order'),
@@ -19,4 +23,18 @@ urlpatterns = [
     
     path('register/',register_user,name='register_user'),
     path('login/',login, name = 'login'),
+
+    path('reports/sales/',sales_report,name='sales_report'),
+    path('catalog/import/',catalog_import,name='catalog_import'),
+    path('catalog/export/',catalog_export,name='catalog_export'),
+    path('catalog/snapshot/',catalog_snapshot,name='catalog_snapshot'),
+    path('_metrics',metrics,name='metrics'),
+
+    # ban async cho ASGI (api/async_views.py)
+    path('async/products/',async_views.product_list,name='async_product_list'),
+    path('async/products/<int:pk>/',async_views.product_detail,name='async_product_detail'),
+    path('async/products/filter/',async_views.filter_products,name='async_filter_products'),
+    path('async/categories/',async_views.category_list,name='async_category_list'),
+    path('async/cart/',async_views.cart_list,name='async_cart_list'),
+    path('async/order/',async_views.orders_list,name='async_orders_list'),
 ]
\ No newline at end of file
@@ -4,16 +4,72 @@ from rest_framework.response import Response
 from rest_framework import status
 from .models import *
 from .serializer import *
+from .pagination import get_page_size, paginate
+from .orders import OrderError, cancel, place_order
+from .inventory import set_stock, stocked_cart_items, stocked_products
+from .archive import order_history
+from .cache import cache_catalog_response
+from .search import build_match, search_ids
+from .cart import CartError, apply_cart_ops
+from .rows import *
+from .metrics import render_prometheus
+from . import catalog_io, facets, sales, snapshots
+from datetime import timedelta
+from django.utils import timezone
+from django.http import HttpResponse, StreamingHttpResponse
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import transaction
+from rest_framework.exceptions import ParseError
 from rest_framework_simplejwt.tokens import RefreshToken
 # Create your views here.
+###lay nhieu san pham theo id trong 1 query: giu thu tu id gui len, id khong co tra ve trong 'missing'
+def parse_product_ids(values):
+    """values: chuoi '1,2,3' hoac list id, nem ParseError neu sai hoac qua PRODUCT_BATCH_MAX_IDS."""
+    if isinstance(values, str):
+        values = [value for value in values.split(',') if value.strip()]
+    if not isinstance(values, list):
+        raise ParseError("ids must be a list of product ids.")
+    limit = getattr(settings, 'PRODUCT_BATCH_MAX_IDS', 100)
+    ids = []
+    for value in values:
+        try:
+            product_id = int(value) if not isinstance(value, bool) else None
+        except (TypeError, ValueError):
+            product_id = None
+        if product_id is None or product_id < 1:
+            raise ParseError(f"Invalid product id '{value}'.")
+        if product_id not in ids:
+            ids.append(product_id)
+    if len(ids) > limit:
+        raise ParseError(f"At most {limit} ids per request.")
+    return ids
+
+def products_by_ids_queryset(ids, fields=PRODUCT_FIELDS):
+    return stocked_products().filter(product_id__in=ids).values(*product_columns(fields, ['product_id']))
+
+def products_by_ids(ids, products, fields=PRODUCT_FIELDS):
+    products = {product['product_id']: product for product in products}
+    return {
+        "results": product_rows([products[product_id] for product_id in ids if product_id in products], fields),
+        "missing": [product_id for product_id in ids if product_id not in products],
+    }
+
 ###product api
+# GET phan trang theo cursor: /products/?page_size=50&cursor=<next>
+# GET /products/?ids=1,2,3: cac san pham theo id (xem products_by_ids)
+# ?fields=id,title,price: chi tra ve (va chi SELECT) cac field nay, dung cho moi api doc san pham
+@cache_catalog_response
 @api_view(['GET', 'POST'])
 def product_list(request):
     if request.method == 'GET':
-        products = Product.objects.all()
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+        fields = sparse_product_fields(request.query_params.get('fields'))
+        if 'ids' in request.query_params:
+            ids = parse_product_ids(request.query_params['ids'])
+            return Response(products_by_ids(ids, products_by_ids_queryset(ids, fields), fields))
+        products = stocked_products().values(*product_columns(fields, ['product_id']))
+        products, next_cursor = paginate(request, products, ['product_id'])
+        return Response({"next": next_cursor, "results": product_rows(products, fields)})
 
     elif request.method == 'POST':
         if not request.user.is_staff:
@@ -24,24 +80,42 @@ def product_list(request):
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+###ban POST cua /products/?ids= cho danh sach id dai: body {"ids": [1, 2, 3]}
+@api_view(['POST'])
+def product_batch(request):
+    ids = request.data.get('ids') if isinstance(request.data, dict) else request.data
+    ids = parse_product_ids(ids)
+    fields = sparse_product_fields(request.query_params.get('fields'))
+    return Response(products_by_ids(ids, products_by_ids_queryset(ids, fields), fields))
 ###get, patch, delete san pham theo id
+@cache_catalog_response
 @api_view(['GET', 'PATCH', 'DELETE'])
 def product_detail(request, pk):
+    if request.method == 'GET':
+        fields = sparse_product_fields(request.query_params.get('fields'))
+        products = product_rows(stocked_products().filter(pk=pk).values(*product_columns(fields, ['product_id'])), fields)
+        if not products:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(products[0])
+
     try:
         product = Product.objects.get(pk=pk)
     except Product.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
-    if request.method == 'GET':
-        serializer = ProductSerializer(product)
-        return Response(serializer.data)
-
-    elif request.method == 'PATCH':
+    if request.method == 'PATCH':
         if not request.user.is_staff:
             return Response({"detail": "Is Admin only."}, status=403)
         serializer = ProductSerializer(product, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                # ton kho sua qua so kho (movement dieu chinh), khong ghi de Product.stock
+                update_stock = 'stock' in serializer.validated_data
+                stock = serializer.validated_data.pop('stock', None)
+                serializer.save()
+                if update_stock:
+                    set_stock(product.pk, stock)
+            product.stock = stocked_products().values_list('available_stock', flat=True).get(pk=product.pk)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -54,49 +128,75 @@ def product_detail(request, pk):
 # /products/filter?sort=price_asc
 # /products/filter?sort=price_desc
 # /products/filter?category=category_id
+# phan trang giong product_list, cursor gan voi kieu sap xep
+PRODUCT_ORDERINGS = {
+    'price_asc': ['price', 'product_id'],
+    'price_desc': ['-price', '-product_id'],
+}
+###loc san pham: ?sort=price_asc|price_desc, ?category=1,2, ?min_price=, ?max_price=, ?in_stock=1,
+# ?min_discount=, ?facets=1 tra them so luong theo danh muc / khoang gia (api/facets.py)
+@cache_catalog_response
 @api_view(['GET'])
 def filter_products(request):
     sort = request.query_params.get('sort')
-    category_id = request.query_params.get('category')
-    products = Product.objects.all()
-
-    if not sort and not category_id:
+    filters = facets.parse_filters(request.query_params)
+    if not sort and not facets.has_filters(filters):
         return Response({"detail": "At least one filter parameter (sort or category) is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-    if category_id:
-        products = products.filter(category__category_id=category_id)
-    if sort == 'price_asc':
-        products = products.order_by('price')
-    elif sort == 'price_desc':
-        products = products.order_by('-price')
-
-    serializer = ProductSerializer(products, many=True)
-    return Response(serializer.data)
+    fields = sparse_product_fields(request.query_params.get('fields'))
+    ordering = PRODUCT_ORDERINGS.get(sort, ['product_id'])
+    products = facets.apply_filters(stocked_products(), filters).values(*product_columns(fields, ordering))
+
+    products, next_cursor = paginate(request, products, ordering)
+    data = {"next": next_cursor, "results": product_rows(products, fields)}
+    if request.query_params.get('facets', '').lower() in facets.TRUE_VALUES:
+        data["facets"] = facets.count_facets(filters)
+    return Response(data)
+### tim kiem full-text (FTS5, xep hang BM25, khop tien to), phan trang cursor
+# /products/search/?q=lap gam
+@cache_catalog_response
+@api_view(['GET'])
+def search_products(request):
+    match = build_match(request.query_params.get('q'))
+    if not match:
+        return Response({"detail": "q query parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+    fields = sparse_product_fields(request.query_params.get('fields'))
+    rows, next_cursor = search_ids(match, request.query_params.get('cursor'), get_page_size(request))
+    ids = [product_id for product_id, rank in rows]
+    products = products_by_ids(ids, products_by_ids_queryset(ids, fields), fields)
+    return Response({"next": next_cursor, "results": products["results"]})
 # categories
 ###get toan bo danh muc
+@cache_catalog_response
 @api_view(['GET'])
 def category_list(request):
     if request.method == 'GET':
-        categories = Category.objects.all()
-        serializer = CategorySerializer(categories, many=True)
-        return Response(serializer.data)
+        categories = Category.objects.values(*CATEGORY_COLUMNS)
+        return Response(category_rows(categories))
 ###get danh muc theo id
+@cache_catalog_response
 @api_view(['GET'])
 def category_detail(request, pk):
-    try:
-        category = Category.objects.get(pk=pk)
-    except Category.DoesNotExist:
+    categories = category_rows(Category.objects.filter(pk=pk).values(*CATEGORY_COLUMNS))
+    if not categories:
         return Response(status=status.HTTP_404_NOT_FOUND)
-
-    if request.method == 'GET':
-        serializer = CategorySerializer(category)
-        return Response(serializer.data)
+    return Response(categories[0])
 # cart
 ###view gio hang, them moi san pham vao gio hang
+# GET ?expand=product: gio hang day du (san pham + tien tung dong + tong tien) trong 1 query
+def expanded(request):
+    return request.query_params.get('expand') == 'product'
+
+def expanded_cart(user):
+    return cart_rows(stocked_cart_items().filter(user=user).order_by('cart_item_id').values(*CART_ITEM_COLUMNS))
+
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def cart_list(request):
     if request.method == 'GET':
+        if expanded(request):
+            return Response(expanded_cart(request.user))
         cart_items = CartItem.objects.filter(user = request.user)
         serializer = CartItemSerializer(cart_items, many=True)
         return Response(serializer.data)
@@ -104,9 +204,31 @@ def cart_list(request):
     elif request.method == 'POST':
         serializer = CartItemSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(user = request.user)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            # (user, product) la unique: san pham da co trong gio thi cong them so luong
+            with transaction.atomic():
+                cart_item = CartItem.objects.filter(user=request.user, product=serializer.validated_data['product']).first()
+                if cart_item is None:
+                    serializer.save(user = request.user)
+                    return Response(serializer.data, status=status.HTTP_201_CREATED)
+                cart_item.quantity += serializer.validated_data['quantity']
+                cart_item.save(update_fields=['quantity'])
+            return Response(CartItemSerializer(cart_item).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+###cap nhat nhieu san pham trong gio hang 1 lan, tra ve gio hang sau khi cap nhat
+# body: [{"product_id": 1, "quantity": 2, "op": "set|add|remove"}, ...] hoac {"items": [...]}
+# ?expand=product: tra ve gio hang day du nhu GET /cart/?expand=product
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def cart_batch(request):
+    entries = request.data.get('items') if isinstance(request.data, dict) else request.data
+    try:
+        cart_items = apply_cart_ops(request.user, entries)
+    except CartError as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if expanded(request):
+        return Response(expanded_cart(request.user))
+    serializer = CartItemSerializer(cart_items, many=True)
+    return Response(serializer.data)
 ###PATCH so luong san pham trong gio hang theo product_id ?product_id=1
 @api_view(['PATCH'])
 @permission_classes([IsAuthenticated])
@@ -170,47 +292,10 @@ def create_order(request):
     if not phone:
         return Response({"detail": "The Phone is required."}, status=400)
 
-    order = Order.objects.create(
-        customer=user,
-        address=address,
-        phone=phone,
-        note=note,
-        status="processing"
-    )
-
-    total = 0  # tong tien
-
-    for item in cart_items:
-        product_id = item.get("product_id")
-        quantity = item.get("quantity", 1)
-
-        try:
-            product = Product.objects.get(product_id=product_id)
-        except Product.DoesNotExist:
-            return Response({"detail": f"Product {product_id} not found."}, status=400)
-
-        if product.stock < quantity:  # kiem tra ton kho
-            return Response(
-                {"detail": f"Not enough stock for {product.product_name}."},
-                status=400
-            )
-
-        OrderItem.objects.create(
-            order=order,
-            product=product,
-            quantity=quantity,
-            price=product.price * quantity
-        )
-
-        total += product.price * quantity
-
-        product.stock -= quantity
-        product.save()
-
-    order.total = total
-    order.save()
-
-    CartItem.objects.filter(user=user).delete()
+    try:
+        order = place_order(user, cart_items, address=address, phone=phone, note=note)
+    except OrderError as e:
+        return Response({"detail": str(e)}, status=400)
 
     return Response({
         "order_id": order.id,
@@ -232,29 +317,24 @@ def cancel_order(request, order_id):
     if order.customer != request.user:
         return Response({"detail": "You do not have permission to cancel this order."}, status=403)
 
-    if order.status in ['paid', 'shipped']:
-        return Response({"detail": f"Cannot cancel an order with status '{order.status}'."}, status=400)
-
-    order.status = 'canceled'
-    order.save()
-
-    for item in order.items.all():  # tra lai so luong san pham vao kho
-        if item.product:
-            item.product.stock += item.quantity
-            item.product.save()
+    try:
+        cancel(order)
+    except OrderError as exc:
+        return Response({"detail": str(exc)}, status=400)
 
     return Response({
         "detail": f"Order {order.id} has been canceled.",
         "status": order.status
     })
 
-#get toan bo order 1 user da tao
+#get toan bo order 1 user da tao, moi nhat truoc, phan trang cursor
+# items + product lay bang 1 query: so query co dinh khong phu thuoc so order
+# don da luu tru (api/archive.py) chi doc tu archive khi trang toi cac don cu
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def orders_list(request):
-    orders = Order.objects.filter(customer=request.user).order_by('-time_create')
-    serializer = OrderSerializer(orders, many=True)
-    return Response(serializer.data)
+    results, next_cursor = order_history(request, request.user)
+    return Response({"next": next_cursor, "results": results})
 
 #register
 @api_view(['POST'])
@@ -278,7 +358,8 @@ def login(request):
     username = request.data.get("username")
     password = request.data.get("password")
 
-    user = authenticate(username=username, password=password)
+    # hash tren pool rieng (api.hashing.PooledModelBackend), pool day thi HashingBusy -> 429
+    user = authenticate(request, username=username, password=password)
     if user is None:
         return Response({"detail": "Invalid username or password"}, status=status.HTTP_401_UNAUTHORIZED)
 
@@ -290,4 +371,70 @@ def login(request):
         "role": "admin" if user.is_staff else "user",
         "refresh": str(refresh),
         "access": str(refresh.access_token)
-    }, status=status.HTTP_200_OK)
\ No newline at end of file
+    }, status=status.HTTP_200_OK)
+
+###bao cao doanh thu cho staff: ?from=&to= (YYYY-MM-DD, mac dinh 30 ngay gan nhat),
+# ?group=day|product|category, ?page_size= so dong toi da khi group theo product/category
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def sales_report(request):
+    end = sales.parse_day(request.query_params.get('to'), timezone.localdate())
+    start = sales.parse_day(request.query_params.get('from'), end - timedelta(days=29))
+    group = request.query_params.get('group', 'day')
+    return Response(sales.report(start, end, group, get_page_size(request)))
+
+###metrics: so lieu cua PerformanceMiddleware, format Prometheus, chi staff
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+###nhap catalog cho staff: body la file NDJSON/CSV (hoac multipart field 'file'),
+# ?kind=products|categories, ?type=ndjson|csv (mac dinh theo Content-Type/ten file),
+# ?batch_size= so dong moi transaction. Dong loi bi bo qua, tra ve trong 'errors'
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def catalog_import(request):
+    kind = request.query_params.get('kind', 'products')
+    if request.content_type.startswith('multipart/form-data'):
+        stream = request.FILES.get('file')
+        if stream is None:
+            raise ParseError("Missing 'file'.")
+        default = catalog_io.guess_format(stream.name)
+    else:
+        stream = request.stream
+        if stream is None:
+            raise ParseError("Empty body.")
+        default = 'csv' if request.content_type.startswith('text/csv') else 'ndjson'
+    try:
+        batch_size = max(1, int(request.query_params['batch_size'])) if 'batch_size' in request.query_params else None
+    except ValueError:
+        raise ParseError("batch_size must be an integer.")
+    try:
+        importer = catalog_io.CatalogImport(kind, batch_size)
+        report = importer.run(stream, request.query_params.get('type', default))
+    except catalog_io.CatalogFileError as exc:
+        raise ParseError(str(exc))
+    return Response(report)
+
+###toan bo catalog {"categories": [...], "products": [...]} tu file snapshot da nen san (api/snapshots.py),
+# Content-Encoding theo Accept-Encoding (br, gzip), ETag theo noi dung
+@api_view(['GET'])
+def catalog_snapshot(request):
+    return snapshots.snapshot_response(request)
+
+###xuat catalog cho staff: ?kind=products|categories, ?type=ndjson|csv, stream theo chunk
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def catalog_export(request):
+    kind = request.query_params.get('kind', 'products')
+    file_type = request.query_params.get('type', 'ndjson')
+    if kind not in catalog_io.KINDS or file_type not in catalog_io.FORMATS:
+        raise ParseError(f"kind must be one of {', '.join(catalog_io.KINDS)}, "
+                         f"type one of {', '.join(catalog_io.FORMATS)}.")
+    response = StreamingHttpResponse(
+        catalog_io.export_chunks(kind, file_type),
+        content_type='text/csv; charset=utf-8' if file_type == 'csv' else 'application/x-ndjson',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{file_type}"'
+    return response
@@ -46,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.PerformanceMiddleware',
+    'api.routers.ReadYourWritesMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -83,9 +85,72 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,  # giu ket noi giua cac request, khong mo lai + chay PRAGMA moi lan
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # BEGIN IMMEDIATE: lay write lock ngay dau transaction, busy_timeout duoc ap dung
+            # thay vi loi "database is locked" khi nang cap tu read lock len write lock
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    # cung file, chi doc (mode=ro): doc catalog/lich su khong xep hang sau writer (api/routers.py)
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': 'file:%s?mode=ro' % (BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+    # don hang cu da luu tru (api/archive.py), file rieng. Sau manage.py migrate can chay them
+    # manage.py migrate --database archive de tao bang (chua co thi orders_list bo qua archive)
+    'archive': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_archive.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+}
+DATABASE_ROUTERS = ['api.routers.ReadWriteRouter']
+READ_DATABASE = 'replica'
+ARCHIVE_DATABASE = 'archive'
+
+# manage.py archive_orders: chuyen don shipped/canceled cu hon so ngay nay sang ARCHIVE_DATABASE,
+# moi lo ORDER_ARCHIVE_BATCH_SIZE don. orders_list khong doc archive khi trang da du don moi hon
+# moc nay, nen sau khi da luu tru chi duoc giam (khong tang) so ngay
+ORDER_ARCHIVE_AFTER_DAYS = 90
+ORDER_ARCHIVE_BATCH_SIZE = 500
+
+# PRAGMA chay tren moi ket noi SQLite moi (api/sqlite.py), xem: manage.py sqlite_pragmas
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',      # reader khong bi writer chan
+    'synchronous': 'NORMAL',    # an toan voi WAL, it fsync hon FULL
+    'busy_timeout': 5000,       # ms cho lock truoc khi bao "database is locked"
+    'mmap_size': 134217728,     # 128MB doc qua mmap
+    'cache_size': -20000,       # so am = KiB, ~20MB page cache moi ket noi
+    'temp_store': 'MEMORY',
+}
+
+
+# cache mac dinh trong process; khi chay nhieu worker phai doi sang backend dung chung
+# (vd. Redis) de catalog version va stock version (api/cache.py) dong bo giua cac worker,
+# neu khong worker khac tiep tuc tra response catalog cu
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# so response catalog toi da giu trong LRU cua moi process
+CATALOG_CACHE_MAX_ENTRIES = 1024
+
+
+# login hash mat khau tren pool cua api/hashing.py (PASSWORD_HASHING)
+AUTHENTICATION_BACKENDS = ['api.hashing.PooledModelBackend']
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -130,13 +195,58 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',  # JWT + cache user (api/authentication.py)
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',  # orjson, output giong JSONRenderer
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
+# cache user da xac thuc JWT trong process: so user toi da, so giay song
+AUTH_USER_CACHE_MAX_ENTRIES = 10000
+AUTH_USER_CACHE_TTL = 60
+# header Server-Timing (total/sql/render) tren moi response cua api.metrics.PerformanceMiddleware
+SERVER_TIMING_HEADER = True
+# pool hash mat khau cho login/register (api/hashing.py): so thread hash cung luc,
+# so request duoc cho (vuot qua -> 429), so giay cho toi da. WORKERS = 0: hash tren request
+PASSWORD_HASHING = {
+    'WORKERS': 2,
+    'QUEUE': 16,
+    'TIMEOUT': 10,
+}
+# hang doi task chay nen (api/tasks.py, manage.py run_worker): so lan thu toi da, so giay
+# task dang chay bi khoa truoc khi worker khac duoc lay lai, backoff (giay, nhan doi moi lan thu,
+# toi da BACKOFF_MAX), so giay cho khi hang doi trong, so thread moi worker
+TASK_QUEUE = {
+    'MAX_ATTEMPTS': 5,
+    'VISIBILITY_TIMEOUT': 60,
+    'BACKOFF': 2,
+    'BACKOFF_MAX': 300,
+    'POLL_INTERVAL': 1.0,
+    'THREADS': 2,
+}
+# so giay giua 2 lan compact so kho (api/inventory.py compact_task, chay boi run_worker);
+# 0: khong tu compact, phai chay manage.py compact_stock (cron / --every) neu khong so movement
+# can cong khi doc ton kho tang mai
+STOCK_COMPACT_INTERVAL = 60
+# so dong moi lo (1 transaction) khi nhap catalog (api/catalog_io.py, import_catalog)
+CATALOG_IMPORT_BATCH_SIZE = 1000
+# can tren cac khoang gia cua facet price o /products/filter/?facets=1 (api/facets.py)
+PRICE_FACET_BUCKETS = [25, 50, 100, 250, 500, 1000]
+# snapshot catalog da nen san cho /api/catalog/snapshot/ (api/snapshots.py): thu muc file,
+# so giay toi thieu giua 2 lan build lai sau khi catalog doi, so ban giu lai (toi thieu 2).
+# Build chay trong run_worker (hang doi api/tasks.py) hoac manage.py build_catalog_snapshot.
+# CATALOG_SNAPSHOT_ACCEL_PREFIX: location internal cua nginx tro vao CATALOG_SNAPSHOT_DIR
+# (vd '/_snapshots/') -> tra X-Accel-Redirect thay vi doc file trong Django
+CATALOG_SNAPSHOT_DIR = BASE_DIR / 'catalog_snapshots'
+CATALOG_SNAPSHOT_DEBOUNCE = 5
+CATALOG_SNAPSHOT_KEEP = 3
+CATALOG_SNAPSHOT_ACCEL_PREFIX = None
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7)
@@ -146,4 +256,13 @@ CORS_ALLOWED_ORIGINS = [
    "http://localhost:5173",      # Vite dev server
 ]
 
-APPEND_SLASH = False #fe phai gui dung duong dan be cai dat trong urls.py
\ No newline at end of file
+APPEND_SLASH = False #fe phai gui dung duong dan be cai dat trong urls.py
+
+# phan trang cursor cho cac api danh sach (?page_size=, ?cursor=)
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+# so thao tac toi da moi request /api/cart/batch/
+CART_BATCH_MAX_ITEMS = 200
+# so id toi da moi request /api/products/?ids= va /api/products/batch/
+PRODUCT_BATCH_MAX_IDS = 100